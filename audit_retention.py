@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Audit log retention.
+
+Creates upcoming audit_logs partitions, detaches months older than the
+retention window, exports each detached month to a gzip-compressed CSV in R2
+and drops the table once the upload succeeded. Activity feed events copied
+from those months are deleted with them.
+
+Run daily from cron:  python3 audit_retention.py
+"""
+import gzip
+import os
+import tempfile
+import boto3
+import psycopg2
+from botocore.config import Config
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- CONFIGURATION ---
+DB_CONNECTION_STRING = os.getenv("DB_CONNECTION_STRING")
+AUDIT_RETAIN_MONTHS = int(os.getenv("AUDIT_RETAIN_MONTHS", "12"))
+AUDIT_ARCHIVE_PREFIX = os.getenv("AUDIT_ARCHIVE_PREFIX", "archive/audit_logs")
+FEED_PRUNE_BATCH = 10000
+
+# --- R2 CONFIGURATION ---
+R2_ACCOUNT_ID = os.getenv("R2_ACCOUNT_ID")
+R2_ACCESS_KEY_ID = os.getenv("R2_ACCESS_KEY_ID")
+R2_SECRET_ACCESS_KEY = os.getenv("R2_SECRET_ACCESS_KEY")
+R2_BUCKET_NAME = os.getenv("R2_BUCKET_NAME")
+
+if not DB_CONNECTION_STRING:
+    raise ValueError("DB_CONNECTION_STRING not found in environment variables.")
+
+def get_r2_client():
+    return boto3.client(
+        's3',
+        endpoint_url=f'https://{R2_ACCOUNT_ID}.r2.cloudflarestorage.com',
+        aws_access_key_id=R2_ACCESS_KEY_ID,
+        aws_secret_access_key=R2_SECRET_ACCESS_KEY,
+        config=Config(signature_version='s3v4'),
+        region_name='auto'
+    )
+
+def export_partition(cur, s3, partition_name):
+    """
+    Export one detached partition through gzip into R2. Returns (key, rows).
+
+    COPY streams into a temporary file on disk, which is then uploaded in
+    multipart chunks, so memory use stays flat whatever the month's size.
+    """
+    with tempfile.TemporaryFile() as tmp:
+        with gzip.GzipFile(fileobj=tmp, mode='wb') as gz:
+            # Name comes from audit_log_archives (always audit_logs_yYYYYmMM)
+            cur.copy_expert(f'COPY "{partition_name}" TO STDOUT WITH (FORMAT csv, HEADER true)', gz)
+
+        cur.execute(f'SELECT count(*) FROM "{partition_name}"')
+        row_count = cur.fetchone()[0]
+
+        key = f"{AUDIT_ARCHIVE_PREFIX}/{partition_name}.csv.gz"
+        tmp.seek(0)
+        s3.upload_fileobj(
+            tmp,
+            R2_BUCKET_NAME,
+            key,
+            ExtraArgs={'ContentType': 'text/csv', 'ContentEncoding': 'gzip'}
+        )
+    return key, row_count
+
+def run_retention():
+    conn = None
+    try:
+        conn = psycopg2.connect(DB_CONNECTION_STRING)
+        cur = conn.cursor()
+        print("✅ Connected to Database")
+
+        # 1. Roll partitions forward and detach expired months
+        cur.execute("SELECT * FROM maintain_audit_log_partitions(3, %s)", (AUDIT_RETAIN_MONTHS,))
+        detached = [r[0] for r in cur.fetchall()]
+        conn.commit()
+        for name in detached:
+            print(f"  📦 Detached {name}")
+
+        # 2. Expire the activity feed copies of the same months, in batches
+        pruned = 0
+        while True:
+            cur.execute("SELECT prune_activity_feed_events(%s, %s)", (AUDIT_RETAIN_MONTHS, FEED_PRUNE_BATCH))
+            deleted = cur.fetchone()[0]
+            conn.commit()
+            pruned += deleted
+            if deleted == 0:
+                break
+        if pruned:
+            print(f"  🧹 Pruned {pruned} activity feed events")
+
+        # 3. Export anything detached but not archived yet (includes earlier failed runs)
+        cur.execute("""
+            SELECT partition_name
+            FROM audit_log_archives
+            WHERE archived_at IS NULL
+            ORDER BY range_start
+        """)
+        pending = [r[0] for r in cur.fetchall()]
+
+        if not pending:
+            print("💤 Nothing to archive.")
+            return
+
+        s3 = get_r2_client()
+        for name in pending:
+            try:
+                key, row_count = export_partition(cur, s3, name)
+                cur.execute("""
+                    UPDATE audit_log_archives
+                    SET archived_at = NOW(), object_key = %s, row_count = %s
+                    WHERE partition_name = %s
+                """, (key, row_count, name))
+                cur.execute(f'DROP TABLE "{name}"')
+                conn.commit()
+                print(f"  ✅ Archived {name} ({row_count} rows) -> {key}")
+            except Exception as e:
+                conn.rollback()
+                print(f"  ❌ Failed to archive {name}: {e}")
+
+    except Exception as e:
+        print(f"❌ Critical Error: {e}")
+    finally:
+        if conn: conn.close()
+
+if __name__ == "__main__":
+    run_retention()
@@ -1,5 +1,6 @@
 import { ref, computed, onUnmounted } from 'vue'
 import { supabase } from '../lib/supabase'
+import { clearAll as clearEntityCache } from '../lib/entityCache'
 
 const user = ref(null)
 const userProfile = ref(null)
@@ -123,6 +124,7 @@ export function useAuth() {
 
                     // Truly signed out - clear state
                     console.log('[AUTH] Clearing user state (genuine sign out)')
+                    clearEntityCache()
                     user.value = null
                     userProfile.value = null
                 } else {
@@ -133,6 +135,9 @@ export function useAuth() {
                     }
 
                     // Different user or first sign in - update state
+                    if (user.value && user.value.id !== session.user.id) {
+                        clearEntityCache()
+                    }
                     user.value = session.user
                     await fetchProfile(session.user.id)
                 }
@@ -178,6 +183,7 @@ export function useAuth() {
 
     const signOut = async () => {
         await supabase.auth.signOut()
+        clearEntityCache()
         user.value = null
         userProfile.value = null
         // Clear all impersonation on sign out
@@ -190,6 +196,7 @@ export function useAuth() {
         if (!userProfile.value?.is_superuser) return
 
         localStorage.setItem('impersonated_tenant_id', tenantId)
+        clearEntityCache()
         impersonatedTenantId.value = tenantId
 
         const { data: tenantData } = await supabase
@@ -204,6 +211,7 @@ export function useAuth() {
 
     const stopImpersonating = () => {
         localStorage.removeItem('impersonated_tenant_id')
+        if (impersonatedTenantId.value) clearEntityCache()
         impersonatedTenantId.value = null
         impersonatedTenantName.value = null
 
@@ -219,6 +227,7 @@ export function useAuth() {
 
         localStorage.setItem('impersonated_user_id', userId)
         localStorage.setItem('impersonated_user_name', userName)
+        clearEntityCache()
         impersonatedUserId.value = userId
         impersonatedUserName.value = userName
 
@@ -229,6 +238,7 @@ export function useAuth() {
         const wasImpersonating = !!impersonatedUserId.value
         localStorage.removeItem('impersonated_user_id')
         localStorage.removeItem('impersonated_user_name')
+        if (wasImpersonating) clearEntityCache()
         impersonatedUserId.value = null
         impersonatedUserName.value = null
 
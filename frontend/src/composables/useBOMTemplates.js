@@ -3,6 +3,7 @@
  * Centralizes BOM (Bill of Materials) template management
  */
 import { supabase } from '../lib/supabase'
+import { invalidate } from '../lib/entityCache'
 import { useAuth } from './useAuth'
 
 export function useBOMTemplates() {
@@ -84,11 +85,13 @@ export function useBOMTemplates() {
                 // Update existing
                 const { error } = await supabase.rpc('update_bom_template', { ...payload, p_id: id })
                 if (error) throw error
+                invalidate('lookup_bom_templates', 'get_bom_template_items')
                 return { success: true, templateId: id }
             } else {
                 // Create new
                 const { data, error } = await supabase.rpc('create_bom_template', { ...payload, p_tenant_id: tenantId })
                 if (error) throw error
+                invalidate('lookup_bom_templates')
                 return { success: true, templateId: data }
             }
         } catch (e) {
@@ -109,6 +112,7 @@ export function useBOMTemplates() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate('lookup_bom_templates', 'get_bom_template_items')
         return data
     }
 
@@ -120,6 +124,7 @@ export function useBOMTemplates() {
     const reorderTemplates = async (ids) => {
         const { error } = await supabase.rpc('reorder_bom_templates', { p_ids: ids })
         if (error) return { success: false, error: error.message }
+        invalidate('lookup_bom_templates')
         return { success: true }
     }
 
@@ -5,6 +5,82 @@
 import { supabase } from '../lib/supabase'
 import { useAuth } from './useAuth'
 
+const DAY_MS = 24 * 60 * 60 * 1000
+const PREFETCH_MARGIN_MS = 14 * DAY_MS // fetched on each side of the visible range
+const MAX_CACHED_SOURCES = 8 // tenant + property combinations kept (LRU)
+const CACHE_TTL_MS = 5 * 60 * 1000 // refetch even while realtime is patching (missed messages)
+
+// key `${tenantId}:${propertyId}` -> { ranges: [[startMs, endMs], ...], events: Map<id, event>, createdAt }
+// Map iteration order is insertion order, so re-inserting on access gives LRU eviction.
+// Cached events are only kept current by realtime deltas while the calendar is
+// open, so CalendarView clears the cache when it unmounts (invalidateEvents()).
+const rangeCache = new Map()
+
+const getCacheEntry = (key) => {
+    let entry = rangeCache.get(key)
+    if (entry && Date.now() - entry.createdAt <= CACHE_TTL_MS) {
+        rangeCache.delete(key)
+    } else {
+        rangeCache.delete(key)
+        entry = { ranges: [], events: new Map(), createdAt: Date.now() }
+    }
+    rangeCache.set(key, entry)
+
+    while (rangeCache.size > MAX_CACHED_SOURCES) {
+        rangeCache.delete(rangeCache.keys().next().value)
+    }
+    return entry
+}
+
+// Parts of [start, end) not covered by the sorted, non-overlapping ranges
+const findGaps = (ranges, start, end) => {
+    const gaps = []
+    let cursor = start
+    for (const [rStart, rEnd] of ranges) {
+        if (rEnd <= cursor) continue
+        if (rStart >= end) break
+        if (rStart > cursor) gaps.push([cursor, rStart])
+        cursor = Math.max(cursor, rEnd)
+        if (cursor >= end) break
+    }
+    if (cursor < end) gaps.push([cursor, end])
+    return gaps
+}
+
+const addRange = (ranges, start, end) => {
+    const merged = []
+    for (const range of [...ranges, [start, end]].sort((a, b) => a[0] - b[0])) {
+        const last = merged[merged.length - 1]
+        if (last && range[0] <= last[1]) {
+            last[1] = Math.max(last[1], range[1])
+        } else {
+            merged.push([range[0], range[1]])
+        }
+    }
+    return merged
+}
+
+// get_calendar_events / calendar_events row -> FullCalendar event
+const toCalendarEvent = (evt, previous = null) => ({
+    id: evt.id,
+    title: evt.title,
+    start: evt.start_date,
+    end: evt.end_date,
+    color: evt.color,
+    classNames: [evt.class_name],
+    allDay: evt.all_day,
+    extendedProps: {
+        description: evt.description,
+        property_id: evt.property_id,
+        // Realtime rows carry no property columns; keep what we already had
+        property_name: evt.property_name ?? previous?.extendedProps.property_name,
+        property_address: evt.property_address ?? previous?.extendedProps.property_address,
+        event_type: evt.event_type,
+        code: evt.code,
+        job_id: evt.job_id  // For navigation to job detail
+    }
+})
+
 export function useCalendar() {
     const { effectiveTenantId } = useAuth()
 
@@ -33,58 +109,157 @@ export function useCalendar() {
     }
 
     /**
-     * Fetch calendar events (from master_calendar view)
+     * Fetch calendar events overlapping a date window via RPC
      * @param {Object} options
      * @param {string} [options.propertyId] - Filter by property, or 'all' for all properties
+     * @param {Date|string} options.start - Window start (inclusive)
+     * @param {Date|string} options.end - Window end (exclusive)
      * @returns {Promise<{success: boolean, events?: Array, error?: string}>}
      */
-    const fetchEvents = async ({ propertyId = 'all' } = {}) => {
+    const fetchEvents = async ({ propertyId = 'all', start, end } = {}) => {
         const tenantId = effectiveTenantId.value
         if (!tenantId) {
             return { success: false, error: 'Tenant ID not found' }
         }
-
-        let query = supabase.from('master_calendar').select('*')
-            .eq('tenant_id', tenantId)
-
-        if (propertyId !== 'all') {
-            // Specific property: show ALL events (including iCal bookings)
-            query = query.eq('property_id', propertyId)
-        } else {
-            // All Properties: show only Jobs/Services, exclude iCal bookings to keep view manageable
-            query = query.neq('event_type', 'Booking')
+        if (!start || !end) {
+            return { success: false, error: 'Date range is required' }
         }
 
-        const { data, error } = await query
+        // Specific property: show ALL events (including iCal bookings)
+        // All Properties: show only Jobs/Services, exclude iCal bookings to keep view manageable
+        const { data, error } = await supabase.rpc('get_calendar_events', {
+            p_tenant_id: tenantId,
+            p_range_start: new Date(start).toISOString(),
+            p_range_end: new Date(end).toISOString(),
+            p_property_id: propertyId !== 'all' ? propertyId : null,
+            p_include_bookings: propertyId !== 'all'
+        })
 
         if (error) {
             return { success: false, error: error.message }
         }
 
         // Transform to FullCalendar format
-        const fcEvents = (data || []).map(evt => ({
-            id: evt.id,
-            title: evt.title,
-            start: evt.start_date,
-            end: evt.end_date,
-            color: evt.color,
-            classNames: [evt.class_name],
-            allDay: evt.all_day,
-            extendedProps: {
-                description: evt.description,
-                property_name: evt.property_name,
-                property_address: evt.property_address,
-                event_type: evt.event_type,
-                code: evt.code,
-                job_id: evt.job_id  // For navigation to job detail
-            }
-        }))
+        const fcEvents = (data || []).map(evt => toCalendarEvent(evt))
 
         return { success: true, events: fcEvents }
     }
 
+    /**
+     * FullCalendar event-source function backed by a per-property range cache.
+     * Only the parts of (visible range + prefetch margin) not fetched before are
+     * requested; results are merged into the cached events by id.
+     * @param {Function} getPropertyId - Returns the current property id or 'all'
+     * @returns {Function} (fetchInfo, successCallback, failureCallback) => void
+     */
+    const createEventSource = (getPropertyId) => async (fetchInfo, successCallback, failureCallback) => {
+        const tenantId = effectiveTenantId.value
+        if (!tenantId) {
+            successCallback([])
+            return
+        }
+
+        const propertyId = getPropertyId()
+        const entry = getCacheEntry(`${tenantId}:${propertyId}`)
+        const visibleStart = fetchInfo.start.getTime()
+        const visibleEnd = fetchInfo.end.getTime()
+        const gaps = findGaps(entry.ranges, visibleStart, visibleEnd)
+
+        if (gaps.length > 0) {
+            // Widen the first/last gap by the prefetch margin so the next
+            // prev/next navigation is already cached
+            const fetchStart = Math.min(gaps[0][0], visibleStart - PREFETCH_MARGIN_MS)
+            const fetchEnd = Math.max(gaps[gaps.length - 1][1], visibleEnd + PREFETCH_MARGIN_MS)
+            const toFetch = findGaps(entry.ranges, fetchStart, fetchEnd)
+
+            const results = await Promise.all(toFetch.map(([start, end]) =>
+                fetchEvents({ propertyId, start, end })
+            ))
+
+            const failed = results.find(r => !r.success)
+            if (failed) {
+                failureCallback(new Error(failed.error))
+                return
+            }
+
+            results.forEach((result, i) => {
+                result.events.forEach(evt => entry.events.set(evt.id, evt))
+                entry.ranges = addRange(entry.ranges, toFetch[i][0], toFetch[i][1])
+            })
+        }
+
+        const visible = []
+        for (const evt of entry.events.values()) {
+            const start = new Date(evt.start).getTime()
+            const end = evt.end ? new Date(evt.end).getTime() : start
+            if (start < visibleEnd && end >= visibleStart) {
+                visible.push(evt)
+            }
+        }
+        successCallback(visible)
+    }
+
+    /**
+     * Drop cached calendar ranges so the next fetch goes to the server
+     * @param {string} [propertyId] - Only this property (and 'all'); omit to clear everything
+     */
+    const invalidateEvents = (propertyId = null) => {
+        if (!propertyId) {
+            rangeCache.clear()
+            return
+        }
+        const tenantId = effectiveTenantId.value
+        rangeCache.delete(`${tenantId}:${propertyId}`)
+        rangeCache.delete(`${tenantId}:all`)
+    }
+
+    /**
+     * Apply a realtime calendar_events delta to every cached range of this tenant
+     * @param {Object} delta - From useRealtime: { eventType, id, row }
+     * @param {string} currentPropertyId - Property shown by the calendar, or 'all'
+     * @returns {Object|null} FullCalendar event to upsert in the current view, or null to remove it
+     */
+    const applyEventDelta = ({ eventType, id, row }, currentPropertyId) => {
+        const tenantId = effectiveTenantId.value
+        let current = null
+
+        for (const [key, entry] of rangeCache) {
+            const [entryTenant, propertyId] = key.split(':')
+            if (entryTenant !== tenantId) continue
+
+            const previous = entry.events.get(id)
+            if (eventType === 'DELETE') {
+                entry.events.delete(id)
+                continue
+            }
+
+            const belongs = propertyId === 'all'
+                ? row.event_type !== 'Booking'
+                : row.property_id === propertyId
+            const start = new Date(row.start_date).getTime()
+            const covered = entry.ranges.some(([rStart, rEnd]) => start >= rStart && start < rEnd)
+
+            if (!belongs || (!previous && !covered)) {
+                entry.events.delete(id)
+                continue
+            }
+
+            // New events borrow the property name/address from a cached sibling
+            const source = previous ||
+                [...entry.events.values()].find(e => e.extendedProps.property_id === row.property_id)
+            const merged = toCalendarEvent(row, source)
+            entry.events.set(id, merged)
+            if (propertyId === currentPropertyId) current = merged
+        }
+
+        return current
+    }
+
     return {
         fetchProperties,
-        fetchEvents
+        fetchEvents,
+        createEventSource,
+        invalidateEvents,
+        applyEventDelta
     }
 }
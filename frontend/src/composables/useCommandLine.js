@@ -1,5 +1,6 @@
 import { ref } from 'vue'
 import { useRouter } from 'vue-router'
+import { invalidate } from '../lib/entityCache'
 import { useAuth } from './useAuth'
 import { useJobs } from './useJobs'
 import { useProperties } from './useProperties'
@@ -22,12 +23,6 @@ export function useCommandLine() {
     const outputLines = ref(savedOutput ? JSON.parse(savedOutput) : [])
     const isProcessing = ref(false)
 
-    // Cached data for searching
-    const cachedJobs = ref([])
-    const cachedProperties = ref([])
-    const cachedPeople = ref([])
-    const cachedOpportunities = ref([])
-
     // Navigation routes
     const routes = {
         'dashboard': '/',
@@ -285,14 +280,14 @@ export function useCommandLine() {
             if (entityLower === 'jobs') {
                 const result = await fetchJobs()
                 if (!result.success) throw new Error(result.error)
-                cachedJobs.value = result.jobs || []
+                const jobs = result.jobs || []
 
                 // Store data for structured output
-                redirectData = cachedJobs.value
+                redirectData = jobs
                 redirectDataType = 'jobs'
 
-                const recentJobs = cachedJobs.value.slice(0, 10)
-                addOutput(`Jobs (${cachedJobs.value.length} total, showing first 10):`, 'info')
+                const recentJobs = jobs.slice(0, 10)
+                addOutput(`Jobs (${jobs.length} total, showing first 10):`, 'info')
                 recentJobs.forEach(job => {
                     const status = job.status || 'unknown'
                     const propName = job.properties?.name || job.property_name || 'No property'
@@ -304,14 +299,14 @@ export function useCommandLine() {
             } else if (entityLower === 'properties') {
                 const result = await listProperties()
                 if (!result.success) throw new Error(result.error)
-                cachedProperties.value = result.properties || []
+                const properties = result.properties || []
 
                 // Store data for structured output
-                redirectData = cachedProperties.value
+                redirectData = properties
                 redirectDataType = 'properties'
 
-                addOutput(`Properties (${cachedProperties.value.length} total):`, 'info')
-                cachedProperties.value.slice(0, 15).forEach(prop => {
+                addOutput(`Properties (${properties.length} total):`, 'info')
+                properties.slice(0, 15).forEach(prop => {
                     addOutput([
                         { text: '  ' },
                         {
@@ -324,28 +319,28 @@ export function useCommandLine() {
             } else if (entityLower === 'people' || entityLower === 'staff' || entityLower === 'users') {
                 const result = await listPeople()
                 if (!result.success) throw new Error(result.error)
-                cachedPeople.value = result.people || []
+                const people = result.people || []
 
                 // Store data for structured output
-                redirectData = cachedPeople.value
+                redirectData = people
                 redirectDataType = 'people'
 
-                addOutput(`People (${cachedPeople.value.length} total):`, 'info')
-                cachedPeople.value.slice(0, 15).forEach(person => {
+                addOutput(`People (${people.length} total):`, 'info')
+                people.slice(0, 15).forEach(person => {
                     const name = [person.first_name, person.last_name].filter(Boolean).join(' ') || 'Unnamed'
                     addOutput(`  ${name.padEnd(25)} ${person.email || ''}`, 'normal')
                 })
             } else if (entityLower === 'opps' || entityLower === 'opportunities' || entityLower === 'service-opportunities') {
                 const result = await fetchOpportunities()
                 if (!result.success) throw new Error(result.error)
-                cachedOpportunities.value = result.opportunities || []
+                const opportunities = result.opportunities || []
 
                 // Store data for structured output
-                redirectData = cachedOpportunities.value
+                redirectData = opportunities
                 redirectDataType = 'opps'
 
-                addOutput(`Service Opportunities (${cachedOpportunities.value.length} total, showing first 10):`, 'info')
-                cachedOpportunities.value.slice(0, 10).forEach(opp => {
+                addOutput(`Service Opportunities (${opportunities.length} total, showing first 10):`, 'info')
+                opportunities.slice(0, 10).forEach(opp => {
                     const propName = opp.property_name || 'Unknown'
                     const template = opp.service_template_name || opp.title || 'No template'
                     addOutput([
@@ -374,23 +369,19 @@ export function useCommandLine() {
             if (entityLower === 'jobs') {
                 const result = await fetchJobs()
                 if (!result.success) throw new Error(result.error)
-                cachedJobs.value = result.jobs || []
-                addOutput(`Jobs: ${cachedJobs.value.length}`, 'info')
+                addOutput(`Jobs: ${(result.jobs || []).length}`, 'info')
             } else if (entityLower === 'properties') {
                 const result = await listProperties()
                 if (!result.success) throw new Error(result.error)
-                cachedProperties.value = result.properties || []
-                addOutput(`Properties: ${cachedProperties.value.length}`, 'info')
+                addOutput(`Properties: ${(result.properties || []).length}`, 'info')
             } else if (entityLower === 'people' || entityLower === 'staff') {
                 const result = await listPeople()
                 if (!result.success) throw new Error(result.error)
-                cachedPeople.value = result.people || []
-                addOutput(`People: ${cachedPeople.value.length}`, 'info')
+                addOutput(`People: ${(result.people || []).length}`, 'info')
             } else if (entityLower === 'opps' || entityLower === 'opportunities') {
                 const result = await fetchOpportunities()
                 if (!result.success) throw new Error(result.error)
-                cachedOpportunities.value = result.opportunities || []
-                addOutput(`Service Opportunities: ${cachedOpportunities.value.length}`, 'info')
+                addOutput(`Service Opportunities: ${(result.opportunities || []).length}`, 'info')
             } else if (entityLower === 'all') {
                 const [jobsRes, propsRes, peopleRes, oppsRes] = await Promise.all([
                     fetchJobs(),
@@ -398,16 +389,11 @@ export function useCommandLine() {
                     listPeople(),
                     fetchOpportunities()
                 ])
-                cachedJobs.value = jobsRes.jobs || []
-                cachedProperties.value = propsRes.properties || []
-                cachedPeople.value = peopleRes.people || []
-                cachedOpportunities.value = oppsRes.opportunities || []
-
                 addOutput('Entity counts:', 'info')
-                addOutput(`  Jobs: ${cachedJobs.value.length}`, 'normal')
-                addOutput(`  Properties: ${cachedProperties.value.length}`, 'normal')
-                addOutput(`  People: ${cachedPeople.value.length}`, 'normal')
-                addOutput(`  Service Opportunities: ${cachedOpportunities.value.length}`, 'normal')
+                addOutput(`  Jobs: ${(jobsRes.jobs || []).length}`, 'normal')
+                addOutput(`  Properties: ${(propsRes.properties || []).length}`, 'normal')
+                addOutput(`  People: ${(peopleRes.people || []).length}`, 'normal')
+                addOutput(`  Service Opportunities: ${(oppsRes.opportunities || []).length}`, 'normal')
             } else {
                 addOutput(`Unknown entity: "${entity}". Try: jobs, properties, people, opps, all`, 'error')
             }
@@ -423,11 +409,10 @@ export function useCommandLine() {
 
         try {
             if (typeLower === 'job' || typeLower === 'jobs') {
-                if (cachedJobs.value.length === 0) {
-                    const result = await fetchJobs()
-                    if (result.success) cachedJobs.value = result.jobs || []
-                }
-                const matches = cachedJobs.value.filter(j =>
+                // Served from the shared entity cache when fresh
+                const result = await fetchJobs()
+                if (!result.success) throw new Error(result.error)
+                const matches = (result.jobs || []).filter(j =>
                     (j.properties?.name || '').toLowerCase().includes(queryLower) ||
                     (j.status || '').toLowerCase().includes(queryLower) ||
                     String(j.id).includes(query)
@@ -438,11 +423,9 @@ export function useCommandLine() {
                     addOutput(`  #${job.id.slice(0, 8)}... [${job.status || '?'}] ${propName}`, 'normal')
                 })
             } else if (typeLower === 'property' || typeLower === 'properties') {
-                if (cachedProperties.value.length === 0) {
-                    const result = await listProperties()
-                    if (result.success) cachedProperties.value = result.properties || []
-                }
-                const matches = cachedProperties.value.filter(p =>
+                const result = await listProperties()
+                if (!result.success) throw new Error(result.error)
+                const matches = (result.properties || []).filter(p =>
                     (p.name || '').toLowerCase().includes(queryLower) ||
                     (p.address || '').toLowerCase().includes(queryLower)
                 )
@@ -451,11 +434,9 @@ export function useCommandLine() {
                     addOutput(`  ${prop.name || prop.address || 'Unnamed'}`, 'normal')
                 })
             } else if (typeLower === 'person' || typeLower === 'people') {
-                if (cachedPeople.value.length === 0) {
-                    const result = await listPeople()
-                    if (result.success) cachedPeople.value = result.people || []
-                }
-                const matches = cachedPeople.value.filter(p =>
+                const result = await listPeople()
+                if (!result.success) throw new Error(result.error)
+                const matches = (result.people || []).filter(p =>
                     (p.first_name || '').toLowerCase().includes(queryLower) ||
                     (p.last_name || '').toLowerCase().includes(queryLower) ||
                     (p.email || '').toLowerCase().includes(queryLower)
@@ -478,6 +459,9 @@ export function useCommandLine() {
         addOutput('Refreshing all data...', 'info')
         console.log('[CLI DEBUG] refreshAll started, tenantId:', effectiveTenantId.value)
         try {
+            // Drop every cached read so the calls below go to the network
+            invalidate()
+
             console.log('[CLI DEBUG] Calling fetchJobs...')
             const jobsRes = await fetchJobs()
             console.log('[CLI DEBUG] fetchJobs completed')
@@ -494,10 +478,8 @@ export function useCommandLine() {
             const oppsRes = await fetchOpportunities()
             console.log('[CLI DEBUG] fetchOpportunities completed')
 
-            cachedJobs.value = jobsRes.jobs || []
-            cachedProperties.value = propsRes.properties || []
-            cachedPeople.value = peopleRes.people || []
-            cachedOpportunities.value = oppsRes.opportunities || []
+            const failed = [jobsRes, propsRes, peopleRes, oppsRes].find(r => !r.success)
+            if (failed) throw new Error(failed.error)
             addOutput('All data refreshed successfully.', 'success')
         } catch (err) {
             console.error('[CLI DEBUG] refreshAll error:', err)
@@ -5,55 +5,124 @@
 import { supabase } from '../lib/supabase'
 import { useAuth } from './useAuth'
 
+const BUCKETS = ['overdue', 'today', 'tomorrow', 'this_week', 'next_week', 'future']
+const BUCKET_PAGE_SIZE = 20
+
 export function useDashboard() {
     const { effectiveTenantId } = useAuth()
 
     /**
      * Fetch horizon data for dashboard board view
-     * @returns {Promise<{success: boolean, horizon?: Object, counts?: Object, error?: string}>}
+     * Returns every bucket's count but only its first perBucket jobs; use
+     * fetchBucketPage to load the rest of a column.
+     * @param {Object} [options]
+     * @param {number} [options.perBucket] - Jobs per bucket (default: 20)
+     * ranges maps each bucket to its [start, end) effective_date bounds (ms,
+     * null = unbounded), for placing jobs that change while the board is open.
+     * @returns {Promise<{success: boolean, horizon?: Object, counts?: Object, ranges?: Object, error?: string}>}
      */
-    const fetchHorizon = async () => {
+    const fetchHorizon = async ({ perBucket = BUCKET_PAGE_SIZE } = {}) => {
         const tenantId = effectiveTenantId.value
         if (!tenantId) {
             return { success: false, error: 'Tenant ID not found' }
         }
 
-        const { data: jobs, error } = await supabase.rpc('get_dashboard_horizon', {
-            p_tenant_id: tenantId
+        const { data, error } = await supabase.rpc('get_dashboard_buckets', {
+            p_tenant_id: tenantId,
+            p_per_bucket: perBucket
         })
 
         if (error) {
             return { success: false, error: error.message }
         }
 
-        // Organize into buckets
-        const buckets = {
-            overdue: [],
-            today: [],
-            tomorrow: [],
-            this_week: [],
-            next_week: [],
-            future: []
+        const horizon = {}
+        const counts = {}
+        const ranges = {}
+        BUCKETS.forEach(bucket => {
+            horizon[bucket] = data?.buckets?.[bucket] || []
+            counts[bucket] = data?.counts?.[bucket] || 0
+            const [start, end] = data?.ranges?.[bucket] || []
+            ranges[bucket] = [start ? Date.parse(start) : null, end ? Date.parse(end) : null]
+        })
+
+        return { success: true, horizon, counts, ranges }
+    }
+
+    /**
+     * Fetch the next jobs of one bucket after the last job already shown
+     * @param {string} bucket - e.g. 'overdue', 'today'
+     * @param {Object} [lastJob] - Last job currently in the column
+     * @param {number} [limit] - Page size (default: 20)
+     * @returns {Promise<{success: boolean, jobs?: Array, error?: string}>}
+     */
+    const fetchBucketPage = async (bucket, lastJob = null, limit = BUCKET_PAGE_SIZE) => {
+        const tenantId = effectiveTenantId.value
+        if (!tenantId) {
+            return { success: false, error: 'Tenant ID not found' }
         }
-        const counts = {
-            overdue: 0,
-            today: 0,
-            tomorrow: 0,
-            this_week: 0,
-            next_week: 0,
-            future: 0
+
+        const { data, error } = await supabase.rpc('get_dashboard_bucket_page', {
+            p_tenant_id: tenantId,
+            p_bucket: bucket,
+            p_cursor: lastJob ? { effective_date: lastJob.effective_date, id: lastJob.id } : null,
+            p_limit: limit
+        })
+
+        if (error) {
+            return { success: false, error: error.message }
         }
+        return { success: true, jobs: data || [] }
+    }
 
-        if (jobs) {
-            jobs.forEach(j => {
-                if (buckets[j.bucket]) {
-                    buckets[j.bucket].push(j)
-                    counts[j.bucket]++
-                }
-            })
+    /**
+     * Fetch the cards of specific jobs (e.g. ones changed by realtime)
+     * @param {Array<string>} jobIds
+     * @returns {Promise<{success: boolean, jobs?: Array, error?: string}>}
+     */
+    const fetchCards = async (jobIds) => {
+        const tenantId = effectiveTenantId.value
+        if (!tenantId) {
+            return { success: false, error: 'Tenant ID not found' }
         }
 
-        return { success: true, horizon: buckets, counts }
+        const { data, error } = await supabase.rpc('get_dashboard_cards', {
+            p_tenant_id: tenantId,
+            p_job_ids: jobIds
+        })
+
+        if (error) {
+            return { success: false, error: error.message }
+        }
+        return { success: true, jobs: data || [] }
+    }
+
+    /**
+     * Bucket a job row belongs in, or null when it is not on the board
+     * (same rules as get_dashboard_buckets)
+     * @param {Object} row - jobs row (realtime payload)
+     * @param {Object} ranges - From fetchHorizon
+     * @returns {string|null}
+     */
+    const bucketFor = (row, ranges) => {
+        if (row.deleted_at || row.status === 'Complete' || !row.service_opportunity_id || !row.effective_date) {
+            return null
+        }
+        const at = Date.parse(row.effective_date)
+        return BUCKETS.find(bucket => {
+            const [start, end] = ranges[bucket] || []
+            return (start === null || at >= start) && (end === null || at < end)
+        }) || null
+    }
+
+    /**
+     * Board order: effective_date, then id
+     * @returns {number} Negative when a sorts before b
+     */
+    const compareJobs = (a, b) => {
+        const diff = Date.parse(a.effective_date) - Date.parse(b.effective_date)
+        if (diff !== 0) return diff
+        return a.id < b.id ? -1 : (a.id > b.id ? 1 : 0)
     }
 
     /**
@@ -79,6 +148,10 @@ export function useDashboard() {
 
     return {
         fetchHorizon,
+        fetchBucketPage,
+        fetchCards,
+        bucketFor,
+        compareJobs,
         getTypeColor,
         formatTime
     }
@@ -0,0 +1,153 @@
+/**
+ * useGlobalSearch composable
+ * Search client for GlobalSearch: caches search_global results per query,
+ * narrows a cached result set locally while the query is extended, cancels
+ * superseded requests, and falls back to search_suggest (trigram, typo
+ * tolerant) when nothing matches.
+ */
+import { supabase } from '../lib/supabase'
+import { useAuth } from './useAuth'
+
+const RESULT_LIMIT = 20
+const MAX_CACHED_QUERIES = 50
+const CACHE_TTL_MS = 60 * 1000
+
+// `${tenantId}:${query}` -> { results, complete, suggested, fetchedAt }
+// complete: the server returned every match (fewer than RESULT_LIMIT), so any
+// extension of the query matches a subset of these results.
+const queryCache = new Map()
+
+const normalizeQuery = (text) => (text || '').trim().toLowerCase().replace(/\s+/g, ' ')
+
+const terms = (query) => query.split(/[^a-z0-9@.]+/).filter(Boolean)
+
+const lookup = (key) => {
+    const entry = queryCache.get(key)
+    if (!entry) return null
+    if (Date.now() - entry.fetchedAt > CACHE_TTL_MS) {
+        queryCache.delete(key)
+        return null
+    }
+    return entry
+}
+
+const remember = (key, entry) => {
+    queryCache.delete(key)
+    queryCache.set(key, entry)
+    if (queryCache.size > MAX_CACHED_QUERIES) {
+        queryCache.delete(queryCache.keys().next().value)
+    }
+}
+
+// Same rule as search_global: every term is a prefix of one of the terms the
+// result was indexed with (item.terms, descriptions included)
+const matchesAllTerms = (item, queryTerms) => {
+    return queryTerms.every(term => item.terms.some(word => word.startsWith(term)))
+}
+
+// Longest complete cached query that the new query extends
+const findNarrowable = (tenantId, query) => {
+    for (let end = query.length - 1; end >= 2; end--) {
+        const entry = lookup(`${tenantId}:${query.slice(0, end)}`)
+        if (entry?.complete) return entry
+    }
+    return null
+}
+
+export function useGlobalSearch() {
+    const { effectiveTenantId } = useAuth()
+    let controller = null
+
+    /**
+     * Cancel the in-flight server search, if any
+     */
+    const cancel = () => {
+        if (controller) controller.abort()
+        controller = null
+    }
+
+    /**
+     * Search everything in the current tenant
+     * @param {string} text - Raw query text
+     * @returns {Promise<{success: boolean, results?: Array, suggested?: boolean, cancelled?: boolean, error?: string}>}
+     */
+    const search = async (text) => {
+        const tenantId = effectiveTenantId.value
+        if (!tenantId) return { success: false, error: 'Tenant ID not found' }
+
+        const query = normalizeQuery(text)
+        const key = `${tenantId}:${query}`
+
+        const hit = lookup(key)
+        if (hit) {
+            remember(key, hit)
+            return { success: true, results: hit.results, suggested: !!hit.suggested }
+        }
+
+        const superset = findNarrowable(tenantId, query)
+        if (superset && !superset.suggested && superset.results.every(item => Array.isArray(item.terms))) {
+            const queryTerms = terms(query)
+            const results = superset.results.filter(item => matchesAllTerms(item, queryTerms))
+            if (results.length > 0) {
+                remember(key, { results, complete: true, fetchedAt: superset.fetchedAt })
+                return { success: true, results, suggested: false }
+            }
+        }
+
+        cancel()
+        controller = new AbortController()
+        const { signal } = controller
+
+        try {
+            const { data, error } = await supabase
+                .rpc('search_global', {
+                    p_query_text: query,
+                    p_tenant_id: tenantId,
+                    p_limit: RESULT_LIMIT
+                })
+                .abortSignal(signal)
+
+            if (signal.aborted) return { success: false, cancelled: true }
+            if (error) return { success: false, error: error.message }
+
+            let results = data || []
+            let suggested = false
+
+            if (results.length === 0) {
+                const { data: suggestions, error: suggestError } = await supabase
+                    .rpc('search_suggest', { p_query_text: query })
+                    .abortSignal(signal)
+
+                if (signal.aborted) return { success: false, cancelled: true }
+                if (!suggestError && suggestions?.length) {
+                    results = suggestions
+                    suggested = true
+                }
+            }
+
+            remember(key, {
+                results,
+                complete: !suggested && results.length < RESULT_LIMIT,
+                suggested,
+                fetchedAt: Date.now()
+            })
+            return { success: true, results, suggested }
+        } catch (e) {
+            if (signal.aborted) return { success: false, cancelled: true }
+            return { success: false, error: e.message }
+        } finally {
+            if (controller?.signal === signal) controller = null
+        }
+    }
+
+    /**
+     * Forget cached results (e.g. after large imports)
+     */
+    const clearSearchCache = () => queryCache.clear()
+
+    return {
+        search,
+        cancel,
+        clearSearchCache
+    }
+}
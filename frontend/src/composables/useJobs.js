@@ -3,8 +3,86 @@
  * Centralizes job management - ALL business logic via database RPCs
  */
 import { supabase } from '../lib/supabase'
+import { cachedRpc, invalidate, mergeEntity, onClear, primeRpc, TTL } from '../lib/entityCache'
 import { useAuth } from './useAuth'
 
+// Cached reads that a job write can change
+const JOB_READS = ['list_jobs', 'get_job_detail']
+
+// Last bundle per job and section set; revalidated with its version token, so
+// an unchanged job costs one tiny round trip
+const bundles = new Map()
+
+// Bundle sections that also have their own list RPC (read by child components)
+const SECTION_RPCS = {
+    comments: 'list_job_comments',
+    photos: 'list_job_photos'
+}
+
+// Checklist taps are coalesced per job and sent as one set_job_tasks_state
+// call once the worker pauses; the last tap on a task wins.
+const TASK_FLUSH_DELAY_MS = 400
+
+// jobId -> { timer, changes: Map(taskId -> { is_completed, original, waiters }) }
+const pendingTaskChanges = new Map()
+// jobId -> in-flight flush, so batches for one job are applied in order
+const taskFlushes = new Map()
+
+const flushTaskChanges = (jobId) => {
+    const batch = pendingTaskChanges.get(jobId)
+    if (!batch) return taskFlushes.get(jobId)
+    pendingTaskChanges.delete(jobId)
+    clearTimeout(batch.timer)
+
+    const previous = taskFlushes.get(jobId)
+    const flush = (async () => {
+        await previous
+        const changes = [...batch.changes.entries()]
+        const { data, error } = await supabase.rpc('set_job_tasks_state', {
+            p_job_id: jobId,
+            p_changes: changes.map(([id, change]) => ({ id, is_completed: change.is_completed }))
+        })
+
+        const failure = error?.message || (data?.success ? null : data?.error || 'Update failed')
+        if (!failure) invalidate('get_job_detail')
+
+        changes.forEach(([, change]) => {
+            const result = failure
+                ? { success: false, is_completed: change.original, error: failure }
+                : { success: true, is_completed: change.is_completed }
+            change.waiters.forEach(resolve => resolve(result))
+        })
+    })()
+
+    taskFlushes.set(jobId, flush)
+    flush.finally(() => {
+        if (taskFlushes.get(jobId) === flush) taskFlushes.delete(jobId)
+    })
+    return flush
+}
+
+// Sign-out or an identity switch: forget stored bundles and drop queued taps
+// (they must not be sent as someone else); their callers get the old state back
+onClear(() => {
+    bundles.clear()
+    pendingTaskChanges.forEach(batch => {
+        clearTimeout(batch.timer)
+        batch.changes.forEach(change => {
+            const result = { success: false, is_completed: change.original, error: 'Signed out' }
+            change.waiters.forEach(resolve => resolve(result))
+        })
+    })
+    pendingTaskChanges.clear()
+    taskFlushes.clear()
+})
+
+if (typeof window !== 'undefined') {
+    // Send queued taps before the page goes away
+    window.addEventListener('pagehide', () => {
+        [...pendingTaskChanges.keys()].forEach(flushTaskChanges)
+    })
+}
+
 export function useJobs() {
     const { effectiveTenantId } = useAuth()
 
@@ -26,10 +104,10 @@ export function useJobs() {
             return { success: false, error: 'Tenant ID not found' }
         }
 
-        const { data, error } = await supabase.rpc('list_jobs', {
+        const { data, error } = await cachedRpc('list_jobs', {
             p_tenant_id: tenantId,
             p_status_filter: statusFilter.length > 0 ? statusFilter : null
-        })
+        }, { entity: 'jobs' })
 
         if (error) {
             return { success: false, error: error.message }
@@ -37,13 +115,70 @@ export function useJobs() {
         return { success: true, jobs: data || [] }
     }
 
+    /**
+     * Fetch one page of jobs via RPC (server-side sort/search/filter, keyset cursor)
+     * @param {Object} options
+     * @param {Array<string>} [options.statusFilter] - Status values to include
+     * @param {string} [options.search] - Matches title, property, service opportunity or status
+     * @param {string} [options.propertyId]
+     * @param {string} [options.dateFrom] - ISO timestamp, inclusive (created_at)
+     * @param {string} [options.dateTo] - ISO timestamp, exclusive (created_at)
+     * @param {string} [options.sortKey] - created_at, title, status, properties.name, service_opportunities.title
+     * @param {string} [options.sortDir] - 'asc' or 'desc'
+     * @param {Object} [options.cursor] - nextCursor from the previous page
+     * @param {number} [options.limit]
+     * @param {boolean} [options.includeTotal] - Also return the total matching count
+     * @returns {Promise<{success: boolean, jobs?: Array, nextCursor?: Object, totalCount?: number, error?: string}>}
+     */
+    const fetchJobsPage = async ({
+        statusFilter = [],
+        search = '',
+        propertyId = null,
+        dateFrom = null,
+        dateTo = null,
+        sortKey = 'created_at',
+        sortDir = 'desc',
+        cursor = null,
+        limit = 50,
+        includeTotal = false
+    } = {}) => {
+        const tenantId = effectiveTenantId.value
+        if (!tenantId) {
+            return { success: false, error: 'Tenant ID not found' }
+        }
+
+        const { data, error } = await supabase.rpc('list_jobs_page', {
+            p_tenant_id: tenantId,
+            p_status_filter: statusFilter.length > 0 ? statusFilter : null,
+            p_search: search?.trim() || null,
+            p_property_id: propertyId,
+            p_date_from: dateFrom,
+            p_date_to: dateTo,
+            p_sort_key: sortKey,
+            p_sort_dir: sortDir,
+            p_cursor: cursor,
+            p_limit: limit,
+            p_include_total: includeTotal
+        })
+
+        if (error) {
+            return { success: false, error: error.message }
+        }
+        return {
+            success: true,
+            jobs: (data?.jobs || []).map(job => mergeEntity('jobs', job)),
+            nextCursor: data?.next_cursor || null,
+            totalCount: data?.total_count ?? null
+        }
+    }
+
     /**
      * Get full job detail via RPC
      * @param {string} jobId
      * @returns {Promise<{success: boolean, job?: Object, error?: string}>}
      */
     const getJobDetail = async (jobId) => {
-        const { data, error } = await supabase.rpc('get_job_detail', { p_job_id: jobId })
+        const { data, error } = await cachedRpc('get_job_detail', { p_job_id: jobId }, { ttl: TTL.DETAIL })
 
         if (error) {
             return { success: false, error: error.message }
@@ -54,6 +189,45 @@ export function useJobs() {
         return { success: true, job: data }
     }
 
+    /**
+     * Get a job with any of its related sections in one call
+     * Sends the cached version so an unchanged job is answered with
+     * "not modified". Comments and photos also prime the list caches used by
+     * JobComments / JobPhotos.
+     * @param {string} jobId
+     * @param {Array<string>} [sections] - tasks, assignments, comments, photos, timers, visits, artifacts, dispositions (default: all)
+     * @returns {Promise<{success: boolean, job?: Object, notModified?: boolean, error?: string}>}
+     */
+    const getJobBundle = async (jobId, sections = null) => {
+        const sectionList = sections ? [...new Set(sections)].sort() : null
+        const key = `${jobId}:${sectionList ? sectionList.join(',') : '*'}`
+        const previous = bundles.get(key)
+
+        const { data, error } = await supabase.rpc('get_job_bundle', {
+            p_job_id: jobId,
+            p_sections: sectionList,
+            p_if_version: previous?.version || null
+        })
+
+        if (error) {
+            return { success: false, error: error.message }
+        }
+        if (data?.error) {
+            bundles.delete(key)
+            return { success: false, error: data.error }
+        }
+        const notModified = !!(data.not_modified && previous)
+        const job = notModified ? previous : data
+
+        // The list caches expire on their own TTL, so an unchanged bundle
+        // primes them again too
+        if (!notModified) bundles.set(key, data)
+        Object.entries(SECTION_RPCS).forEach(([section, fn]) => {
+            if (job[section]) primeRpc(fn, { p_job_id: jobId }, job[section])
+        })
+        return { success: true, job, notModified }
+    }
+
     /**
      * Update job status via RPC
      * @param {string} jobId
@@ -69,6 +243,7 @@ export function useJobs() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate(...JOB_READS)
         return data
     }
 
@@ -83,9 +258,45 @@ export function useJobs() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate('get_job_detail')
         return data
     }
 
+    /**
+     * Set a task's completion; taps are debounced and sent per job in one call
+     * @param {string} jobId
+     * @param {string} taskId
+     * @param {boolean} isCompleted - Desired state (already shown optimistically)
+     * @returns {Promise<{success: boolean, is_completed: boolean, error?: string}>}
+     *   is_completed is the state to show: the requested one, or the state
+     *   before the batch when it failed
+     */
+    const setTaskCompleted = (jobId, taskId, isCompleted) => {
+        let batch = pendingTaskChanges.get(jobId)
+        if (!batch) {
+            batch = { timer: null, changes: new Map() }
+            pendingTaskChanges.set(jobId, batch)
+        }
+
+        const change = batch.changes.get(taskId) || { original: !isCompleted, waiters: [] }
+        change.is_completed = isCompleted
+        batch.changes.set(taskId, change)
+
+        clearTimeout(batch.timer)
+        batch.timer = setTimeout(() => flushTaskChanges(jobId), TASK_FLUSH_DELAY_MS)
+
+        return new Promise(resolve => change.waiters.push(resolve))
+    }
+
+    /**
+     * Send queued task changes now (e.g. before leaving the job)
+     * @param {string} jobId
+     * @returns {Promise<void>}
+     */
+    const flushTasks = async (jobId) => {
+        await flushTaskChanges(jobId)
+    }
+
     /**
      * Add comment to job via RPC
      * @param {string} jobId
@@ -103,6 +314,7 @@ export function useJobs() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate('list_job_comments')
         return data
     }
 
@@ -112,7 +324,7 @@ export function useJobs() {
      * @returns {Promise<{success: boolean, comments?: Array, error?: string}>}
      */
     const listComments = async (jobId) => {
-        const { data, error } = await supabase.rpc('list_job_comments', { p_job_id: jobId })
+        const { data, error } = await cachedRpc('list_job_comments', { p_job_id: jobId }, { ttl: TTL.DETAIL })
 
         if (error) {
             return { success: false, error: error.message }
@@ -137,6 +349,7 @@ export function useJobs() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate('list_job_photos')
         return data
     }
 
@@ -146,7 +359,7 @@ export function useJobs() {
      * @returns {Promise<{success: boolean, photos?: Array, error?: string}>}
      */
     const listPhotos = async (jobId) => {
-        const { data, error } = await supabase.rpc('list_job_photos', { p_job_id: jobId })
+        const { data, error } = await cachedRpc('list_job_photos', { p_job_id: jobId }, { ttl: TTL.DETAIL })
 
         if (error) {
             return { success: false, error: error.message }
@@ -165,6 +378,7 @@ export function useJobs() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate('list_job_photos')
         return data
     }
 
@@ -183,6 +397,7 @@ export function useJobs() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate('get_job_detail')
         return data
     }
 
@@ -201,6 +416,7 @@ export function useJobs() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate('get_job_detail')
         return data
     }
 
@@ -233,16 +449,21 @@ export function useJobs() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate(...JOB_READS)
         return { success: true, disposition_id: data }
     }
 
     return {
         // List
         fetchJobs,
+        fetchJobsPage,
         // Detail
         getJobDetail,
+        getJobBundle,
         updateJobStatus,
         toggleTask,
+        setTaskCompleted,
+        flushTasks,
         disposeJob,
         // Comments
         addComment,
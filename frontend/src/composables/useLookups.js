@@ -1,8 +1,10 @@
 /**
  * useLookups composable
  * Provides lightweight lookup data for dropdowns across the app
+ * (read through the shared entity cache, so modals don't refetch on every open)
  */
 import { supabase } from '../lib/supabase'
+import { cached, cachedRpc, TTL } from '../lib/entityCache'
 import { useAuth } from './useAuth'
 
 export function useLookups() {
@@ -18,9 +20,9 @@ export function useLookups() {
             return { success: false, error: 'Tenant ID not found' }
         }
 
-        const { data, error } = await supabase.rpc('lookup_people', {
+        const { data, error } = await cachedRpc('lookup_people', {
             p_tenant_id: tenantId
-        })
+        }, { ttl: TTL.LOOKUP })
 
         if (error) {
             return { success: false, error: error.message }
@@ -38,9 +40,9 @@ export function useLookups() {
             return { success: false, error: 'Tenant ID not found' }
         }
 
-        const { data, error } = await supabase.rpc('lookup_bom_templates', {
+        const { data, error } = await cachedRpc('lookup_bom_templates', {
             p_tenant_id: tenantId
-        })
+        }, { ttl: TTL.LOOKUP })
 
         if (error) {
             return { success: false, error: error.message }
@@ -54,9 +56,26 @@ export function useLookups() {
      * @returns {Promise<{success: boolean, items?: Array, error?: string}>}
      */
     const getBOMTemplateItems = async (templateId) => {
-        const { data, error } = await supabase.rpc('get_bom_template_items', {
+        const { data, error } = await cachedRpc('get_bom_template_items', {
             p_template_id: templateId
-        })
+        }, { ttl: TTL.LOOKUP })
+
+        if (error) {
+            return { success: false, error: error.message }
+        }
+        return { success: true, items: data || [] }
+    }
+
+    /**
+     * Get the master item catalog (inventory item suggestions)
+     * @returns {Promise<{success: boolean, items?: Array, error?: string}>}
+     */
+    const lookupMasterItemCatalog = async () => {
+        const { data, error } = await cached(
+            'master_item_catalog:',
+            () => supabase.from('master_item_catalog').select('*'),
+            { ttl: TTL.LOOKUP }
+        )
 
         if (error) {
             return { success: false, error: error.message }
@@ -67,6 +86,7 @@ export function useLookups() {
     return {
         lookupPeople,
         lookupBOMTemplates,
-        getBOMTemplateItems
+        getBOMTemplateItems,
+        lookupMasterItemCatalog
     }
 }
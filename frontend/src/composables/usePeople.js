@@ -3,10 +3,14 @@
  * Centralizes person/user management - ALL business logic via database RPCs
  */
 import { supabase } from '../lib/supabase'
+import { cachedRpc, invalidate, TTL } from '../lib/entityCache'
 import { useAuth } from './useAuth'
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8080'
 
+// Cached reads that any person write can change
+const PEOPLE_READS = ['list_people', 'get_person_detail', 'lookup_people']
+
 export function usePeople() {
     const { effectiveTenantId } = useAuth()
 
@@ -20,7 +24,7 @@ export function usePeople() {
             return { success: false, error: 'Tenant ID not found' }
         }
 
-        const { data, error } = await supabase.rpc('list_people', { p_tenant_id: tenantId })
+        const { data, error } = await cachedRpc('list_people', { p_tenant_id: tenantId }, { entity: 'people' })
 
         if (error) {
             return { success: false, error: error.message }
@@ -34,7 +38,7 @@ export function usePeople() {
      * @returns {Promise<{success: boolean, person?: Object, error?: string}>}
      */
     const getPersonDetail = async (personId) => {
-        const { data, error } = await supabase.rpc('get_person_detail', { p_person_id: personId })
+        const { data, error } = await cachedRpc('get_person_detail', { p_person_id: personId }, { ttl: TTL.DETAIL })
 
         if (error) {
             return { success: false, error: error.message }
@@ -103,6 +107,7 @@ export function usePeople() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate(...PEOPLE_READS)
         return data
     }
 
@@ -132,6 +137,7 @@ export function usePeople() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate(...PEOPLE_READS)
         return data
     }
 
@@ -146,6 +152,7 @@ export function usePeople() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate(...PEOPLE_READS)
         return data
     }
 
@@ -154,7 +161,7 @@ export function usePeople() {
      * @returns {Promise<{success: boolean, roles?: Array, error?: string}>}
      */
     const listRoles = async () => {
-        const { data, error } = await supabase.rpc('list_roles')
+        const { data, error } = await cachedRpc('list_roles', {}, { ttl: TTL.LOOKUP })
 
         if (error) {
             return { success: false, error: error.message }
@@ -176,6 +183,7 @@ export function usePeople() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate(...PEOPLE_READS)
         return { success: true }
     }
 
@@ -3,8 +3,12 @@
  * Centralizes property management operations
  */
 import { supabase } from '../lib/supabase'
+import { cachedRpc, invalidate, TTL } from '../lib/entityCache'
 import { useAuth } from './useAuth'
 
+// Cached reads that any property write can change
+const PROPERTY_READS = ['get_property_detail', 'list_properties', 'get_calendar_events']
+
 export function useProperties() {
     const { userProfile, effectiveTenantId } = useAuth()
 
@@ -14,7 +18,7 @@ export function useProperties() {
      * @returns {Promise<{success: boolean, property?: Object, error?: string}>}
      */
     const getPropertyDetail = async (propertyId) => {
-        const { data, error } = await supabase.rpc('get_property_detail', { p_property_id: propertyId })
+        const { data, error } = await cachedRpc('get_property_detail', { p_property_id: propertyId }, { ttl: TTL.DETAIL })
 
         if (error) {
             return { success: false, error: error.message }
@@ -97,6 +101,7 @@ export function useProperties() {
             }
 
             if (error) throw error
+            invalidate(...PROPERTY_READS)
             return { success: true, propertyId: id }
         } catch (e) {
             return { success: false, error: e.message }
@@ -117,6 +122,7 @@ export function useProperties() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate(...PROPERTY_READS)
         return { success: true }
     }
 
@@ -134,10 +140,10 @@ export function useProperties() {
             return { success: false, error: 'Tenant ID not found' }
         }
 
-        const { data, error } = await supabase.rpc('list_properties', {
+        const { data, error } = await cachedRpc('list_properties', {
             p_tenant_id: tenantId,
             p_include_archived: false
-        })
+        }, { entity: 'properties' })
 
         if (error) {
             return { success: false, error: error.message }
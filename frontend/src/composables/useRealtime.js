@@ -0,0 +1,112 @@
+/**
+ * useRealtime composable
+ * Subscribes to Postgres row changes (Supabase Realtime) and applies them to the
+ * shared entity cache (lib/entityCache), so open views can patch what they show
+ * instead of refetching whole datasets.
+ *
+ * Usage:
+ *   const { onRowChange } = useRealtime()
+ *   onRowChange('jobs', ({ eventType, row, id, previous }) => { ... })
+ * Handlers registered during setup() are removed when the component unmounts.
+ */
+import { getCurrentInstance, onUnmounted } from 'vue'
+import { supabase } from '../lib/supabase'
+import { entities, mergeEntity, removeEntity } from '../lib/entityCache'
+import { useAuth } from './useAuth'
+
+// `${tenantId}:${table}` -> { channel, handlers: Set<Function> }
+const subscriptions = new Map()
+
+// Realtime only sends the primary key of the old row on RLS tables, so the
+// previous state comes from the cache: a copy taken before the change lands
+const applyDelta = (table, payload) => {
+    const row = payload.eventType === 'DELETE' ? payload.old : payload.new
+    const id = row?.id
+    if (!id) return null
+
+    const cachedRow = entities[table]?.[id]
+    const previous = cachedRow ? { ...cachedRow } : null
+
+    if (payload.eventType === 'DELETE') {
+        removeEntity(table, id)
+    } else {
+        mergeEntity(table, payload.new)
+    }
+
+    return { eventType: payload.eventType, table, id, row, previous }
+}
+
+export function useRealtime() {
+    const { effectiveTenantId } = useAuth()
+    const ownUnsubscribes = []
+
+    /**
+     * Listen for INSERT / UPDATE / DELETE on a tenant-scoped table.
+     * One channel per tenant+table is shared by every listener.
+     * @param {string} table - Table with a tenant_id column (jobs, visits, calendar_events, ...)
+     * @param {Function} handler - ({ eventType, table, id, row, previous }) => void;
+     *   row is only { id } for a DELETE, previous is the cached row before the change (or null)
+     * @returns {Function} unsubscribe
+     */
+    const onRowChange = (table, handler) => {
+        const tenantId = effectiveTenantId.value
+        if (!tenantId) return () => {}
+
+        const key = `${tenantId}:${table}`
+        let sub = subscriptions.get(key)
+        if (!sub) {
+            const handlers = new Set()
+            // DELETEs cannot be filtered (the old row only has the primary key),
+            // so they arrive for every tenant; handlers ignore ids they don't hold
+            const channel = supabase
+                .channel(`rt-${key}`)
+                .on('postgres_changes',
+                    { event: 'INSERT', schema: 'public', table, filter: `tenant_id=eq.${tenantId}` },
+                    (payload) => dispatch(table, handlers, payload))
+                .on('postgres_changes',
+                    { event: 'UPDATE', schema: 'public', table, filter: `tenant_id=eq.${tenantId}` },
+                    (payload) => dispatch(table, handlers, payload))
+                .on('postgres_changes',
+                    { event: 'DELETE', schema: 'public', table },
+                    (payload) => dispatch(table, handlers, payload))
+                .subscribe()
+            sub = { channel, handlers }
+            subscriptions.set(key, sub)
+        }
+        sub.handlers.add(handler)
+
+        const unsubscribe = () => {
+            sub.handlers.delete(handler)
+            if (sub.handlers.size === 0 && subscriptions.get(key) === sub) {
+                supabase.removeChannel(sub.channel)
+                subscriptions.delete(key)
+            }
+        }
+        ownUnsubscribes.push(unsubscribe)
+        return unsubscribe
+    }
+
+    /**
+     * Latest realtime row for an entity, if one has been received
+     * @param {string} table
+     * @param {string} id
+     * @returns {Object|undefined}
+     */
+    const getEntity = (table, id) => entities[table]?.[id]
+
+    if (getCurrentInstance()) {
+        onUnmounted(() => ownUnsubscribes.forEach(unsubscribe => unsubscribe()))
+    }
+
+    return {
+        entities,
+        onRowChange,
+        getEntity
+    }
+}
+
+function dispatch(table, handlers, payload) {
+    const delta = applyDelta(table, payload)
+    if (!delta) return
+    handlers.forEach(handler => handler(delta))
+}
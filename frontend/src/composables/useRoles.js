@@ -3,6 +3,7 @@
  * Centralizes role management via database RPCs
  */
 import { supabase } from '../lib/supabase'
+import { invalidate } from '../lib/entityCache'
 import { useAuth } from './useAuth'
 
 export function useRoles() {
@@ -51,6 +52,7 @@ export function useRoles() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate('list_roles', 'lookup_people')
         return { success: true, role_id: data }
     }
 
@@ -69,6 +71,7 @@ export function useRoles() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate('list_roles', 'lookup_people')
         return { success: true }
     }
 
@@ -87,6 +90,7 @@ export function useRoles() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate('list_roles', 'lookup_people')
         return { success: true }
     }
 
@@ -103,6 +107,7 @@ export function useRoles() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate('list_roles', 'lookup_people')
         return { success: true }
     }
 
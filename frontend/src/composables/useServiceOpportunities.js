@@ -3,8 +3,40 @@
  * Centralizes service opportunity management
  */
 import { supabase } from '../lib/supabase'
+import { cached, invalidate, mergeEntity, staleIds, TTL } from '../lib/entityCache'
 import { useAuth } from './useAuth'
 
+// One list_service_opportunities_page call, in the { data, error } shape the cache expects.
+// Workflow jobs come back embedded per opportunity and are split out into jobsMap.
+const loadOpportunities = async ({ tenantId, statusFilter, limit, cursor }) => {
+    const { data, error } = await supabase.rpc('list_service_opportunities_page', {
+        p_tenant_id: tenantId,
+        p_status_filter: statusFilter.length > 0 ? statusFilter : null,
+        p_cursor: cursor,
+        p_limit: limit
+    })
+
+    if (error) {
+        return { data: null, error }
+    }
+
+    const jobsMap = {}
+    const opportunities = (data?.opportunities || []).map(({ jobs, ...o }) => {
+        if (jobs?.length) jobsMap[o.id] = jobs
+        return mergeEntity('service_opportunities', o)
+    })
+
+    return {
+        data: {
+            opportunities,
+            jobsMap,
+            nextCursor: data?.next_cursor || null,
+            counts: data?.counts || {}
+        },
+        error: null
+    }
+}
+
 export function useServiceOpportunities() {
     const { effectiveTenantId } = useAuth()
 
@@ -51,6 +83,7 @@ export function useServiceOpportunities() {
                     .update(payload)
                     .eq('id', id)
                 if (error) throw error
+                invalidate('service_opportunities')
                 return { success: true, opportunityId: id }
             } else {
                 // Create new
@@ -65,6 +98,7 @@ export function useServiceOpportunities() {
                     .select()
                     .single()
                 if (error) throw error
+                invalidate('service_opportunities')
                 return { success: true, opportunityId: data?.id }
             }
         } catch (e) {
@@ -86,6 +120,7 @@ export function useServiceOpportunities() {
         if (error) {
             return { success: false, error: error.message }
         }
+        invalidate('service_opportunities')
         return { success: true }
     }
 
@@ -100,17 +135,17 @@ export function useServiceOpportunities() {
         }
 
         const [propsResult, templatesResult] = await Promise.all([
-            supabase.from('properties')
+            cached(`property_options:${tenantId}`, () => supabase.from('properties')
                 .select('id, name')
                 .eq('tenant_id', tenantId)
                 .eq('status', 'active')
                 .is('deleted_at', null)
-                .order('name'),
-            supabase.from('service_templates')
+                .order('name'), { ttl: TTL.LOOKUP }),
+            cached(`service_template_options:${tenantId}`, () => supabase.from('service_templates')
                 .select('id, name')
                 .eq('tenant_id', tenantId)
                 .is('deleted_at', null)
-                .order('name')
+                .order('name'), { ttl: TTL.LOOKUP })
         ])
 
         if (propsResult.error) {
@@ -144,6 +179,7 @@ export function useServiceOpportunities() {
             .eq('id', id)
 
         if (error) return { success: false, error: error.message }
+        invalidate('service_opportunities')
         return { success: true }
     }
 
@@ -163,6 +199,7 @@ export function useServiceOpportunities() {
             .eq('id', id)
 
         if (error) return { success: false, error: error.message }
+        invalidate('service_opportunities')
         return { success: true }
     }
 
@@ -179,6 +216,7 @@ export function useServiceOpportunities() {
         })
 
         if (error) return { success: false, error: error.message }
+        invalidate('service_opportunities')
         return { success: true }
     }
 
@@ -198,108 +236,135 @@ export function useServiceOpportunities() {
             .eq('id', id)
 
         if (error) return { success: false, error: error.message }
+        invalidate('service_opportunities')
         return { success: true }
     }
 
     /**
-     * Expire any snoozes that are past their snooze_until date
-     * @returns {Promise<{success: boolean, error?: string}>}
-     */
-    const expireSnoozes = async () => {
-        const { error } = await supabase.rpc('update_expired_snoozes')
-        if (error) return { success: false, error: error.message }
-        return { success: true }
-    }
-
-    /**
-     * Fetch service opportunities with filtering and related jobs
+     * Fetch a page of service opportunities with their workflow jobs and status counts
+     * Expired snoozes are reported as 'Open' by the server without writing to them.
      * @param {Object} options
      * @param {Array<string>} [options.statusFilter] - Status values to include
-     * @param {number} [options.limit] - Max records to fetch (default: 100)
-     * @param {number} [options.offset] - Offset for pagination
-     * @returns {Promise<{success: boolean, opportunities?: Array, jobsMap?: Object, error?: string}>}
+     * @param {number} [options.limit] - Page size (default: 100)
+     * @param {Object} [options.cursor] - nextCursor from the previous page
+     * @returns {Promise<{success: boolean, opportunities?: Array, jobsMap?: Object, nextCursor?: Object, counts?: Object, error?: string}>}
      */
-    const fetchOpportunities = async ({ statusFilter = [], limit = 100, offset = 0 } = {}) => {
+    const fetchOpportunities = async ({ statusFilter = [], limit = 100, cursor = null } = {}) => {
         const tenantId = effectiveTenantId.value
         if (!tenantId) {
             return { success: false, error: 'Tenant ID not found' }
         }
 
-        // Auto-expire snoozes first
-        await expireSnoozes()
+        const key = `service_opportunities:${JSON.stringify([tenantId, statusFilter, limit, cursor])}`
+        const { data, error } = await cached(key, () => loadOpportunities({ tenantId, statusFilter, limit, cursor }))
 
-        // Base query
-        let query = supabase
-            .from('service_opportunities')
-            .select(`
-                *,
-                properties (name),
-                service_templates (name)
-            `)
-            .eq('tenant_id', tenantId)
-            .is('deleted_at', null)
-
-        // Status filtering
-        if (statusFilter.length > 0) {
-            query = query.in('status', statusFilter)
+        if (error) {
+            return { success: false, error: error.message }
         }
 
-        // Apply pagination
-        if (limit) {
-            query = query.range(offset, offset + limit - 1)
+        // Callers may reorder the list; the rows themselves stay shared
+        return {
+            success: true,
+            opportunities: [...data.opportunities],
+            jobsMap: data.jobsMap,
+            nextCursor: data.nextCursor,
+            counts: data.counts
         }
+    }
 
-        const { data: opps, error } = await query.order('created_at', { ascending: false })
+    /**
+     * Check whether any of the given opportunities (or the job fields the
+     * list shows) changed since they were loaded; drops the cached lists if so
+     * @param {Array<string>} ids
+     * @returns {Promise<{success: boolean, changed?: boolean, error?: string}>}
+     */
+    const checkForChanges = async (ids) => {
+        const { changed, removed, error } = await staleIds('service_opportunities', ids)
+        if (error) return { success: false, error: error.message }
 
-        if (error) {
-            return { success: false, error: error.message }
-        }
+        const hasChanges = changed.length > 0 || removed.length > 0
+        if (hasChanges) invalidate('service_opportunities')
+        return { success: true, changed: hasChanges }
+    }
 
-        const opportunities = opps || []
-
-        // Fetch active jobs for workflow visualization
-        let jobsMap = {}
-        if (opportunities.length > 0) {
-            const ids = opportunities.map(o => o.id).filter(id => !!id)
-            if (ids.length > 0) {
-                const { data: jobs } = await supabase
-                    .from('jobs')
-                    .select('id, service_opportunity_id, title, status, sort_order')
-                    .in('service_opportunity_id', ids)
-
-                if (jobs) {
-                    jobs.forEach(j => {
-                        if (!jobsMap[j.service_opportunity_id]) jobsMap[j.service_opportunity_id] = []
-                        jobsMap[j.service_opportunity_id].push(j)
-                    })
-                }
-            }
+    /**
+     * Generate workflow jobs and tasks for many opportunities at once
+     * Opportunities that already have jobs, have no template or are not in
+     * the current tenant are skipped and reported.
+     * @param {Array<string>} opportunityIds - At most 1000
+     * @returns {Promise<{success: boolean, jobsCreated?: number, generated?: Array, skipped?: Array, error?: string}>}
+     */
+    const generateWorkflows = async (opportunityIds) => {
+        const tenantId = effectiveTenantId.value
+        if (!tenantId) {
+            return { success: false, error: 'Tenant ID not found' }
         }
 
-        return { success: true, opportunities, jobsMap }
+        const { data, error } = await supabase.rpc('generate_service_workflows', {
+            p_tenant_id: tenantId,
+            p_service_opportunity_ids: opportunityIds
+        })
+
+        if (error) return { success: false, error: error.message }
+        invalidate('service_opportunities', 'list_jobs')
+        return {
+            success: true,
+            jobsCreated: data.jobs_created,
+            generated: data.generated,
+            skipped: data.skipped
+        }
     }
 
     /**
-     * Fetch count of snoozed opportunities
-     * @returns {Promise<{success: boolean, count?: number, error?: string}>}
+     * Create one opportunity per matching property for a template (campaigns)
+     * Properties that already have an open opportunity for the template are
+     * skipped. Workflows are generated immediately for small batches and
+     * queued for large ones (workflowMode 'queued').
+     * @param {Object} options
+     * @param {string} options.serviceTemplateId
+     * @param {Array<string>} [options.propertyIds] - Explicit properties; overrides propertyFilter
+     * @param {Object} [options.propertyFilter] - { status, cities, states, zips }
+     * @param {Object} [options.dueDateRule] - { type: 'fixed', date } | { type: 'days_from_now', days } | { type: 'spread', start, end }
+     * @param {string} [options.title] - Defaults to the template name
+     * @param {boolean} [options.runAsync] - Force queued (true) or immediate (false) generation
+     * @returns {Promise<{success: boolean, opportunitiesCreated?: number, propertiesSkipped?: number, workflowMode?: string, jobsCreated?: number, queuedBatches?: number, opportunityIds?: Array<string>, error?: string}>}
      */
-    const fetchSnoozedCount = async () => {
+    const createOpportunitiesBulk = async ({
+        serviceTemplateId,
+        propertyIds = null,
+        propertyFilter = null,
+        dueDateRule = null,
+        title = null,
+        runAsync = null
+    }) => {
         const tenantId = effectiveTenantId.value
         if (!tenantId) {
             return { success: false, error: 'Tenant ID not found' }
         }
 
-        const { count, error } = await supabase
-            .from('service_opportunities')
-            .select('*', { count: 'exact', head: true })
-            .eq('tenant_id', tenantId)
-            .eq('status', 'Snoozed')
-            .is('deleted_at', null)
+        const { data, error } = await supabase.rpc('create_service_opportunities_bulk', {
+            p_tenant_id: tenantId,
+            p_service_template_id: serviceTemplateId,
+            p_property_ids: propertyIds,
+            p_property_filter: propertyFilter,
+            p_due_date_rule: dueDateRule,
+            p_title: title,
+            p_async: runAsync
+        })
 
-        if (error) {
-            return { success: false, error: error.message }
+        if (error) return { success: false, error: error.message }
+        if (!data.success) return { success: false, error: data.error }
+
+        invalidate('service_opportunities', 'list_jobs')
+        return {
+            success: true,
+            opportunitiesCreated: data.opportunities_created,
+            propertiesSkipped: data.properties_skipped,
+            workflowMode: data.workflow_mode,
+            jobsCreated: data.jobs_created,
+            queuedBatches: data.queued_batches,
+            opportunityIds: data.opportunity_ids
         }
-        return { success: true, count: count || 0 }
     }
 
     /**
@@ -323,9 +388,10 @@ export function useServiceOpportunities() {
         unsnoozeOpportunity,
         dismissOpportunity,
         undismissOpportunity,
-        expireSnoozes,
         fetchOpportunities,
-        fetchSnoozedCount,
+        checkForChanges,
+        generateWorkflows,
+        createOpportunitiesBulk,
         getWorkflowColor
     }
 }
@@ -2,31 +2,210 @@
  * useWorkerStatus composable
  * Handles worker status logging and artifact submission
  */
+import { ref } from 'vue'
 import { supabase } from '../lib/supabase'
+import * as outbox from '../lib/statusOutbox'
+
+// Status events go through the IndexedDB outbox and are sent in ordered
+// batches, so taps made offline are kept and replayed safely (idempotency keys).
+// The outbox is per user: only the signed-in user's events are ever sent.
+const BATCH_SIZE = 50
+const RETRY_DELAYS_MS = [2000, 5000, 15000, 30000, 60000]
+
+const pendingCount = ref(0)
+let flushing = null
+let retryTimeout = null
+let retryAttempt = 0
+
+const currentUserId = async () => {
+    const { data: { session } } = await supabase.auth.getSession()
+    return session?.user?.id ?? null
+}
+
+const refreshPendingCount = async () => {
+    const userId = await currentUserId()
+    pendingCount.value = userId ? await outbox.count(userId) : 0
+}
+
+const scheduleRetry = () => {
+    clearTimeout(retryTimeout)
+    const delay = RETRY_DELAYS_MS[Math.min(retryAttempt, RETRY_DELAYS_MS.length - 1)]
+    retryAttempt++
+    retryTimeout = setTimeout(() => flushOutbox(), delay)
+}
+
+// Data exceptions (22xxx: bad uuid, timestamp or number) and integrity
+// violations (23xxx) come from the event contents and fail the same way on
+// every retry. Anything else (network, expired JWT, PGRST errors, the
+// RPC's session checks) is about the request, not the events.
+const isDataError = (error) => /^2[23]/.test(error.code || '')
+
+// Sends events and returns the server verdicts. On a data error the batch is
+// split until the events causing it are isolated, and those come back as
+// `failed`. Other failures are thrown so the whole batch stays queued and is
+// retried with backoff.
+const sendEvents = async (events) => {
+    const { data, error } = await supabase.rpc('log_worker_statuses_batch', {
+        p_events: events.map(({ seq, user_id, ...event }) => event)
+    })
+    if (!error) return { ...data, failed: [] }
+    if (!isDataError(error)) throw error
+
+    if (events.length === 1) {
+        return {
+            accepted: [],
+            duplicates: [],
+            rejected: [],
+            failed: [{ event: events[0], error: error.message }]
+        }
+    }
+    const middle = Math.ceil(events.length / 2)
+    const first = await sendEvents(events.slice(0, middle))
+    const second = await sendEvents(events.slice(middle))
+    return {
+        accepted: [...first.accepted, ...second.accepted],
+        duplicates: [...first.duplicates, ...second.duplicates],
+        rejected: [...first.rejected, ...second.rejected],
+        failed: [...first.failed, ...second.failed]
+    }
+}
+
+// Sends the user's queued events oldest first; returns the server verdict per key
+const sendBatches = async (userId) => {
+    const results = new Map()
+    while (true) {
+        const events = await outbox.peek(userId, BATCH_SIZE)
+        if (events.length === 0) break
+
+        const data = await sendEvents(events)
+
+        const done = []
+        data.accepted.forEach(({ idempotency_key, id }) => {
+            results.set(idempotency_key, { success: true, logId: id })
+            done.push(idempotency_key)
+        })
+        data.duplicates.forEach(key => {
+            results.set(key, { success: true })
+            done.push(key)
+        })
+        data.rejected.forEach(({ idempotency_key, reason }) => {
+            results.set(idempotency_key, { success: false, error: reason })
+            done.push(idempotency_key)
+        })
+        data.failed.forEach(({ event, error }) => {
+            results.set(event.idempotency_key, { success: false, error })
+        })
+        await outbox.remove(done)
+        await outbox.deadLetter(data.failed)
+        if (events.length < BATCH_SIZE) break
+    }
+    return results
+}
+
+/**
+ * Send the signed-in user's outbox. Concurrent calls share one flush; on
+ * network or session failure the events stay queued and a retry is scheduled.
+ * @returns {Promise<Map<string, {success: boolean, logId?: string, error?: string}>>}
+ */
+export const flushOutbox = () => {
+    if (flushing) return flushing
+    flushing = currentUserId()
+        .then(userId => userId ? sendBatches(userId) : new Map())
+        .then(results => {
+            retryAttempt = 0
+            clearTimeout(retryTimeout)
+            return results
+        })
+        .catch(() => {
+            scheduleRetry()
+            return new Map()
+        })
+        .finally(async () => {
+            flushing = null
+            await refreshPendingCount()
+        })
+    return flushing
+}
+
+// Artifacts are immutable, so every submission carries an idempotency key:
+// a request that reached the server but lost its response is retried with the
+// same key and submit_artifact returns the artifact it already stored.
+const ARTIFACT_RETRY_DELAYS_MS = [1000, 3000]
+
+const submitArtifact = async (params, idempotencyKey) => {
+    // Callers pass null before their first attempt
+    idempotencyKey = idempotencyKey ?? crypto.randomUUID()
+    for (let attempt = 0; ; attempt++) {
+        const { data, error } = await supabase.rpc('submit_artifact', {
+            ...params,
+            p_idempotency_key: idempotencyKey
+        })
+        if (!error) return { success: true, artifactId: data, idempotencyKey }
+
+        // Database errors carry a code; network failures do not and are retried
+        if (error.code || attempt >= ARTIFACT_RETRY_DELAYS_MS.length) {
+            return { success: false, error: error.message, idempotencyKey }
+        }
+        await new Promise(resolve => setTimeout(resolve, ARTIFACT_RETRY_DELAYS_MS[attempt]))
+    }
+}
+
+if (typeof window !== 'undefined') {
+    window.addEventListener('online', () => flushOutbox())
+    // Events left over from a previous session of whoever is signed in now,
+    // or held back by an expired token
+    supabase.auth.onAuthStateChange((event) => {
+        if (event === 'SIGNED_OUT') {
+            clearTimeout(retryTimeout)
+            pendingCount.value = 0
+        } else if (event === 'SIGNED_IN' || event === 'INITIAL_SESSION' || event === 'TOKEN_REFRESHED') {
+            // Outside the auth callback, which must not wait on other auth calls
+            setTimeout(() => {
+                refreshPendingCount().then(() => {
+                    if (pendingCount.value > 0) flushOutbox()
+                })
+            }, 0)
+        }
+    })
+}
 
 export function useWorkerStatus() {
 
     /**
      * Log worker status for a visit
+     * The event is stored in the outbox first and sent with any other queued
+     * events; when offline it is sent automatically once back online.
      * @param {string} visitId
      * @param {string} status - 'On My Way' | 'Started' | 'Paused' | 'Finished' | 'No-show'
      * @param {Object} [location] - { latitude, longitude }
      * @param {Object} [deviceInfo] - Device metadata
-     * @returns {Promise<{success: boolean, logId?: string, error?: string}>}
+     * @returns {Promise<{success: boolean, logId?: string, queued?: boolean, error?: string}>}
      */
     const logStatus = async (visitId, status, location = null, deviceInfo = null) => {
-        const { data, error } = await supabase.rpc('log_worker_status', {
-            p_visit_id: visitId,
-            p_status: status,
-            p_latitude: location?.latitude || null,
-            p_longitude: location?.longitude || null,
-            p_device_info: deviceInfo || null
-        })
-
-        if (error) {
-            return { success: false, error: error.message }
+        const key = crypto.randomUUID()
+        try {
+            const userId = await currentUserId()
+            if (!userId) return { success: false, error: 'Not signed in' }
+            await outbox.enqueue(userId, {
+                idempotency_key: key,
+                visit_id: visitId,
+                status,
+                recorded_at: new Date().toISOString(),
+                latitude: location?.latitude || null,
+                longitude: location?.longitude || null,
+                device_info: deviceInfo || null
+            })
+        } catch (e) {
+            return { success: false, error: e.message }
         }
-        return { success: true, logId: data }
+
+        // Flushes already running may have read the outbox before this event
+        await flushing
+        const results = await flushOutbox()
+        if (results.has(key)) return results.get(key)
+
+        await refreshPendingCount()
+        return { success: true, queued: true }
     }
 
     /**
@@ -34,20 +213,16 @@ export function useWorkerStatus() {
      * @param {string} visitId
      * @param {string} jobId
      * @param {Object} payload - Artifact content
-     * @returns {Promise<{success: boolean, artifactId?: string, error?: string}>}
+     * @param {string} [idempotencyKey] - Key of an earlier failed attempt, to retry it
+     * @returns {Promise<{success: boolean, artifactId?: string, idempotencyKey: string, error?: string}>}
      */
-    const submitCompletion = async (visitId, jobId, payload) => {
-        const { data, error } = await supabase.rpc('submit_artifact', {
+    const submitCompletion = (visitId, jobId, payload, idempotencyKey) => {
+        return submitArtifact({
             p_visit_id: visitId,
             p_job_id: jobId,
             p_artifact_type: 'CompletionArtifact',
             p_payload: payload
-        })
-
-        if (error) {
-            return { success: false, error: error.message }
-        }
-        return { success: true, artifactId: data }
+        }, idempotencyKey)
     }
 
     /**
@@ -55,20 +230,16 @@ export function useWorkerStatus() {
      * @param {string} visitId
      * @param {string} jobId
      * @param {Object} payload - Incompletion details
-     * @returns {Promise<{success: boolean, artifactId?: string, error?: string}>}
+     * @param {string} [idempotencyKey] - Key of an earlier failed attempt, to retry it
+     * @returns {Promise<{success: boolean, artifactId?: string, idempotencyKey: string, error?: string}>}
      */
-    const submitIncompletion = async (visitId, jobId, payload) => {
-        const { data, error } = await supabase.rpc('submit_artifact', {
+    const submitIncompletion = (visitId, jobId, payload, idempotencyKey) => {
+        return submitArtifact({
             p_visit_id: visitId,
             p_job_id: jobId,
             p_artifact_type: 'IncompletionArtifact',
             p_payload: payload
-        })
-
-        if (error) {
-            return { success: false, error: error.message }
-        }
-        return { success: true, artifactId: data }
+        }, idempotencyKey)
     }
 
     /**
@@ -77,21 +248,17 @@ export function useWorkerStatus() {
      * @param {string} jobId
      * @param {Object} payload - Correction details
      * @param {string} correctsArtifactId - ID of artifact being corrected
-     * @returns {Promise<{success: boolean, artifactId?: string, error?: string}>}
+     * @param {string} [idempotencyKey] - Key of an earlier failed attempt, to retry it
+     * @returns {Promise<{success: boolean, artifactId?: string, idempotencyKey: string, error?: string}>}
      */
-    const submitCorrection = async (visitId, jobId, payload, correctsArtifactId) => {
-        const { data, error } = await supabase.rpc('submit_artifact', {
+    const submitCorrection = (visitId, jobId, payload, correctsArtifactId, idempotencyKey) => {
+        return submitArtifact({
             p_visit_id: visitId,
             p_job_id: jobId,
             p_artifact_type: 'CorrectionArtifact',
             p_payload: payload,
             p_corrects_artifact_id: correctsArtifactId
-        })
-
-        if (error) {
-            return { success: false, error: error.message }
-        }
-        return { success: true, artifactId: data }
+        }, idempotencyKey)
     }
 
     /**
@@ -132,6 +299,8 @@ export function useWorkerStatus() {
 
     return {
         logStatus,
+        flushOutbox,
+        pendingCount,
         submitCompletion,
         submitIncompletion,
         submitCorrection,
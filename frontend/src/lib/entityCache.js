@@ -0,0 +1,199 @@
+/**
+ * Normalized client-side entity cache shared by the composables.
+ *
+ * - Rows are stored once per entity type and id (reactive); cached list results
+ *   hold references to those rows, so a refresh of any list, detail or realtime
+ *   delta updates every view that shows the row.
+ * - Identical requests that are already in flight share one promise.
+ * - Stale-while-revalidate: within the TTL the cached result is returned; after
+ *   it the cached result is still returned immediately and refreshed in the
+ *   background. Only a cold miss waits for the network.
+ */
+import { reactive } from 'vue'
+import { supabase } from './supabase'
+
+export const TTL = {
+    LOOKUP: 5 * 60 * 1000,   // dropdown lookups, catalogs, templates
+    LIST: 30 * 1000,         // entity lists
+    DETAIL: 15 * 1000        // single-record detail
+}
+
+// entity type -> { [id]: row }
+export const entities = reactive({})
+
+// request key -> { data, fetchedAt, promise }
+const requests = new Map()
+
+const normalize = (entity, data) => {
+    if (!entity || data == null) return data
+    if (Array.isArray(data)) return data.map(row => normalize(entity, row))
+    if (typeof data !== 'object' || !data.id) return data
+    return mergeEntity(entity, data)
+}
+
+/**
+ * Merge a row into the normalized store, keeping the existing object identity
+ * @param {string} entity - e.g. 'jobs', 'people'
+ * @param {Object} row - Must have an id
+ * @returns {Object} The stored (reactive) row
+ */
+export const mergeEntity = (entity, row) => {
+    const store = entities[entity] || (entities[entity] = {})
+    if (store[row.id]) {
+        Object.assign(store[row.id], row)
+    } else {
+        store[row.id] = { ...row }
+    }
+    return store[row.id]
+}
+
+/**
+ * Remove a row from the normalized store
+ * @param {string} entity
+ * @param {string} id
+ */
+export const removeEntity = (entity, id) => {
+    if (entities[entity]) delete entities[entity][id]
+}
+
+// Callers own the array they get back (views splice/sort them); the rows stay shared
+const snapshot = (data) => Array.isArray(data) ? [...data] : data
+
+const load = (key, fetcher, entity) => {
+    const entry = requests.get(key) || {}
+    entry.promise = fetcher()
+        .then(({ data, error }) => {
+            if (error) return { data: null, error }
+            entry.data = normalize(entity, data)
+            entry.fetchedAt = Date.now()
+            return { data: snapshot(entry.data), error: null }
+        })
+        .catch(err => ({ data: null, error: err }))
+        .finally(() => { entry.promise = null })
+    requests.set(key, entry)
+    return entry.promise
+}
+
+/**
+ * Read through the cache
+ * @param {string} key - Unique request key
+ * @param {Function} fetcher - () => Promise<{ data, error }> (supabase response shape)
+ * @param {Object} [options]
+ * @param {number} [options.ttl] - Freshness window in ms (TTL.LIST by default)
+ * @param {string} [options.entity] - Normalize rows (with id) under this entity type
+ * @param {boolean} [options.force] - Skip the cache and wait for the network
+ * @returns {Promise<{ data: any, error: any }>}
+ */
+export const cached = async (key, fetcher, { ttl = TTL.LIST, entity = null, force = false } = {}) => {
+    const entry = requests.get(key)
+
+    if (entry?.promise && (force || entry.fetchedAt === undefined)) {
+        return entry.promise.then(result => ({ ...result, data: snapshot(result.data) }))
+    }
+
+    if (!force && entry?.fetchedAt !== undefined) {
+        if (Date.now() - entry.fetchedAt > ttl && !entry.promise) {
+            load(key, fetcher, entity) // revalidate in the background
+        }
+        return { data: snapshot(entry.data), error: null }
+    }
+
+    return load(key, fetcher, entity)
+}
+
+/**
+ * Cached supabase.rpc call; the key is the function name plus its parameters
+ * @param {string} fn - RPC name
+ * @param {Object} [params]
+ * @param {Object} [options] - Same as cached()
+ * @returns {Promise<{ data: any, error: any }>}
+ */
+export const cachedRpc = (fn, params = {}, options = {}) =>
+    cached(`${fn}:${JSON.stringify(params)}`, () => supabase.rpc(fn, params), options)
+
+/**
+ * Store a result fetched some other way (e.g. as part of a bundle) under the
+ * cachedRpc key it would have had, so the next cachedRpc call is a hit
+ * @param {string} fn - RPC name
+ * @param {Object} params
+ * @param {any} data
+ * @param {Object} [options]
+ * @param {string} [options.entity] - Normalize rows under this entity type
+ */
+export const primeRpc = (fn, params, data, { entity = null } = {}) => {
+    requests.set(`${fn}:${JSON.stringify(params)}`, {
+        data: normalize(entity, data),
+        fetchedAt: Date.now(),
+        promise: null
+    })
+}
+
+/**
+ * Ask the server which stored rows changed, in one get_versions call
+ * Compares the row_version of rows in the store (jobs, properties,
+ * service_opportunities) with the server's. The list RPCs return row_version,
+ * so the baseline is the version the cached row was loaded at; a row loaded
+ * without one has no baseline and is reported as changed. Reported rows take
+ * the new version, so they are not reported again until they change.
+ * @param {string} entity
+ * @param {Array<string>} ids - At most 500
+ * @returns {Promise<{ changed: Array<string>, removed: Array<string>, error: any }>}
+ */
+export const staleIds = async (entity, ids) => {
+    if (ids.length === 0) return { changed: [], removed: [], error: null }
+
+    const { data, error } = await supabase.rpc('get_versions', { p_ids: ids })
+    if (error) return { changed: [], removed: [], error }
+
+    const store = entities[entity] || {}
+    const changed = []
+    const removed = []
+    ids.forEach(id => {
+        const version = data[id]
+        const row = store[id]
+        if (version === undefined) {
+            removed.push(id)
+        } else if (row && row.row_version !== version) {
+            changed.push(id)
+            row.row_version = version
+        }
+    })
+    return { changed, removed, error: null }
+}
+
+/**
+ * Drop cached results so the next read goes to the network
+ * @param {...string} prefixes - Request key prefixes (usually RPC names); none clears everything
+ */
+export const invalidate = (...prefixes) => {
+    if (prefixes.length === 0) {
+        requests.clear()
+        return
+    }
+    for (const key of [...requests.keys()]) {
+        if (prefixes.some(prefix => key.startsWith(`${prefix}:`))) {
+            requests.delete(key)
+        }
+    }
+}
+
+const clearHooks = new Set()
+
+/**
+ * Run a callback whenever clearAll runs, for modules that keep their own
+ * per-identity state next to the cache
+ * @param {Function} hook
+ */
+export const onClear = (hook) => {
+    clearHooks.add(hook)
+}
+
+/**
+ * Forget every cached result and stored row (sign-out, switching user or
+ * impersonated tenant): nothing loaded for one identity may be shown to another
+ */
+export const clearAll = () => {
+    requests.clear()
+    Object.keys(entities).forEach(entity => { delete entities[entity] })
+    clearHooks.forEach(hook => hook())
+}
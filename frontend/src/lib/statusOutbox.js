@@ -0,0 +1,148 @@
+/**
+ * IndexedDB outbox for worker status events.
+ *
+ * Events are written here first, so a status tapped in a dead zone survives
+ * reloads, and are removed once log_worker_statuses_batch has accepted,
+ * de-duplicated or rejected them. Every event belongs to the user who tapped
+ * it and is only ever read back for that user, so a shared device never sends
+ * one worker's events under another worker's session. Events the server can
+ * never accept are moved to a dead-letter store instead of blocking the queue.
+ * Falls back to memory when IndexedDB is not available (e.g. some private
+ * browsing modes).
+ */
+
+const DB_NAME = 'fs-outbox'
+const DB_VERSION = 2
+const STORE = 'worker_status_events'
+const DEAD_LETTER_STORE = 'worker_status_dead_letters'
+
+let dbPromise = null
+const memoryStore = new Map()
+const memoryDeadLetters = new Map()
+
+const request = (req) => new Promise((resolve, reject) => {
+    req.onsuccess = () => resolve(req.result)
+    req.onerror = () => reject(req.error)
+})
+
+const openDb = () => {
+    if (!dbPromise) {
+        dbPromise = new Promise((resolve) => {
+            if (typeof indexedDB === 'undefined') {
+                resolve(null)
+                return
+            }
+            const req = indexedDB.open(DB_NAME, DB_VERSION)
+            req.onupgradeneeded = () => {
+                const db = req.result
+                // Version 1 events carry no user, so they cannot be sent safely
+                if (db.objectStoreNames.contains(STORE)) {
+                    db.deleteObjectStore(STORE)
+                }
+                const store = db.createObjectStore(STORE, { keyPath: 'idempotency_key' })
+                store.createIndex('user_seq', ['user_id', 'seq'])
+                db.createObjectStore(DEAD_LETTER_STORE, { keyPath: 'idempotency_key' })
+            }
+            req.onsuccess = () => resolve(req.result)
+            req.onerror = () => resolve(null)
+        })
+    }
+    return dbPromise
+}
+
+const tx = async (mode, storeName = STORE) => {
+    const db = await openDb()
+    return db ? db.transaction(storeName, mode).objectStore(storeName) : null
+}
+
+const userRange = (userId) => IDBKeyRange.bound([userId, -Infinity], [userId, Infinity])
+
+const memoryEvents = (userId) => {
+    return [...memoryStore.values()]
+        .filter(event => event.user_id === userId)
+        .sort((a, b) => a.seq - b.seq)
+}
+
+/**
+ * Queue an event
+ * @param {string} userId - Auth user the event belongs to
+ * @param {Object} event - { idempotency_key, visit_id, status, recorded_at, latitude, longitude, device_info }
+ */
+export const enqueue = async (userId, event) => {
+    const entry = { ...event, user_id: userId, seq: Date.now() + Math.random() }
+    const store = await tx('readwrite')
+    if (!store) {
+        memoryStore.set(entry.idempotency_key, entry)
+        return
+    }
+    await request(store.put(entry))
+}
+
+/**
+ * Oldest queued events of a user first
+ * @param {string} userId
+ * @param {number} limit
+ * @returns {Promise<Array>}
+ */
+export const peek = async (userId, limit) => {
+    const store = await tx('readonly')
+    if (!store) return memoryEvents(userId).slice(0, limit)
+    return request(store.index('user_seq').getAll(userRange(userId), limit))
+}
+
+/**
+ * Drop events by idempotency key
+ * @param {Array<string>} keys
+ */
+export const remove = async (keys) => {
+    if (keys.length === 0) return
+    const store = await tx('readwrite')
+    if (!store) {
+        keys.forEach(key => memoryStore.delete(key))
+        return
+    }
+    await Promise.all(keys.map(key => request(store.delete(key))))
+}
+
+/**
+ * Move events the server will never accept out of the queue, keeping them
+ * (with the error) for inspection
+ * @param {Array<{event: Object, error: string}>} failures
+ */
+export const deadLetter = async (failures) => {
+    if (failures.length === 0) return
+    const entries = failures.map(({ event, error }) => ({
+        ...event,
+        error,
+        failed_at: new Date().toISOString()
+    }))
+    const db = await openDb()
+    if (!db) {
+        entries.forEach(entry => {
+            memoryDeadLetters.set(entry.idempotency_key, entry)
+            memoryStore.delete(entry.idempotency_key)
+        })
+        return
+    }
+    const transaction = db.transaction([STORE, DEAD_LETTER_STORE], 'readwrite')
+    const done = new Promise((resolve, reject) => {
+        transaction.oncomplete = () => resolve()
+        transaction.onerror = () => reject(transaction.error)
+    })
+    entries.forEach(entry => {
+        transaction.objectStore(DEAD_LETTER_STORE).put(entry)
+        transaction.objectStore(STORE).delete(entry.idempotency_key)
+    })
+    await done
+}
+
+/**
+ * Number of events of a user waiting to be sent
+ * @param {string} userId
+ * @returns {Promise<number>}
+ */
+export const count = async (userId) => {
+    const store = await tx('readonly')
+    if (!store) return memoryEvents(userId).length
+    return request(store.index('user_seq').count(userRange(userId)))
+}
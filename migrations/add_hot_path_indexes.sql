@@ -0,0 +1,201 @@
+-- Migration: Hot Path Indexes
+-- Purpose: Composite, partial and covering indexes matched to the RPCs that
+--          run on every page load (list_jobs / list_jobs_page, master_calendar,
+--          derive_visit_state, analytics functions, get_dashboard_horizon)
+-- Date: 2025-01-23
+--
+-- Indexes are built and dropped CONCURRENTLY so writes to these hot tables
+-- are not blocked while they build. CONCURRENTLY cannot run inside a
+-- transaction: run this file with plain psql (no --single-transaction, no
+-- BEGIN), not from a tool that wraps the script in one. If a build fails it
+-- leaves an INVALID index that IF NOT EXISTS would skip; drop it and re-run.
+--
+-- Benchmark: migrations/benchmarks/hot_path_indexes.sql seeds a throwaway
+-- tenant inside a transaction and prints EXPLAIN (ANALYZE, BUFFERS) before
+-- and after these indexes, then rolls everything back.
+
+-- ============================================================================
+-- 1. JOBS
+-- ============================================================================
+
+-- list_jobs / list_jobs_page with a status filter, dashboard horizon
+-- (tenant + status, newest first, soft-deleted rows excluded)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_tenant_status_created
+    ON jobs (tenant_id, status, created_at DESC, id DESC)
+    WHERE deleted_at IS NULL;
+
+-- Dashboard / workflow lookups of a service opportunity's jobs
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_service_opportunity_id
+    ON jobs (service_opportunity_id)
+    WHERE deleted_at IS NULL;
+
+
+-- ============================================================================
+-- 2. VISITS
+-- ============================================================================
+
+-- scheduled_visits in list_jobs: index-only scan, already in output order
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_visits_job_open_schedule
+    ON visits (job_id, scheduled_start)
+    WHERE status IN ('Scheduled', 'Pending') AND scheduled_start IS NOT NULL;
+
+-- Per-job status checks (submit_artifact completion check, analytics joins).
+-- Leading job_id makes the single-column index redundant.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_visits_job_status
+    ON visits (job_id, status);
+DROP INDEX CONCURRENTLY IF EXISTS idx_visits_job_id;
+
+
+-- ============================================================================
+-- 3. BOOKINGS
+-- ============================================================================
+
+-- master_calendar booking branch
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_bookings_tenant_start
+    ON bookings (tenant_id, start_date)
+    WHERE status != 'cancelled';
+
+
+-- ============================================================================
+-- 4. WORKER VISIT LOGS
+-- ============================================================================
+
+-- derive_visit_state: DISTINCT ON (person_id) ... ORDER BY person_id, recorded_at DESC
+-- becomes an index-only scan
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_worker_visit_logs_visit_person_recorded
+    ON worker_visit_logs (visit_id, person_id, recorded_at DESC)
+    INCLUDE (status);
+DROP INDEX CONCURRENTLY IF EXISTS idx_worker_visit_logs_visit_id;
+
+-- calculate_worker_integrity_score / get_worker_leaderboard: one worker, recent window
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_worker_visit_logs_person_recorded
+    ON worker_visit_logs (person_id, recorded_at DESC)
+    INCLUDE (visit_id, status);
+DROP INDEX CONCURRENTLY IF EXISTS idx_worker_visit_logs_person_id;
+
+
+-- ============================================================================
+-- 5. ARTIFACTS
+-- ============================================================================
+
+-- analyze_failure_patterns / get_correction_analysis: tenant + type + window
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_artifacts_tenant_type_submitted
+    ON artifacts (tenant_id, artifact_type, submitted_at DESC);
+
+-- Tenant-wide window scans that do not filter on type
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_artifacts_tenant_submitted
+    ON artifacts (tenant_id, submitted_at DESC)
+    INCLUDE (artifact_type, corrects_artifact_id, job_id);
+
+-- calculate_worker_integrity_score: one worker's recent artifacts
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_artifacts_submitter_submitted
+    ON artifacts (submitted_by, submitted_at DESC)
+    INCLUDE (artifact_type);
+
+-- get_worker_leaderboard joins artifacts on (visit_id, submitted_by)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_artifacts_visit_submitter
+    ON artifacts (visit_id, submitted_by);
+DROP INDEX CONCURRENTLY IF EXISTS idx_artifacts_visit_id;
+
+-- Low-cardinality type index is superseded by the tenant-leading ones above
+DROP INDEX CONCURRENTLY IF EXISTS idx_artifacts_type;
+
+
+-- ============================================================================
+-- 6. SERVICE OPPORTUNITIES / PEOPLE
+-- ============================================================================
+
+-- Opportunity lists and dashboard bucketing by due date
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_service_opportunities_tenant_status_due
+    ON service_opportunities (tenant_id, status, due_date);
+
+-- Leaderboard and people lists
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_people_tenant_id
+    ON people (tenant_id);
+
+
+-- ============================================================================
+-- 7. MASTER CALENDAR
+-- ============================================================================
+-- Same view, but the visit branch exposes visits.tenant_id (kept in sync by
+-- trg_set_tenant_id) so a tenant + date filter is pushed down to visits
+-- instead of scanning every tenant's jobs first.
+
+CREATE OR REPLACE VIEW master_calendar AS
+-- Bookings (unchanged)
+SELECT 
+    b.id::text as id,
+    b.property_id,
+    p.name as property_name,
+    p.display_address as property_address,
+    COALESCE(b.guest_name, b.ical_summary, 'Booking') as title,
+    b.start_date::timestamp as start_date,
+    b.end_date::timestamp as end_date,
+    'Booking' as event_type,
+    CASE 
+        WHEN cf.id IS NOT NULL THEN 
+            CASE 
+                WHEN lower(cf.name) LIKE '%airbnb%' OR lower(cf.url) LIKE '%airbnb%' THEN '#FF5A5F' -- Airbnb Pink
+                WHEN lower(cf.name) LIKE '%vrbo%' OR lower(cf.url) LIKE '%vrbo%' THEN '#3b82f6' -- VRBO Blue
+                ELSE '#f97316' -- Other Feeds: Orange
+            END
+        WHEN b.status = 'confirmed' THEN '#22c55e' -- Manual Booking: Green
+        WHEN b.status = 'pending' THEN '#f59e0b'
+        WHEN b.status = 'cancelled' THEN '#ef4444'
+        ELSE '#6b7280'
+    END as color,
+    '' as class_name,
+    true as all_day,
+    COALESCE(b.ical_summary, b.status) as description,
+    '' as code,
+    NULL::uuid as job_id,  -- Bookings don't have job_id
+    b.tenant_id
+FROM bookings b
+JOIN properties p ON p.id = b.property_id
+LEFT JOIN calendar_feeds cf ON cf.id = b.feed_id
+WHERE b.status != 'cancelled'
+
+UNION ALL
+
+-- Jobs with scheduled visits
+SELECT 
+    v.id::text as id,   -- Use visit ID for uniqueness
+    j.property_id,
+    p.name as property_name,
+    p.display_address as property_address,
+    j.title as title,
+    v.scheduled_start as start_date,
+    COALESCE(v.scheduled_end, v.scheduled_start + interval '1 hour') as end_date,
+    'Job' as event_type,
+    CASE 
+        WHEN v.status = 'Completed' THEN '#10b981' -- Emerald
+        WHEN v.status = 'In Progress' THEN '#2563eb' -- Blue-600 (Active)
+        WHEN v.status = 'Scheduled' THEN '#0ea5e9' -- Sky-500 (Planned)
+        ELSE '#64748b' -- Slate-500 (Default)
+    END as color,
+    CASE
+        WHEN j.status = 'Complete' THEN 'status-completed'
+        WHEN v.status = 'Completed' THEN 'status-completed'
+        WHEN v.status = 'In Progress' THEN 'status-started'
+        ELSE ''
+    END as class_name,
+    false as all_day,
+    j.description,
+    '' as code,
+    j.id as job_id,  -- Include job_id for navigation
+    v.tenant_id  -- denormalized; lets the tenant filter reach visits directly
+FROM visits v
+JOIN jobs j ON j.id = v.job_id
+JOIN properties p ON p.id = j.property_id
+WHERE v.scheduled_start IS NOT NULL
+  AND j.deleted_at IS NULL
+  AND v.status NOT IN ('Cancelled', 'Aborted');
+
+
+ANALYZE jobs;
+ANALYZE visits;
+ANALYZE bookings;
+ANALYZE worker_visit_logs;
+ANALYZE artifacts;
+ANALYZE service_opportunities;
+ANALYZE people;
@@ -0,0 +1,652 @@
+-- Role Keys
+-- Property RPCs looked up the Owner / Property Manager roles with
+-- SELECT id FROM roles WHERE name = '...' on every call (and not scoped to
+-- the tenant), and json_property_people / properties_enriched joined roles
+-- by name for every row. Roles now carry a stable role_key that survives
+-- renames, unique per tenant, and role_id_for() resolves it with a single
+-- index probe.
+
+-- 1. role_key column, backfilled from the name ('Property Manager' -> 'property_manager').
+--    If a tenant has duplicate names, only the live / first row gets the key.
+ALTER TABLE roles ADD COLUMN IF NOT EXISTS role_key text;
+
+WITH keyed AS (
+    SELECT
+        id, tenant_id, deleted_at, sort_order,
+        trim(both '_' from lower(regexp_replace(name, '[^a-zA-Z0-9]+', '_', 'g'))) AS key
+    FROM roles
+    WHERE role_key IS NULL
+),
+ranked AS (
+    SELECT
+        id,
+        key,
+        row_number() OVER (
+            PARTITION BY tenant_id, key
+            ORDER BY (deleted_at IS NOT NULL), sort_order, id
+        ) AS rn
+    FROM keyed
+)
+UPDATE roles r
+SET role_key = ranked.key
+FROM ranked
+WHERE r.id = ranked.id
+  AND ranked.rn = 1
+  AND NOT EXISTS (
+      SELECT 1 FROM roles o
+      WHERE o.tenant_id IS NOT DISTINCT FROM r.tenant_id AND o.role_key = ranked.key
+  );
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_roles_tenant_role_key
+    ON roles (tenant_id, role_key)
+    WHERE role_key IS NOT NULL;
+
+
+-- 2. New roles get a key from their name unless it is already taken.
+--    Renaming a role never changes its key.
+CREATE OR REPLACE FUNCTION set_role_key()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_key text;
+BEGIN
+    IF NEW.role_key IS NULL THEN
+        v_key := trim(both '_' from lower(regexp_replace(NEW.name, '[^a-zA-Z0-9]+', '_', 'g')));
+        IF NOT EXISTS (
+            SELECT 1 FROM roles
+            WHERE tenant_id IS NOT DISTINCT FROM NEW.tenant_id AND role_key = v_key
+        ) THEN
+            NEW.role_key := v_key;
+        END IF;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_set_role_key ON roles;
+CREATE TRIGGER trg_set_role_key BEFORE INSERT ON roles
+FOR EACH ROW EXECUTE FUNCTION set_role_key();
+
+
+-- 3. Helper: role id for a tenant's role key (index probe on idx_roles_tenant_role_key)
+CREATE OR REPLACE FUNCTION role_id_for(p_tenant_id uuid, p_role_key text)
+RETURNS uuid
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT id FROM roles WHERE tenant_id = p_tenant_id AND role_key = p_role_key;
+$$;
+
+GRANT EXECUTE ON FUNCTION role_id_for(uuid, text) TO authenticated;
+
+
+-- 4. json_property_people takes a role key; the roles join is a PK lookup
+--    filtered on role_key instead of a name comparison.
+DROP FUNCTION IF EXISTS json_property_people(uuid, text);
+CREATE OR REPLACE FUNCTION json_property_people(p_property_id uuid, p_role_key text)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT COALESCE(
+        jsonb_agg(
+            jsonb_build_object(
+                'id', pe.id,
+                'name', trim(coalesce(pe.first_name, '') || ' ' || coalesce(pe.last_name, ''))
+            )
+        ), '[]'::jsonb
+    )
+    FROM property_assignments pa
+    JOIN roles r ON r.id = pa.role_id AND r.role_key = p_role_key
+    JOIN people pe ON pe.id = pa.person_id
+    WHERE pa.property_id = p_property_id;
+$$;
+
+
+-- 5. get_property_detail: pass role keys
+CREATE OR REPLACE FUNCTION public.get_property_detail(p_property_id uuid)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    result jsonb;
+    prop_record record;
+BEGIN
+    -- Get property base info from enriched view
+    SELECT 
+        p.id,
+        p.tenant_id,
+        p.name,
+        p.street_address,
+        p.city,
+        p.state,
+        p.zip,
+        p.hcp_customer_id,
+        p.hcp_address_id,
+        p.check_in_time,
+        p.check_out_time,
+        p.time_zone,
+        p.is_dst,
+        p.bedrooms,
+        p.bathrooms,
+        p.max_guests,
+        p.has_pool,
+        p.has_bbq,
+        p.allows_pets,
+        p.parking_instructions,
+        COALESCE(p.status, 'active') as status,
+        p.front_photo_url,
+        p.wifi_network,
+        p.wifi_password,
+        p.has_casita,
+        p.square_footage,
+        p.bathroom_sinks,
+        p.bath_mats
+    INTO prop_record
+    FROM properties p
+    WHERE p.id = p_property_id;
+    
+    IF prop_record IS NULL THEN
+        RETURN jsonb_build_object('error', 'Property not found');
+    END IF;
+    
+    -- Build result with related data
+    result := jsonb_build_object(
+        'id', prop_record.id,
+        'tenant_id', prop_record.tenant_id,
+        'name', prop_record.name,
+        'street_address', prop_record.street_address,
+        'city', prop_record.city,
+        'state', prop_record.state,
+        'zip', prop_record.zip,
+        'hcp_customer_id', prop_record.hcp_customer_id,
+        'hcp_address_id', prop_record.hcp_address_id,
+        'check_in_time', prop_record.check_in_time,
+        'check_out_time', prop_record.check_out_time,
+        'time_zone', prop_record.time_zone,
+        'is_dst', prop_record.is_dst,
+        'bedrooms', prop_record.bedrooms,
+        'bathrooms', prop_record.bathrooms,
+        'max_guests', prop_record.max_guests,
+        'has_pool', prop_record.has_pool,
+        'has_bbq', prop_record.has_bbq,
+        'allows_pets', prop_record.allows_pets,
+        'parking_instructions', prop_record.parking_instructions,
+        'status', prop_record.status,
+        'front_photo_url', prop_record.front_photo_url,
+        'wifi_network', prop_record.wifi_network,
+        'wifi_password', prop_record.wifi_password,
+        'has_casita', prop_record.has_casita,
+        'square_footage', prop_record.square_footage,
+        'bathroom_sinks', prop_record.bathroom_sinks,
+        'bath_mats', prop_record.bath_mats,
+        'access_codes', (
+            SELECT COALESCE(jsonb_agg(
+                jsonb_build_object(
+                    'id', c.id,
+                    'code_type', c.code_type,
+                    'code_value', c.code_value
+                )
+            ), '[]'::jsonb)
+            FROM property_access_codes c WHERE c.property_id = p_property_id
+        ),
+        'feeds', (
+            SELECT COALESCE(jsonb_agg(
+                jsonb_build_object(
+                    'id', f.id,
+                    'name', f.name,
+                    'url', f.url
+                )
+            ), '[]'::jsonb)
+            FROM calendar_feeds f WHERE f.property_id = p_property_id
+        ),
+        'inventory', (
+            SELECT COALESCE(jsonb_agg(
+                jsonb_build_object(
+                    'id', i.id,
+                    'item_name', i.item_name,
+                    'quantity', i.quantity,
+                    'category', i.category
+                )
+            ), '[]'::jsonb)
+            FROM property_inventory i WHERE i.property_id = p_property_id
+        ),
+        'reference_photos', (
+            SELECT COALESCE(jsonb_agg(
+                jsonb_build_object(
+                    'id', rp.id,
+                    'photo_url', rp.photo_url,
+                    'label', rp.label,
+                    'sort_order', rp.sort_order
+                ) ORDER BY rp.sort_order
+            ), '[]'::jsonb)
+            FROM property_reference_photos rp WHERE rp.property_id = p_property_id
+        ),
+        'attachments', (
+            SELECT COALESCE(jsonb_agg(
+                jsonb_build_object(
+                    'id', a.id,
+                    'file_name', a.file_name,
+                    'file_url', a.file_url,
+                    'created_at', a.created_at
+                ) ORDER BY a.created_at DESC
+            ), '[]'::jsonb)
+            FROM property_attachments a WHERE a.property_id = p_property_id
+        ),
+        'owners', json_property_people(p_property_id, 'owner'),
+        'managers', json_property_people(p_property_id, 'property_manager')
+    );
+    
+    RETURN result;
+END;
+$$;
+
+
+-- 6. properties_enriched: one pass over a property's assignments instead of
+--    four name-joined subqueries
+DROP VIEW IF EXISTS properties_enriched;
+
+CREATE VIEW properties_enriched AS
+SELECT 
+    p.id,
+    p.tenant_id,
+    p.name,
+    p.hcp_customer_id,
+    p.hcp_address_id,
+    p.display_address, -- Now uses generated column
+    p.check_in_time,
+    p.check_out_time,
+    p.time_zone,
+    p.is_dst,
+    p.bedrooms,
+    p.bathrooms,
+    p.max_guests,
+    p.has_pool,
+    p.has_bbq,
+    p.allows_pets,
+    p.parking_instructions,
+    COALESCE(p.status, 'active') AS status,
+    p.front_photo_url,
+    p.wifi_network,
+    p.wifi_password,
+    p.has_casita,
+    p.square_footage,
+    p.bathroom_sinks,
+    p.bath_mats,
+    pp.owner_names,
+    pp.owner_ids,
+    pp.manager_names,
+    pp.manager_ids
+FROM properties p
+LEFT JOIN LATERAL (
+    SELECT
+        string_agg(pe.first_name || ' ' || COALESCE(pe.last_name, ''), ', ') FILTER (WHERE r.role_key = 'owner') AS owner_names,
+        array_agg(pe.id) FILTER (WHERE r.role_key = 'owner') AS owner_ids,
+        string_agg(pe.first_name || ' ' || COALESCE(pe.last_name, ''), ', ') FILTER (WHERE r.role_key = 'property_manager') AS manager_names,
+        array_agg(pe.id) FILTER (WHERE r.role_key = 'property_manager') AS manager_ids
+    FROM property_assignments pa
+    JOIN people pe ON pe.id = pa.person_id
+    JOIN roles r ON r.id = pa.role_id
+    WHERE pa.property_id = p.id
+) pp ON true;
+
+
+-- 7. Property save RPCs resolve roles by key for the property's tenant
+-- ============================================
+-- CREATE PROPERTY SAFE
+-- ============================================
+CREATE OR REPLACE FUNCTION public.create_property_safe(
+    p_tenant_id uuid,
+    p_name text, 
+    p_street_address text,
+    p_city text,
+    p_state text,
+    p_zip text,
+    p_hcp_customer_id text, 
+    p_hcp_address_id text, 
+    p_check_in_time time without time zone, 
+    p_check_out_time time without time zone, 
+    p_owner_ids uuid[], 
+    p_manager_ids uuid[], 
+    p_front_photo_url text, 
+    p_door_code text, 
+    p_garage_code text, 
+    p_gate_code text, 
+    p_closet_code text, 
+    p_wifi_network text,
+    p_wifi_password text,
+    p_bedrooms integer,
+    p_bathrooms numeric,
+    p_max_guests integer,
+    p_has_pool boolean,
+    p_has_bbq boolean,
+    p_allows_pets boolean,
+    p_parking_instructions text,
+    p_has_casita boolean,
+    p_casita_code text,
+    p_square_footage integer,
+    p_bathroom_sinks integer,
+    p_bath_mats integer,
+    p_time_zone text,
+    p_is_dst boolean,
+    p_feeds jsonb DEFAULT '[]'::jsonb, 
+    p_inventory jsonb DEFAULT '[]'::jsonb,
+    p_attachments jsonb DEFAULT '[]'::jsonb
+)
+RETURNS uuid
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    new_prop_id UUID;
+    feed_item JSONB;
+    inv_item JSONB;
+    pid UUID;
+    role_owner_id UUID;
+    role_manager_id UUID;
+BEGIN
+    -- Get Role IDs
+    role_owner_id := role_id_for(p_tenant_id, 'owner');
+    role_manager_id := role_id_for(p_tenant_id, 'property_manager');
+
+    INSERT INTO properties (
+        tenant_id, name, street_address, city, state, zip, hcp_customer_id, hcp_address_id,
+        check_in_time, check_out_time, front_photo_url,
+        wifi_network, wifi_password, bedrooms, bathrooms, max_guests,
+        has_pool, has_bbq, allows_pets, parking_instructions,
+        has_casita, square_footage, bathroom_sinks, bath_mats,
+        time_zone, is_dst
+    ) VALUES (
+        p_tenant_id, p_name, p_street_address, p_city, p_state, p_zip, p_hcp_customer_id, p_hcp_address_id,
+        p_check_in_time, p_check_out_time, p_front_photo_url,
+        p_wifi_network, p_wifi_password, p_bedrooms, p_bathrooms, p_max_guests,
+        p_has_pool, p_has_bbq, p_allows_pets, p_parking_instructions,
+        p_has_casita, p_square_footage, p_bathroom_sinks, p_bath_mats,
+        p_time_zone, p_is_dst
+    ) RETURNING id INTO new_prop_id;
+
+    -- Owner assignments
+    IF p_owner_ids IS NOT NULL THEN
+        FOREACH pid IN ARRAY p_owner_ids LOOP
+            INSERT INTO property_assignments (property_id, person_id, role_id) 
+            VALUES (new_prop_id, pid, role_owner_id);
+        END LOOP;
+    END IF;
+
+    -- Manager assignments
+    IF p_manager_ids IS NOT NULL THEN
+        FOREACH pid IN ARRAY p_manager_ids LOOP
+            IF NOT EXISTS (SELECT 1 FROM property_assignments WHERE property_id = new_prop_id AND person_id = pid) THEN
+                INSERT INTO property_assignments (property_id, person_id, role_id) 
+                VALUES (new_prop_id, pid, role_manager_id);
+            END IF;
+        END LOOP;
+    END IF;
+
+    -- Access codes
+    IF COALESCE(p_door_code, '') != '' THEN 
+        INSERT INTO property_access_codes (property_id, code_type, code_value) VALUES (new_prop_id, 'Door', p_door_code); 
+    END IF;
+    IF COALESCE(p_garage_code, '') != '' THEN 
+        INSERT INTO property_access_codes (property_id, code_type, code_value) VALUES (new_prop_id, 'Garage', p_garage_code); 
+    END IF;
+    IF COALESCE(p_gate_code, '') != '' THEN 
+        INSERT INTO property_access_codes (property_id, code_type, code_value) VALUES (new_prop_id, 'Community Gate', p_gate_code); 
+    END IF;
+    IF COALESCE(p_closet_code, '') != '' THEN 
+        INSERT INTO property_access_codes (property_id, code_type, code_value) VALUES (new_prop_id, 'Owner Closet', p_closet_code); 
+    END IF;
+    IF COALESCE(p_casita_code, '') != '' THEN 
+        INSERT INTO property_access_codes (property_id, code_type, code_value) VALUES (new_prop_id, 'Casita', p_casita_code); 
+    END IF;
+
+    -- Feeds
+    IF p_feeds IS NOT NULL THEN
+        FOR feed_item IN SELECT * FROM jsonb_array_elements(p_feeds) LOOP
+            INSERT INTO calendar_feeds (property_id, name, url) 
+            VALUES (new_prop_id, feed_item->>'name', feed_item->>'url');
+        END LOOP;
+    END IF;
+
+    -- Inventory
+    IF p_inventory IS NOT NULL THEN
+        FOR inv_item IN SELECT * FROM jsonb_array_elements(p_inventory) LOOP
+            INSERT INTO property_inventory (property_id, item_name, quantity, category) 
+            VALUES (new_prop_id, inv_item->>'name', (inv_item->>'qty')::INT, inv_item->>'category');
+        END LOOP;
+    END IF;
+
+    RETURN new_prop_id;
+END;
+$$;
+
+
+-- ============================================
+-- UPDATE PROPERTY SAFE
+-- ============================================
+CREATE OR REPLACE FUNCTION public.update_property_safe(
+    p_id uuid,
+    p_tenant_id uuid,
+    p_name text, 
+    p_street_address text,
+    p_city text,
+    p_state text,
+    p_zip text,
+    p_hcp_customer_id text, 
+    p_hcp_address_id text, 
+    p_check_in_time time without time zone, 
+    p_check_out_time time without time zone, 
+    p_owner_ids uuid[], 
+    p_manager_ids uuid[], 
+    p_front_photo_url text, 
+    p_door_code text, 
+    p_garage_code text, 
+    p_gate_code text, 
+    p_closet_code text, 
+    p_wifi_network text,
+    p_wifi_password text,
+    p_bedrooms integer,
+    p_bathrooms numeric,
+    p_max_guests integer,
+    p_has_pool boolean,
+    p_has_bbq boolean,
+    p_allows_pets boolean,
+    p_parking_instructions text,
+    p_has_casita boolean,
+    p_casita_code text,
+    p_square_footage integer,
+    p_bathroom_sinks integer,
+    p_bath_mats integer,
+    p_time_zone text,
+    p_is_dst boolean,
+    p_feeds jsonb DEFAULT '[]'::jsonb, 
+    p_inventory jsonb DEFAULT '[]'::jsonb,
+    p_attachments jsonb DEFAULT '[]'::jsonb
+)
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    feed_item JSONB;
+    inv_item JSONB;
+    pid UUID;
+    f_id UUID;
+    feed_ids_to_keep UUID[] := '{}';
+    role_owner_id UUID;
+    role_manager_id UUID;
+BEGIN
+    -- Get Role IDs
+    role_owner_id := role_id_for(p_tenant_id, 'owner');
+    role_manager_id := role_id_for(p_tenant_id, 'property_manager');
+
+    -- Update base property
+    UPDATE properties 
+    SET name = p_name, 
+        street_address = p_street_address,
+        city = p_city,
+        state = p_state,
+        zip = p_zip, 
+        hcp_customer_id = p_hcp_customer_id, 
+        hcp_address_id = p_hcp_address_id, 
+        check_in_time = p_check_in_time, 
+        check_out_time = p_check_out_time, 
+        front_photo_url = p_front_photo_url,
+        wifi_network = p_wifi_network, 
+        wifi_password = p_wifi_password,
+        bedrooms = p_bedrooms, 
+        bathrooms = p_bathrooms, 
+        max_guests = p_max_guests,
+        has_pool = p_has_pool, 
+        has_bbq = p_has_bbq, 
+        allows_pets = p_allows_pets,
+        parking_instructions = p_parking_instructions,
+        has_casita = p_has_casita, 
+        square_footage = p_square_footage,
+        bathroom_sinks = p_bathroom_sinks, 
+        bath_mats = p_bath_mats,
+        time_zone = p_time_zone, 
+        is_dst = p_is_dst
+    WHERE id = p_id;
+
+    -- Clear and re-add assignments
+    DELETE FROM property_assignments WHERE property_id = p_id;
+    
+    IF p_owner_ids IS NOT NULL THEN
+        FOREACH pid IN ARRAY p_owner_ids LOOP
+            INSERT INTO property_assignments (property_id, person_id, role_id) 
+            VALUES (p_id, pid, role_owner_id);
+        END LOOP;
+    END IF;
+
+    IF p_manager_ids IS NOT NULL THEN
+        FOREACH pid IN ARRAY p_manager_ids LOOP
+            IF NOT EXISTS (SELECT 1 FROM property_assignments WHERE property_id = p_id AND person_id = pid) THEN
+                INSERT INTO property_assignments (property_id, person_id, role_id) 
+                VALUES (p_id, pid, role_manager_id);
+            END IF;
+        END LOOP;
+    END IF;
+
+    -- Clear and re-add access codes
+    DELETE FROM property_access_codes 
+    WHERE property_id = p_id 
+    AND code_type IN ('Door', 'Garage', 'Community Gate', 'Owner Closet', 'Casita');
+    
+    IF COALESCE(p_door_code, '') != '' THEN 
+        INSERT INTO property_access_codes (property_id, code_type, code_value) VALUES (p_id, 'Door', p_door_code); 
+    END IF;
+    IF COALESCE(p_garage_code, '') != '' THEN 
+        INSERT INTO property_access_codes (property_id, code_type, code_value) VALUES (p_id, 'Garage', p_garage_code); 
+    END IF;
+    IF COALESCE(p_gate_code, '') != '' THEN 
+        INSERT INTO property_access_codes (property_id, code_type, code_value) VALUES (p_id, 'Community Gate', p_gate_code); 
+    END IF;
+    IF COALESCE(p_closet_code, '') != '' THEN 
+        INSERT INTO property_access_codes (property_id, code_type, code_value) VALUES (p_id, 'Owner Closet', p_closet_code); 
+    END IF;
+    IF COALESCE(p_casita_code, '') != '' THEN 
+        INSERT INTO property_access_codes (property_id, code_type, code_value) VALUES (p_id, 'Casita', p_casita_code); 
+    END IF;
+
+    -- Smart update feeds (preserve IDs, add new, delete removed)
+    IF p_feeds IS NOT NULL THEN
+        FOR feed_item IN SELECT * FROM jsonb_array_elements(p_feeds) LOOP
+            f_id := (feed_item->>'id')::UUID;
+            
+            IF f_id IS NOT NULL THEN
+                -- Update existing
+                UPDATE calendar_feeds SET name = feed_item->>'name', url = feed_item->>'url' WHERE id = f_id;
+                feed_ids_to_keep := array_append(feed_ids_to_keep, f_id);
+            ELSE
+                -- Insert new
+                INSERT INTO calendar_feeds (property_id, name, url) 
+                VALUES (p_id, feed_item->>'name', feed_item->>'url') RETURNING id INTO f_id;
+                feed_ids_to_keep := array_append(feed_ids_to_keep, f_id);
+            END IF;
+        END LOOP;
+    END IF;
+
+    -- Delete feeds not in keep list
+    DELETE FROM calendar_feeds WHERE property_id = p_id AND NOT (id = ANY(feed_ids_to_keep));
+
+    -- Clear and re-add inventory
+    DELETE FROM property_inventory WHERE property_id = p_id;
+    IF p_inventory IS NOT NULL THEN
+        FOR inv_item IN SELECT * FROM jsonb_array_elements(p_inventory) LOOP
+            INSERT INTO property_inventory (property_id, item_name, quantity, category) 
+            VALUES (p_id, inv_item->>'name', (inv_item->>'qty')::INT, inv_item->>'category');
+        END LOOP;
+    END IF;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION public.save_property_collections(
+  p_property_id uuid,
+  p_feeds jsonb DEFAULT '[]'::jsonb,
+  p_inventory jsonb DEFAULT '[]'::jsonb,
+  p_owner_ids uuid[] DEFAULT '{}',
+  p_manager_ids uuid[] DEFAULT '{}'
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  feed_item jsonb;
+  inv_item jsonb;
+  owner_id uuid;
+  manager_id uuid;
+  owner_role_id uuid;
+  manager_role_id uuid;
+BEGIN
+  -- Get role IDs
+  SELECT role_id_for(tenant_id, 'owner'), role_id_for(tenant_id, 'property_manager')
+  INTO owner_role_id, manager_role_id
+  FROM properties WHERE id = p_property_id;
+  
+  -- Update feeds: delete existing and insert new
+  DELETE FROM calendar_feeds WHERE property_id = p_property_id;
+  FOR feed_item IN SELECT * FROM jsonb_array_elements(p_feeds)
+  LOOP
+    INSERT INTO calendar_feeds (property_id, name, url)
+    VALUES (p_property_id, feed_item->>'name', feed_item->>'url');
+  END LOOP;
+  
+  -- Update inventory: delete existing and insert new
+  DELETE FROM property_inventory WHERE property_id = p_property_id;
+  FOR inv_item IN SELECT * FROM jsonb_array_elements(p_inventory)
+  LOOP
+    INSERT INTO property_inventory (property_id, item_name, quantity, category)
+    VALUES (
+      p_property_id, 
+      inv_item->>'name', 
+      COALESCE((inv_item->>'qty')::integer, 1),
+      COALESCE(inv_item->>'category', 'General')
+    );
+  END LOOP;
+  
+  -- Update owner assignments
+  DELETE FROM property_assignments WHERE property_id = p_property_id AND role_id = owner_role_id;
+  FOREACH owner_id IN ARRAY p_owner_ids
+  LOOP
+    INSERT INTO property_assignments (property_id, person_id, role_id)
+    VALUES (p_property_id, owner_id, owner_role_id);
+  END LOOP;
+  
+  -- Update manager assignments
+  DELETE FROM property_assignments WHERE property_id = p_property_id AND role_id = manager_role_id;
+  FOREACH manager_id IN ARRAY p_manager_ids
+  LOOP
+    INSERT INTO property_assignments (property_id, person_id, role_id)
+    VALUES (p_property_id, manager_id, manager_role_id);
+  END LOOP;
+  
+  RETURN jsonb_build_object('success', true);
+END;
+$$;
+
+NOTIFY pgrst, 'reload schema';
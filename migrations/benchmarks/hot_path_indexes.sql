@@ -0,0 +1,165 @@
+-- Benchmark: Hot Path Indexes
+-- Seeds a throwaway tenant with realistic volumes, prints EXPLAIN (ANALYZE, BUFFERS)
+-- for the hot RPC queries without the new indexes, applies
+-- ../add_hot_path_indexes.sql and prints the same plans again.
+-- Everything (seed data and index changes) is rolled back at the end.
+--
+-- Run against a dev database or a Supabase branch, never production:
+--   psql "$DB_CONNECTION_STRING" -f migrations/benchmarks/hot_path_indexes.sql > hot_path_indexes.out
+--
+-- Compare "Execution Time" and "Buffers: shared hit/read" between the BEFORE and
+-- AFTER sections. Scale the volumes with -v jobs=... -v visits_per_job=... etc.
+--
+-- The migration builds its indexes CONCURRENTLY, which cannot run inside this
+-- transaction, so it is applied with CONCURRENTLY stripped (sed, run from the
+-- repository root as above).
+
+\set ON_ERROR_STOP on
+\if :{?jobs}           \else \set jobs 20000          \endif
+\if :{?visits_per_job} \else \set visits_per_job 2    \endif
+\if :{?logs_per_visit} \else \set logs_per_visit 3    \endif
+\if :{?people}         \else \set people 50           \endif
+\if :{?properties}     \else \set properties 200      \endif
+\if :{?bookings}       \else \set bookings 10000      \endif
+
+BEGIN;
+
+-- Skip audit / activity feed / tenant sync triggers while seeding (requires a
+-- superuser or the postgres role on Supabase). tenant_id is written directly.
+SET LOCAL session_replication_role = replica;
+
+-- ============================================================================
+-- 1. SEED
+-- ============================================================================
+
+INSERT INTO tenants (name) VALUES ('Benchmark Tenant') RETURNING id AS tenant_id \gset
+
+INSERT INTO roles (tenant_id, name, description, sort_order)
+VALUES (:'tenant_id', 'Cleaner', 'Benchmark role', 0)
+RETURNING id AS role_id \gset
+
+INSERT INTO people (tenant_id, first_name, last_name, email)
+SELECT :'tenant_id', 'Worker', g::text, 'worker' || g || '@benchmark.invalid'
+FROM generate_series(1, :people) g;
+
+INSERT INTO properties (tenant_id, name)
+SELECT :'tenant_id', 'Benchmark Property ' || g
+FROM generate_series(1, :properties) g;
+
+CREATE TEMP TABLE bench_people ON COMMIT DROP AS
+SELECT id, row_number() OVER (ORDER BY id) AS n FROM people WHERE tenant_id = :'tenant_id';
+
+CREATE TEMP TABLE bench_properties ON COMMIT DROP AS
+SELECT id, row_number() OVER (ORDER BY id) AS n FROM properties WHERE tenant_id = :'tenant_id';
+
+INSERT INTO bookings (tenant_id, property_id, uid, start_date, end_date, status, guest_name)
+SELECT :'tenant_id', bp.id, 'bench-' || g,
+       (current_date - 365 + (g % 730)),
+       (current_date - 365 + (g % 730) + 3),
+       CASE WHEN g % 20 = 0 THEN 'cancelled' ELSE 'confirmed' END,
+       'Guest ' || g
+FROM generate_series(1, :bookings) g
+JOIN bench_properties bp ON bp.n = 1 + g % :properties;
+
+INSERT INTO service_opportunities (tenant_id, property_id, title, trigger_source, due_date, status)
+SELECT :'tenant_id', bp.id, 'Turnover ' || g, 'manual',
+       (current_date - 180 + (g % 365)),
+       (ARRAY['Open', 'Scheduled', 'Completed', 'Dismissed'])[1 + g % 4]
+FROM generate_series(1, :jobs / 2) g
+JOIN bench_properties bp ON bp.n = 1 + g % :properties;
+
+CREATE TEMP TABLE bench_opportunities ON COMMIT DROP AS
+SELECT id, property_id, row_number() OVER (ORDER BY id) AS n
+FROM service_opportunities WHERE tenant_id = :'tenant_id';
+
+INSERT INTO jobs (tenant_id, service_opportunity_id, property_id, title, status, priority, created_at, updated_at, deleted_at)
+SELECT :'tenant_id', so.id, so.property_id, 'Job ' || g,
+       (ARRAY['Pending', 'In Progress', 'Complete', 'Cancelled'])[1 + g % 4],
+       'Normal',
+       now() - (g % 730) * interval '1 day' - (g % 1440) * interval '1 minute',
+       now(),
+       CASE WHEN g % 50 = 0 THEN now() END
+FROM generate_series(1, :jobs) g
+JOIN bench_opportunities so ON so.n = 1 + g % (:jobs / 2);
+
+INSERT INTO visits (tenant_id, job_id, visit_number, status, scheduled_start, scheduled_end)
+SELECT j.tenant_id, j.id, vn,
+       (ARRAY['Scheduled', 'In Progress', 'Completed', 'Incomplete', 'Aborted'])[1 + (abs(hashtext(j.id::text)) + vn) % 5],
+       j.created_at + vn * interval '1 day',
+       j.created_at + vn * interval '1 day' + interval '2 hours'
+FROM jobs j
+CROSS JOIN generate_series(1, :visits_per_job) vn
+WHERE j.tenant_id = :'tenant_id';
+
+INSERT INTO worker_visit_logs (visit_id, person_id, status, recorded_at)
+SELECT v.id, bp.id,
+       (ARRAY['On My Way', 'Started', 'Paused', 'Finished'])[ln],
+       v.scheduled_start + ln * interval '20 minutes'
+FROM visits v
+CROSS JOIN generate_series(1, :logs_per_visit) ln
+JOIN bench_people bp ON bp.n = 1 + abs(hashtext(v.id::text)) % :people
+WHERE v.tenant_id = :'tenant_id';
+
+INSERT INTO artifacts (tenant_id, visit_id, job_id, artifact_type, submitted_by, submitted_as_role, submitted_at, payload)
+SELECT v.tenant_id, v.id, v.job_id,
+       (ARRAY['checklist', 'photo', 'inspection'])[1 + abs(hashtext(v.id::text)) % 3],
+       bp.id, :'role_id', v.scheduled_start + interval '90 minutes', '{}'::jsonb
+FROM visits v
+JOIN bench_people bp ON bp.n = 1 + abs(hashtext(v.id::text)) % :people
+WHERE v.tenant_id = :'tenant_id'
+  AND v.status = 'Completed';
+
+SELECT id AS person_id FROM bench_people WHERE n = 1 \gset
+SELECT id AS visit_id FROM visits WHERE tenant_id = :'tenant_id' ORDER BY scheduled_start DESC LIMIT 1 \gset
+
+SET LOCAL session_replication_role = origin;
+
+
+-- ============================================================================
+-- 2. BEFORE: baseline indexes only
+-- ============================================================================
+
+DROP INDEX IF EXISTS idx_jobs_tenant_status_created;
+DROP INDEX IF EXISTS idx_jobs_service_opportunity_id;
+DROP INDEX IF EXISTS idx_visits_job_open_schedule;
+DROP INDEX IF EXISTS idx_visits_job_status;
+DROP INDEX IF EXISTS idx_bookings_tenant_start;
+DROP INDEX IF EXISTS idx_worker_visit_logs_visit_person_recorded;
+DROP INDEX IF EXISTS idx_worker_visit_logs_person_recorded;
+DROP INDEX IF EXISTS idx_artifacts_tenant_type_submitted;
+DROP INDEX IF EXISTS idx_artifacts_tenant_submitted;
+DROP INDEX IF EXISTS idx_artifacts_submitter_submitted;
+DROP INDEX IF EXISTS idx_artifacts_visit_submitter;
+DROP INDEX IF EXISTS idx_service_opportunities_tenant_status_due;
+DROP INDEX IF EXISTS idx_people_tenant_id;
+CREATE INDEX IF NOT EXISTS idx_visits_job_id ON visits(job_id);
+CREATE INDEX IF NOT EXISTS idx_worker_visit_logs_visit_id ON worker_visit_logs(visit_id);
+CREATE INDEX IF NOT EXISTS idx_worker_visit_logs_person_id ON worker_visit_logs(person_id);
+CREATE INDEX IF NOT EXISTS idx_artifacts_visit_id ON artifacts(visit_id);
+CREATE INDEX IF NOT EXISTS idx_artifacts_type ON artifacts(artifact_type);
+
+ANALYZE jobs;
+ANALYZE visits;
+ANALYZE bookings;
+ANALYZE worker_visit_logs;
+ANALYZE artifacts;
+ANALYZE service_opportunities;
+ANALYZE people;
+
+\echo '=================== BEFORE ==================='
+\set phase BEFORE
+\ir hot_path_queries.sql
+
+
+-- ============================================================================
+-- 3. AFTER: apply the migration
+-- ============================================================================
+
+\set hot_path_migration `sed 's/ CONCURRENTLY//' migrations/add_hot_path_indexes.sql`
+:hot_path_migration
+
+\echo '=================== AFTER ===================='
+\set phase AFTER
+\ir hot_path_queries.sql
+
+ROLLBACK;
@@ -0,0 +1,73 @@
+-- Representative hot-path queries, included twice by hot_path_indexes.sql.
+-- Expects :tenant_id, :person_id and :visit_id to be set with \gset.
+
+\echo '--- [' :phase '] list_jobs: status filter, newest first'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT j.id, j.title, j.status, j.created_at,
+       (SELECT jsonb_agg(v.scheduled_start ORDER BY v.scheduled_start)
+        FROM visits v
+        WHERE v.job_id = j.id
+          AND v.status IN ('Scheduled', 'Pending')
+          AND v.scheduled_start IS NOT NULL) AS scheduled_visits
+FROM jobs j
+WHERE j.tenant_id = :'tenant_id'
+  AND j.deleted_at IS NULL
+  AND j.status = ANY (ARRAY['Pending', 'In Progress'])
+ORDER BY j.created_at DESC, j.id DESC
+LIMIT 50;
+
+\echo '--- [' :phase '] master_calendar: one month'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT id, title, start_date, end_date, event_type
+FROM master_calendar
+WHERE tenant_id = :'tenant_id'
+  AND start_date < date_trunc('month', now()) + interval '1 month'
+  AND end_date >= date_trunc('month', now());
+
+\echo '--- [' :phase '] derive_visit_state: latest status per worker'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT DISTINCT ON (person_id) person_id, status
+FROM worker_visit_logs
+WHERE visit_id = :'visit_id'
+ORDER BY person_id, recorded_at DESC;
+
+\echo '--- [' :phase '] calculate_worker_integrity_score: 90 day window'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT count(*) FILTER (WHERE status = 'Finished'), count(DISTINCT visit_id)
+FROM worker_visit_logs
+WHERE person_id = :'person_id'
+  AND recorded_at > now() - interval '90 days';
+
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT artifact_type, count(*)
+FROM artifacts
+WHERE submitted_by = :'person_id'
+  AND submitted_at > now() - interval '90 days'
+GROUP BY artifact_type;
+
+\echo '--- [' :phase '] analyze_failure_patterns: tenant + type + window'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT date_trunc('week', submitted_at), count(*)
+FROM artifacts
+WHERE tenant_id = :'tenant_id'
+  AND artifact_type = 'inspection'
+  AND submitted_at > now() - interval '90 days'
+GROUP BY 1;
+
+\echo '--- [' :phase '] get_worker_leaderboard'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT p.id, count(DISTINCT wvl.visit_id) AS visits, count(DISTINCT a.id) AS artifacts
+FROM people p
+JOIN worker_visit_logs wvl ON wvl.person_id = p.id AND wvl.recorded_at > now() - interval '30 days'
+LEFT JOIN artifacts a ON a.visit_id = wvl.visit_id AND a.submitted_by = p.id
+WHERE p.tenant_id = :'tenant_id'
+GROUP BY p.id;
+
+\echo '--- [' :phase '] service opportunities due soon'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT id, title, due_date
+FROM service_opportunities
+WHERE tenant_id = :'tenant_id'
+  AND status = 'Open'
+  AND due_date <= current_date + 14
+ORDER BY due_date;
@@ -0,0 +1,278 @@
+-- Migration: Materialized Activity Feed
+-- Purpose: Replace the tenant_activity_feed UNION view with a table that is
+--          filled at write time, plus a keyset-paginated read RPC.
+-- Date: 2025-01-20
+--
+-- The old view UNIONed all of audit_logs with communications, joined
+-- auth.users for every row and derived tenant_id from jsonb with COALESCE,
+-- so a tenant's first page had to evaluate every audit row. Now each audit
+-- row / communication is projected once into activity_feed_events (tenant
+-- and actor email resolved at insert), and pages are read straight off the
+-- (tenant_id, occurred_at DESC, id DESC) index. Audit-derived events follow
+-- the audit_logs retention window (section 6, run by audit_retention.py).
+
+-- ============================================================================
+-- 1. TABLE
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS activity_feed_events (
+    id uuid PRIMARY KEY,                    -- audit_logs.id / communications.id
+    tenant_id uuid NOT NULL,
+    occurred_at timestamptz NOT NULL,
+    category text NOT NULL,                 -- DATA_CHANGE | COMMUNICATION
+    severity text NOT NULL DEFAULT 'INFO',
+    summary text,
+    actor_id uuid,
+    actor_email text,
+    details jsonb
+);
+
+CREATE INDEX IF NOT EXISTS idx_activity_feed_events_tenant_keyset
+    ON activity_feed_events (tenant_id, occurred_at DESC, id DESC);
+
+ALTER TABLE activity_feed_events ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS tenant_isolation ON activity_feed_events;
+CREATE POLICY tenant_isolation ON activity_feed_events
+FOR SELECT TO public
+USING (tenant_id = get_my_tenant_id());
+
+
+-- ============================================================================
+-- 2. WRITE-TIME PROJECTION
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION project_audit_log_to_feed()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_tenant_id uuid;
+BEGIN
+    v_tenant_id := COALESCE(
+        NEW.resolved_tenant_id,
+        (NEW.new_values->>'tenant_id')::uuid,
+        (NEW.old_values->>'tenant_id')::uuid
+    );
+
+    -- Rows we cannot attribute to a tenant never showed up in the feed anyway
+    IF v_tenant_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO activity_feed_events (
+        id, tenant_id, occurred_at, category, severity, summary, actor_id, actor_email, details
+    )
+    VALUES (
+        NEW.id,
+        v_tenant_id,
+        NEW.changed_at,
+        'DATA_CHANGE',
+        CASE WHEN NEW.operation = 'DELETE' THEN 'WARNING' ELSE 'INFO' END,
+        NEW.table_name || ' ' || NEW.operation || ': ' || COALESCE(NEW.record_id::text, ''),
+        NEW.changed_by,
+        (SELECT email FROM auth.users WHERE id = NEW.changed_by),
+        jsonb_build_object(
+            'table', NEW.table_name,
+            'operation', NEW.operation,
+            'record_id', NEW.record_id,
+            'old', NEW.old_values,
+            'new', NEW.new_values
+        )
+    )
+    ON CONFLICT (id) DO NOTHING;
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION project_communication_to_feed()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF NEW.tenant_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO activity_feed_events (
+        id, tenant_id, occurred_at, category, severity, summary, actor_id, actor_email, details
+    )
+    VALUES (
+        NEW.id,
+        NEW.tenant_id,
+        NEW.created_at,
+        'COMMUNICATION',
+        'INFO',
+        NEW.type || ' to ' || NEW.recipient,
+        NEW.created_by,
+        (SELECT email FROM auth.users WHERE id = NEW.created_by),
+        jsonb_build_object(
+            'type', NEW.type,
+            'recipient', NEW.recipient,
+            'direction', NEW.direction,
+            'content', NEW.content
+        )
+    )
+    ON CONFLICT (id) DO NOTHING;
+
+    RETURN NULL;
+END;
+$$;
+
+-- audit_logs is partitioned; a row trigger on the parent applies to every partition
+DROP TRIGGER IF EXISTS trg_project_activity_feed ON audit_logs;
+CREATE TRIGGER trg_project_activity_feed
+    AFTER INSERT ON audit_logs
+    FOR EACH ROW EXECUTE FUNCTION project_audit_log_to_feed();
+
+DROP TRIGGER IF EXISTS trg_project_activity_feed ON communications;
+CREATE TRIGGER trg_project_activity_feed
+    AFTER INSERT ON communications
+    FOR EACH ROW EXECUTE FUNCTION project_communication_to_feed();
+
+
+-- ============================================================================
+-- 3. BACKFILL
+-- ============================================================================
+
+INSERT INTO activity_feed_events (
+    id, tenant_id, occurred_at, category, severity, summary, actor_id, actor_email, details
+)
+SELECT
+    f.event_id::uuid, f.tenant_id, f.timestamp, f.category, f.severity,
+    f.summary, f.actor_id, f.actor_email, f.details
+FROM tenant_activity_feed f
+WHERE f.tenant_id IS NOT NULL
+  AND f.timestamp IS NOT NULL
+ON CONFLICT (id) DO NOTHING;
+
+
+-- ============================================================================
+-- 4. COMPATIBILITY VIEW
+-- ============================================================================
+-- Existing callers (RolesManagerModal, legacy v/ UI) keep reading
+-- tenant_activity_feed; it is now a thin projection of the table.
+
+DROP VIEW IF EXISTS tenant_activity_feed;
+CREATE VIEW tenant_activity_feed AS
+SELECT
+    e.id::text AS event_id,
+    e.occurred_at AS timestamp,
+    e.tenant_id,
+    e.category,
+    e.severity,
+    e.summary,
+    e.actor_id,
+    e.actor_email,
+    e.details
+FROM activity_feed_events e;
+
+
+-- ============================================================================
+-- 5. KEYSET-PAGINATED READ RPC
+-- ============================================================================
+-- Pass the (timestamp, event_id) of the last row you have to get the next
+-- page. Omit both for the first page.
+
+CREATE OR REPLACE FUNCTION public.get_activity_feed(
+    p_tenant_id uuid,
+    p_before_timestamp timestamptz DEFAULT NULL,
+    p_before_id uuid DEFAULT NULL,
+    p_limit int DEFAULT 50
+)
+RETURNS TABLE (
+    event_id text,
+    "timestamp" timestamptz,
+    tenant_id uuid,
+    category text,
+    severity text,
+    summary text,
+    actor_id uuid,
+    actor_email text,
+    details jsonb
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT
+        e.id::text,
+        e.occurred_at,
+        e.tenant_id,
+        e.category,
+        e.severity,
+        e.summary,
+        e.actor_id,
+        e.actor_email,
+        e.details
+    FROM activity_feed_events e
+    WHERE e.tenant_id = p_tenant_id
+      AND (e.occurred_at, e.id) < (
+          COALESCE(p_before_timestamp, 'infinity'::timestamptz),
+          COALESCE(p_before_id, 'ffffffff-ffff-ffff-ffff-ffffffffffff'::uuid)
+      )
+    ORDER BY e.occurred_at DESC, e.id DESC
+    LIMIT LEAST(GREATEST(COALESCE(p_limit, 50), 1), 500);
+$$;
+
+
+-- ============================================================================
+-- 6. RETENTION
+-- ============================================================================
+-- DATA_CHANGE events are copies of audit_logs rows, so they expire with the
+-- audit month they came from: same cutoff as maintain_audit_log_partitions.
+-- COMMUNICATION events mirror communications, which is kept, so they stay.
+-- Deletes at most p_batch rows per call; audit_retention.py calls it until it
+-- returns 0, committing in between.
+
+CREATE INDEX IF NOT EXISTS idx_activity_feed_events_data_change_occurred
+    ON activity_feed_events (occurred_at)
+    WHERE category = 'DATA_CHANGE';
+
+CREATE OR REPLACE FUNCTION prune_activity_feed_events(
+    p_retain_months int DEFAULT 12,
+    p_batch int DEFAULT 10000
+)
+RETURNS bigint
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_cutoff timestamptz;
+    v_deleted bigint;
+BEGIN
+    IF p_retain_months IS NULL OR p_retain_months < 1 THEN
+        RAISE EXCEPTION 'p_retain_months must be at least 1 (got %)', p_retain_months;
+    END IF;
+
+    v_cutoff := date_trunc('month', now()) - make_interval(months => p_retain_months);
+
+    DELETE FROM activity_feed_events
+    WHERE id IN (
+        SELECT id
+        FROM activity_feed_events
+        WHERE category = 'DATA_CHANGE'
+          AND occurred_at < v_cutoff
+        LIMIT GREATEST(COALESCE(p_batch, 10000), 1)
+    );
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+
+    RETURN v_deleted;
+END;
+$$;
+
+-- Retention is for audit_retention.py (service connection) only
+REVOKE EXECUTE ON FUNCTION prune_activity_feed_events(int, int) FROM PUBLIC, anon, authenticated;
+
+GRANT SELECT ON activity_feed_events TO authenticated;
+GRANT SELECT ON tenant_activity_feed TO authenticated;
+GRANT EXECUTE ON FUNCTION public.get_activity_feed(uuid, timestamptz, uuid, int) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,174 @@
+-- Migration: Batched Task State and Set-Based Reorder
+-- Purpose: set_job_tasks_state applies any number of checklist changes for a
+--          job in one UPDATE (the worker app coalesces taps into one call
+--          instead of one toggle_job_task per tap), and reorder_rows replaces
+--          the per-row loops of the reorder_* RPCs with one UPDATE.
+-- Date: 2025-02-03
+
+-- ============================================================================
+-- 1. SET JOB TASKS STATE
+-- ============================================================================
+-- p_changes: [ { id: uuid, is_completed: boolean } ] (at most 500)
+-- The last change wins when a task appears more than once. Tasks already in
+-- the requested state, or not on this job, are left alone.
+--
+-- Returns { success, job_id, updated, tasks: [ { id, is_completed } ] }
+-- where tasks are the rows actually changed.
+
+CREATE OR REPLACE FUNCTION public.set_job_tasks_state(
+    p_job_id uuid,
+    p_changes jsonb
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_tasks jsonb;
+BEGIN
+    IF jsonb_typeof(p_changes) IS DISTINCT FROM 'array' THEN
+        RETURN jsonb_build_object('success', false, 'error', 'p_changes must be a JSON array');
+    END IF;
+
+    IF jsonb_array_length(p_changes) > 500 THEN
+        RETURN jsonb_build_object('success', false, 'error', 'At most 500 changes per call');
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM jobs WHERE id = p_job_id AND deleted_at IS NULL) THEN
+        RETURN jsonb_build_object('success', false, 'error', 'Job not found');
+    END IF;
+
+    WITH changes AS (
+        SELECT DISTINCT ON (c.id) c.id, c.is_completed
+        FROM ROWS FROM (jsonb_to_recordset(p_changes) AS (id uuid, is_completed boolean))
+             WITH ORDINALITY AS c(id, is_completed, ord)
+        WHERE c.id IS NOT NULL
+          AND c.is_completed IS NOT NULL
+        ORDER BY c.id, c.ord DESC
+    ),
+    updated AS (
+        UPDATE job_tasks t
+        SET is_completed = c.is_completed,
+            updated_at = NOW()
+        FROM changes c
+        WHERE t.id = c.id
+          AND t.job_id = p_job_id
+          AND t.is_completed IS DISTINCT FROM c.is_completed
+        RETURNING t.id, t.is_completed
+    )
+    SELECT COALESCE(jsonb_agg(jsonb_build_object('id', u.id, 'is_completed', u.is_completed)), '[]'::jsonb)
+    INTO v_tasks
+    FROM updated u;
+
+    RETURN jsonb_build_object(
+        'success', true,
+        'job_id', p_job_id,
+        'updated', jsonb_array_length(v_tasks),
+        'tasks', v_tasks
+    );
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.set_job_tasks_state(uuid, jsonb) TO authenticated;
+
+
+-- ============================================================================
+-- 2. GENERIC REORDER (internal)
+-- ============================================================================
+-- Sets sort_order to each id's 0-based position in p_ids with one UPDATE;
+-- rows already in place are not written. Only tables listed here can be
+-- reordered.
+
+CREATE OR REPLACE FUNCTION reorder_rows(p_table text, p_ids uuid[])
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_updated integer;
+BEGIN
+    IF p_table NOT IN ('job_templates', 'service_templates', 'bom_templates', 'roles') THEN
+        RAISE EXCEPTION 'Table % cannot be reordered', p_table;
+    END IF;
+
+    EXECUTE format(
+        'UPDATE %I t
+         SET sort_order = o.position, updated_at = NOW()
+         FROM (
+             SELECT DISTINCT ON (u.id) u.id, (u.ord - 1)::int AS position
+             FROM unnest($1) WITH ORDINALITY AS u(id, ord)
+             ORDER BY u.id, u.ord
+         ) o
+         WHERE t.id = o.id
+           AND t.sort_order IS DISTINCT FROM o.position',
+        p_table
+    ) USING p_ids;
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION reorder_rows(text, uuid[]) FROM PUBLIC, anon, authenticated;
+
+
+-- ============================================================================
+-- 3. REORDER RPCS
+-- ============================================================================
+-- Same signatures and results as before.
+
+CREATE OR REPLACE FUNCTION reorder_job_templates(p_ids UUID[])
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    PERFORM reorder_rows('job_templates', p_ids);
+    RETURN jsonb_build_object('success', TRUE);
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION reorder_service_templates(p_ids UUID[])
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    PERFORM reorder_rows('service_templates', p_ids);
+    RETURN jsonb_build_object('success', TRUE);
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION reorder_bom_templates(p_ids UUID[])
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    PERFORM reorder_rows('bom_templates', p_ids);
+    RETURN jsonb_build_object('success', TRUE);
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION reorder_roles(p_ids UUID[])
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    PERFORM reorder_rows('roles', p_ids);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION reorder_job_templates(UUID[]) TO authenticated;
+GRANT EXECUTE ON FUNCTION reorder_service_templates(UUID[]) TO authenticated;
+GRANT EXECUTE ON FUNCTION reorder_bom_templates(UUID[]) TO authenticated;
+GRANT EXECUTE ON FUNCTION reorder_roles(UUID[]) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,416 @@
+-- Migration: Materialized Calendar Events
+-- Purpose: Replace the master_calendar UNION view with a table maintained by
+--          triggers, plus a date-windowed read RPC.
+-- Date: 2025-01-24
+--
+-- master_calendar UNIONed every booking and every visit of the tenant, joined
+-- properties / calendar_feeds and evaluated lower(cf.url) LIKE '%airbnb%' per
+-- row, and the calendar had no date predicate so it loaded all of history.
+-- Each booking / visible visit is now projected once into calendar_events
+-- with its color and class precomputed, and get_calendar_events reads only
+-- the rows overlapping the visible window through a GiST index on `during`.
+
+-- btree_gist lets tenant_id (uuid) and the range share one GiST index
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- ============================================================================
+-- 1. TABLE
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS calendar_events (
+    id uuid PRIMARY KEY,                    -- bookings.id / visits.id
+    tenant_id uuid NOT NULL,
+    property_id uuid NOT NULL,
+    event_type text NOT NULL,               -- Booking | Job
+    job_id uuid,
+    title text,
+    description text,
+    start_date timestamptz NOT NULL,
+    end_date timestamptz NOT NULL,
+    during tstzrange GENERATED ALWAYS AS
+        (tstzrange(start_date, GREATEST(end_date, start_date), '[]')) STORED,
+    all_day boolean NOT NULL DEFAULT false,
+    color text,
+    class_name text NOT NULL DEFAULT '',
+    code text NOT NULL DEFAULT '',
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_calendar_events_tenant_during
+    ON calendar_events USING gist (tenant_id, during);
+
+CREATE INDEX IF NOT EXISTS idx_calendar_events_property_during
+    ON calendar_events USING gist (property_id, during);
+
+-- Built by an earlier version of add_hot_path_indexes.sql for the
+-- master_calendar visit branch; superseded by the GiST indexes
+DROP INDEX IF EXISTS idx_visits_calendar;
+
+CREATE INDEX IF NOT EXISTS idx_calendar_events_job_id
+    ON calendar_events (job_id)
+    WHERE job_id IS NOT NULL;
+
+ALTER TABLE calendar_events ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS tenant_isolation ON calendar_events;
+CREATE POLICY tenant_isolation ON calendar_events
+FOR SELECT TO public
+USING (tenant_id = get_my_tenant_id());
+
+
+-- ============================================================================
+-- 2. PROJECTION
+-- ============================================================================
+-- Both functions are set-based and idempotent: rows that no longer qualify
+-- (cancelled booking, deleted job, unscheduled / aborted visit) are removed,
+-- everything else is upserted.
+
+CREATE OR REPLACE FUNCTION sync_calendar_bookings(p_booking_ids uuid[])
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    DELETE FROM calendar_events ce
+    WHERE ce.id = ANY(p_booking_ids)
+      AND NOT EXISTS (
+          SELECT 1 FROM bookings b
+          WHERE b.id = ce.id
+            AND b.status != 'cancelled'
+            AND b.start_date IS NOT NULL
+      );
+
+    INSERT INTO calendar_events (
+        id, tenant_id, property_id, event_type, job_id, title, description,
+        start_date, end_date, all_day, color, class_name, code, updated_at
+    )
+    SELECT
+        b.id,
+        COALESCE(b.tenant_id, p.tenant_id),
+        b.property_id,
+        'Booking',
+        NULL,
+        COALESCE(b.guest_name, b.ical_summary, 'Booking'),
+        COALESCE(b.ical_summary, b.status),
+        b.start_date::timestamp,
+        COALESCE(b.end_date, b.start_date)::timestamp,
+        true,
+        CASE
+            WHEN cf.id IS NOT NULL THEN
+                CASE
+                    WHEN lower(cf.name) LIKE '%airbnb%' OR lower(cf.url) LIKE '%airbnb%' THEN '#FF5A5F' -- Airbnb Pink
+                    WHEN lower(cf.name) LIKE '%vrbo%' OR lower(cf.url) LIKE '%vrbo%' THEN '#3b82f6' -- VRBO Blue
+                    ELSE '#f97316' -- Other Feeds: Orange
+                END
+            WHEN b.status = 'confirmed' THEN '#22c55e' -- Manual Booking: Green
+            WHEN b.status = 'pending' THEN '#f59e0b'
+            ELSE '#6b7280'
+        END,
+        '',
+        '',
+        now()
+    FROM bookings b
+    JOIN properties p ON p.id = b.property_id
+    LEFT JOIN calendar_feeds cf ON cf.id = b.feed_id
+    WHERE b.id = ANY(p_booking_ids)
+      AND b.status != 'cancelled'
+      AND b.start_date IS NOT NULL
+      AND COALESCE(b.tenant_id, p.tenant_id) IS NOT NULL
+    ON CONFLICT (id) DO UPDATE SET
+        tenant_id = EXCLUDED.tenant_id,
+        property_id = EXCLUDED.property_id,
+        title = EXCLUDED.title,
+        description = EXCLUDED.description,
+        start_date = EXCLUDED.start_date,
+        end_date = EXCLUDED.end_date,
+        color = EXCLUDED.color,
+        updated_at = EXCLUDED.updated_at
+    WHERE (calendar_events.tenant_id, calendar_events.property_id, calendar_events.title,
+           calendar_events.description, calendar_events.start_date, calendar_events.end_date,
+           calendar_events.color)
+          IS DISTINCT FROM
+          (EXCLUDED.tenant_id, EXCLUDED.property_id, EXCLUDED.title,
+           EXCLUDED.description, EXCLUDED.start_date, EXCLUDED.end_date,
+           EXCLUDED.color);
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION sync_calendar_visits(p_visit_ids uuid[])
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    DELETE FROM calendar_events ce
+    WHERE ce.id = ANY(p_visit_ids)
+      AND NOT EXISTS (
+          SELECT 1
+          FROM visits v
+          JOIN jobs j ON j.id = v.job_id
+          WHERE v.id = ce.id
+            AND v.scheduled_start IS NOT NULL
+            AND j.deleted_at IS NULL
+            AND j.property_id IS NOT NULL
+            AND v.status NOT IN ('Cancelled', 'Aborted')
+      );
+
+    INSERT INTO calendar_events (
+        id, tenant_id, property_id, event_type, job_id, title, description,
+        start_date, end_date, all_day, color, class_name, code, updated_at
+    )
+    SELECT
+        v.id,
+        j.tenant_id,
+        j.property_id,
+        'Job',
+        j.id,
+        j.title,
+        j.description,
+        v.scheduled_start,
+        COALESCE(v.scheduled_end, v.scheduled_start + interval '1 hour'),
+        false,
+        CASE
+            WHEN v.status = 'Completed' THEN '#10b981' -- Emerald
+            WHEN v.status = 'In Progress' THEN '#2563eb' -- Blue-600 (Active)
+            WHEN v.status = 'Scheduled' THEN '#0ea5e9' -- Sky-500 (Planned)
+            ELSE '#64748b' -- Slate-500 (Default)
+        END,
+        CASE
+            WHEN j.status = 'Complete' THEN 'status-completed'
+            WHEN v.status = 'Completed' THEN 'status-completed'
+            WHEN v.status = 'In Progress' THEN 'status-started'
+            ELSE ''
+        END,
+        '',
+        now()
+    FROM visits v
+    JOIN jobs j ON j.id = v.job_id
+    WHERE v.id = ANY(p_visit_ids)
+      AND v.scheduled_start IS NOT NULL
+      AND j.deleted_at IS NULL
+      AND j.property_id IS NOT NULL
+      AND j.tenant_id IS NOT NULL
+      AND v.status NOT IN ('Cancelled', 'Aborted')
+    ON CONFLICT (id) DO UPDATE SET
+        tenant_id = EXCLUDED.tenant_id,
+        property_id = EXCLUDED.property_id,
+        job_id = EXCLUDED.job_id,
+        title = EXCLUDED.title,
+        description = EXCLUDED.description,
+        start_date = EXCLUDED.start_date,
+        end_date = EXCLUDED.end_date,
+        color = EXCLUDED.color,
+        class_name = EXCLUDED.class_name,
+        updated_at = EXCLUDED.updated_at
+    WHERE (calendar_events.tenant_id, calendar_events.property_id, calendar_events.job_id,
+           calendar_events.title, calendar_events.description, calendar_events.start_date,
+           calendar_events.end_date, calendar_events.color, calendar_events.class_name)
+          IS DISTINCT FROM
+          (EXCLUDED.tenant_id, EXCLUDED.property_id, EXCLUDED.job_id,
+           EXCLUDED.title, EXCLUDED.description, EXCLUDED.start_date,
+           EXCLUDED.end_date, EXCLUDED.color, EXCLUDED.class_name);
+END;
+$$;
+
+
+-- ============================================================================
+-- 3. TRIGGERS
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION trg_calendar_sync_booking()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM calendar_events WHERE id = OLD.id;
+        RETURN NULL;
+    END IF;
+
+    PERFORM sync_calendar_bookings(ARRAY[NEW.id]);
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION trg_calendar_sync_visit()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM calendar_events WHERE id = OLD.id;
+        RETURN NULL;
+    END IF;
+
+    PERFORM sync_calendar_visits(ARRAY[NEW.id]);
+    RETURN NULL;
+END;
+$$;
+
+-- A job's title / description / status / property / soft delete show up on
+-- every one of its visits
+CREATE OR REPLACE FUNCTION trg_calendar_sync_job()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF (OLD.title, OLD.description, OLD.status, OLD.property_id, OLD.deleted_at, OLD.tenant_id)
+       IS NOT DISTINCT FROM
+       (NEW.title, NEW.description, NEW.status, NEW.property_id, NEW.deleted_at, NEW.tenant_id) THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM sync_calendar_visits(ARRAY(SELECT id FROM visits WHERE job_id = NEW.id));
+    RETURN NULL;
+END;
+$$;
+
+-- Booking colors depend on the feed's name / url
+CREATE OR REPLACE FUNCTION trg_calendar_sync_feed()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF (OLD.name, OLD.url) IS NOT DISTINCT FROM (NEW.name, NEW.url) THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM sync_calendar_bookings(ARRAY(SELECT id FROM bookings WHERE feed_id = NEW.id));
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_calendar_sync ON bookings;
+CREATE TRIGGER trg_calendar_sync
+    AFTER INSERT OR UPDATE OR DELETE ON bookings
+    FOR EACH ROW EXECUTE FUNCTION trg_calendar_sync_booking();
+
+DROP TRIGGER IF EXISTS trg_calendar_sync ON visits;
+CREATE TRIGGER trg_calendar_sync
+    AFTER INSERT OR UPDATE OR DELETE ON visits
+    FOR EACH ROW EXECUTE FUNCTION trg_calendar_sync_visit();
+
+DROP TRIGGER IF EXISTS trg_calendar_sync ON jobs;
+CREATE TRIGGER trg_calendar_sync
+    AFTER UPDATE ON jobs
+    FOR EACH ROW EXECUTE FUNCTION trg_calendar_sync_job();
+
+DROP TRIGGER IF EXISTS trg_calendar_sync ON calendar_feeds;
+CREATE TRIGGER trg_calendar_sync
+    AFTER UPDATE ON calendar_feeds
+    FOR EACH ROW EXECUTE FUNCTION trg_calendar_sync_feed();
+
+
+-- ============================================================================
+-- 4. BACKFILL
+-- ============================================================================
+
+SELECT sync_calendar_bookings(ARRAY(SELECT id FROM bookings WHERE status != 'cancelled'));
+SELECT sync_calendar_visits(ARRAY(SELECT id FROM visits WHERE scheduled_start IS NOT NULL));
+
+
+-- ============================================================================
+-- 5. COMPATIBILITY VIEW
+-- ============================================================================
+-- Same columns as before so the legacy v/ calendar keeps working; it is now a
+-- thin projection of the table.
+
+DROP VIEW IF EXISTS master_calendar;
+CREATE VIEW master_calendar AS
+SELECT
+    e.id::text AS id,
+    e.property_id,
+    p.name AS property_name,
+    p.display_address AS property_address,
+    e.title,
+    e.start_date,
+    e.end_date,
+    e.event_type,
+    e.color,
+    e.class_name,
+    e.all_day,
+    e.description,
+    e.code,
+    e.job_id,
+    e.tenant_id
+FROM calendar_events e
+JOIN properties p ON p.id = e.property_id;
+
+
+-- ============================================================================
+-- 6. DATE-WINDOWED READ RPC
+-- ============================================================================
+-- Returns the events overlapping [p_range_start, p_range_end) for one
+-- property, or for the whole tenant when p_property_id is NULL.
+-- p_include_bookings = false skips iCal / manual bookings (the "All
+-- Properties" calendar only shows jobs).
+
+CREATE OR REPLACE FUNCTION public.get_calendar_events(
+    p_tenant_id uuid,
+    p_range_start timestamptz,
+    p_range_end timestamptz,
+    p_property_id uuid DEFAULT NULL,
+    p_include_bookings boolean DEFAULT true
+)
+RETURNS TABLE (
+    id text,
+    property_id uuid,
+    property_name text,
+    property_address text,
+    title text,
+    start_date timestamptz,
+    end_date timestamptz,
+    event_type text,
+    color text,
+    class_name text,
+    all_day boolean,
+    description text,
+    code text,
+    job_id uuid,
+    updated_at timestamptz
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT
+        e.id::text,
+        e.property_id,
+        p.name,
+        p.display_address,
+        e.title,
+        e.start_date,
+        e.end_date,
+        e.event_type,
+        e.color,
+        e.class_name,
+        e.all_day,
+        e.description,
+        e.code,
+        e.job_id,
+        e.updated_at
+    FROM calendar_events e
+    JOIN properties p ON p.id = e.property_id
+    WHERE e.tenant_id = p_tenant_id
+      AND e.during && tstzrange(p_range_start, p_range_end, '[)')
+      AND (p_property_id IS NULL OR e.property_id = p_property_id)
+      AND (p_include_bookings OR e.event_type <> 'Booking')
+    ORDER BY e.start_date, e.id;
+$$;
+
+GRANT SELECT ON calendar_events TO authenticated;
+GRANT SELECT ON master_calendar TO authenticated;
+GRANT EXECUTE ON FUNCTION public.get_calendar_events(uuid, timestamptz, timestamptz, uuid, boolean) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
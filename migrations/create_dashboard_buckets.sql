@@ -0,0 +1,302 @@
+-- Migration: Dashboard Buckets
+-- Purpose: Replace get_dashboard_horizon (every active job, bucketed per row on
+--          every load, then re-bucketed in JS) with a maintained
+--          jobs.effective_date, an index on it, and RPCs that return the
+--          per-bucket counts plus the first N jobs of each bucket, with the
+--          rest of a bucket (and cards for realtime changes) loaded on demand.
+-- Date: 2025-01-28
+
+-- ===========================================
+-- 1. EFFECTIVE DATE COLUMN
+-- ===========================================
+-- effective_date = COALESCE(scheduled_at, service_opportunities.due_date, created_at)
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS effective_date timestamptz;
+
+CREATE OR REPLACE FUNCTION set_job_effective_date()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.effective_date := COALESCE(
+        NEW.scheduled_at,
+        (SELECT so.due_date FROM service_opportunities so WHERE so.id = NEW.service_opportunity_id),
+        NEW.created_at,
+        now()
+    );
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_job_effective_date ON jobs;
+CREATE TRIGGER trg_job_effective_date
+    BEFORE INSERT OR UPDATE OF scheduled_at, service_opportunity_id, created_at ON jobs
+    FOR EACH ROW EXECUTE FUNCTION set_job_effective_date();
+
+-- A new due date moves the opportunity's unscheduled jobs
+CREATE OR REPLACE FUNCTION sync_job_effective_date_from_opportunity()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    UPDATE jobs j
+    SET effective_date = COALESCE(NEW.due_date, j.created_at)
+    WHERE j.service_opportunity_id = NEW.id
+      AND j.scheduled_at IS NULL
+      AND j.effective_date IS DISTINCT FROM COALESCE(NEW.due_date, j.created_at);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_job_effective_date ON service_opportunities;
+CREATE TRIGGER trg_job_effective_date
+    AFTER UPDATE OF due_date ON service_opportunities
+    FOR EACH ROW
+    WHEN (OLD.due_date IS DISTINCT FROM NEW.due_date)
+    EXECUTE FUNCTION sync_job_effective_date_from_opportunity();
+
+-- Backfill
+UPDATE jobs j
+SET effective_date = COALESCE(j.scheduled_at, so.due_date, j.created_at)
+FROM service_opportunities so
+WHERE so.id = j.service_opportunity_id
+  AND j.effective_date IS DISTINCT FROM COALESCE(j.scheduled_at, so.due_date, j.created_at);
+
+UPDATE jobs
+SET effective_date = COALESCE(scheduled_at, created_at)
+WHERE service_opportunity_id IS NULL
+  AND effective_date IS DISTINCT FROM COALESCE(scheduled_at, created_at);
+
+
+-- ===========================================
+-- 2. INDEX
+-- ===========================================
+-- Active board jobs in date order; each bucket is a range scan on it
+CREATE INDEX IF NOT EXISTS idx_jobs_tenant_active_effective_date
+    ON jobs (tenant_id, effective_date, id)
+    WHERE deleted_at IS NULL
+      AND status <> 'Complete'
+      AND service_opportunity_id IS NOT NULL;
+
+ANALYZE jobs;
+
+
+-- ===========================================
+-- 3. BUCKET BOUNDARIES
+-- ===========================================
+-- Same buckets as get_dashboard_horizon, as [range_start, range_end) ranges
+-- (NULL = unbounded). Weeks start on Monday (date_trunc('week')).
+CREATE OR REPLACE FUNCTION public.dashboard_bucket_ranges()
+RETURNS TABLE (bucket text, sort_order int, range_start timestamptz, range_end timestamptz)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH b AS (
+        SELECT
+            CURRENT_DATE::timestamptz AS b0,
+            (CURRENT_DATE + 1)::timestamptz AS b1,
+            (CURRENT_DATE + 2)::timestamptz AS b2,
+            GREATEST((CURRENT_DATE + 2)::timestamptz, date_trunc('week', CURRENT_DATE::timestamptz) + interval '7 days') AS b3,
+            GREATEST((CURRENT_DATE + 2)::timestamptz, date_trunc('week', CURRENT_DATE::timestamptz) + interval '14 days') AS b4
+    )
+    SELECT r.bucket, r.sort_order, r.range_start, r.range_end
+    FROM b,
+    LATERAL (VALUES
+        ('overdue',   1, NULL::timestamptz, b.b0),
+        ('today',     2, b.b0, b.b1),
+        ('tomorrow',  3, b.b1, b.b2),
+        ('this_week', 4, b.b2, b.b3),
+        ('next_week', 5, b.b3, b.b4),
+        ('future',    6, b.b4, NULL::timestamptz)
+    ) AS r(bucket, sort_order, range_start, range_end);
+$$;
+
+
+-- ===========================================
+-- 4. DASHBOARD BUCKETS RPC
+-- ===========================================
+-- Returns {
+--   counts:  { overdue: int, today: int, ... },
+--   buckets: { overdue: [job, ...], today: [...], ... }   -- first p_per_bucket each
+--   ranges:  { overdue: [range_start, range_end], ... }   -- so realtime updates can be re-bucketed
+-- }
+-- job: { id, type, status, scheduled_at, created_at, effective_date, metadata,
+--        property_name, service_name, bucket }
+-- Page through the rest of a bucket with get_dashboard_bucket_page.
+
+CREATE OR REPLACE FUNCTION public.get_dashboard_buckets(
+    p_tenant_id uuid,
+    p_per_bucket int DEFAULT 20
+)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    WITH ranges AS (
+        SELECT * FROM dashboard_bucket_ranges()
+    ),
+    per_bucket AS (
+        SELECT
+            r.bucket,
+            r.range_start,
+            r.range_end,
+            (
+                SELECT count(*)
+                FROM jobs j
+                WHERE j.tenant_id = p_tenant_id
+                  AND j.deleted_at IS NULL
+                  AND j.status <> 'Complete'
+                  AND j.service_opportunity_id IS NOT NULL
+                  AND (r.range_start IS NULL OR j.effective_date >= r.range_start)
+                  AND (r.range_end IS NULL OR j.effective_date < r.range_end)
+            ) AS total,
+            COALESCE((
+                SELECT jsonb_agg(page.card ORDER BY page.effective_date, page.id)
+                FROM (
+                    SELECT
+                        j.id,
+                        j.effective_date,
+                        jsonb_build_object(
+                            'id', j.id,
+                            'type', j.type,
+                            'status', j.status,
+                            'scheduled_at', j.scheduled_at,
+                            'created_at', j.created_at,
+                            'effective_date', j.effective_date,
+                            'metadata', j.metadata,
+                            'property_name', p.name,
+                            'service_name', st.name,
+                            'bucket', r.bucket
+                        ) AS card
+                    FROM jobs j
+                    JOIN service_opportunities so ON so.id = j.service_opportunity_id
+                    JOIN properties p ON p.id = so.property_id
+                    LEFT JOIN service_templates st ON st.id = so.service_template_id
+                    WHERE j.tenant_id = p_tenant_id
+                      AND j.deleted_at IS NULL
+                      AND j.status <> 'Complete'
+                      AND j.service_opportunity_id IS NOT NULL
+                      AND (r.range_start IS NULL OR j.effective_date >= r.range_start)
+                      AND (r.range_end IS NULL OR j.effective_date < r.range_end)
+                    ORDER BY j.effective_date, j.id
+                    LIMIT LEAST(GREATEST(COALESCE(p_per_bucket, 20), 0), 200)
+                ) page
+            ), '[]'::jsonb) AS jobs
+        FROM ranges r
+    )
+    SELECT jsonb_build_object(
+        'counts', jsonb_object_agg(bucket, total),
+        'buckets', jsonb_object_agg(bucket, jobs),
+        'ranges', jsonb_object_agg(bucket, jsonb_build_array(range_start, range_end))
+    )
+    FROM per_bucket;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.get_dashboard_buckets(uuid, int) TO authenticated;
+
+
+-- ===========================================
+-- 5. DASHBOARD BUCKET PAGE RPC
+-- ===========================================
+-- Lazy loading for one column: the jobs after p_cursor ({ effective_date, id },
+-- taken from the last card shown) in the same order and shape as above.
+
+CREATE OR REPLACE FUNCTION public.get_dashboard_bucket_page(
+    p_tenant_id uuid,
+    p_bucket text,
+    p_cursor jsonb DEFAULT NULL,
+    p_limit int DEFAULT 20
+)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT COALESCE(jsonb_agg(page.card ORDER BY page.effective_date, page.id), '[]'::jsonb)
+    FROM (
+        SELECT
+            j.id,
+            j.effective_date,
+            jsonb_build_object(
+                'id', j.id,
+                'type', j.type,
+                'status', j.status,
+                'scheduled_at', j.scheduled_at,
+                'created_at', j.created_at,
+                'effective_date', j.effective_date,
+                'metadata', j.metadata,
+                'property_name', p.name,
+                'service_name', st.name,
+                'bucket', r.bucket
+            ) AS card
+        FROM dashboard_bucket_ranges() r
+        JOIN jobs j
+          ON j.tenant_id = p_tenant_id
+         AND j.deleted_at IS NULL
+         AND j.status <> 'Complete'
+         AND j.service_opportunity_id IS NOT NULL
+         AND (r.range_start IS NULL OR j.effective_date >= r.range_start)
+         AND (r.range_end IS NULL OR j.effective_date < r.range_end)
+        JOIN service_opportunities so ON so.id = j.service_opportunity_id
+        JOIN properties p ON p.id = so.property_id
+        LEFT JOIN service_templates st ON st.id = so.service_template_id
+        WHERE r.bucket = p_bucket
+          AND (p_cursor IS NULL
+               OR (j.effective_date, j.id) > ((p_cursor->>'effective_date')::timestamptz, (p_cursor->>'id')::uuid))
+        ORDER BY j.effective_date, j.id
+        LIMIT LEAST(GREATEST(COALESCE(p_limit, 20), 1), 200)
+    ) page;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.get_dashboard_bucket_page(uuid, text, jsonb, int) TO authenticated;
+
+
+-- ===========================================
+-- 6. DASHBOARD CARDS RPC
+-- ===========================================
+-- The cards of specific jobs (same shape as above), for realtime inserts and
+-- updates that land inside a column's loaded page. Jobs no longer on the
+-- board are left out.
+
+CREATE OR REPLACE FUNCTION public.get_dashboard_cards(
+    p_tenant_id uuid,
+    p_job_ids uuid[]
+)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT COALESCE(jsonb_agg(jsonb_build_object(
+        'id', j.id,
+        'type', j.type,
+        'status', j.status,
+        'scheduled_at', j.scheduled_at,
+        'created_at', j.created_at,
+        'effective_date', j.effective_date,
+        'metadata', j.metadata,
+        'property_name', p.name,
+        'service_name', st.name,
+        'bucket', r.bucket
+    ) ORDER BY j.effective_date, j.id), '[]'::jsonb)
+    FROM jobs j
+    JOIN dashboard_bucket_ranges() r
+      ON (r.range_start IS NULL OR j.effective_date >= r.range_start)
+     AND (r.range_end IS NULL OR j.effective_date < r.range_end)
+    JOIN service_opportunities so ON so.id = j.service_opportunity_id
+    JOIN properties p ON p.id = so.property_id
+    LEFT JOIN service_templates st ON st.id = so.service_template_id
+    WHERE j.id = ANY(p_job_ids)
+      AND j.tenant_id = p_tenant_id
+      AND j.deleted_at IS NULL
+      AND j.status <> 'Complete';
+$$;
+
+GRANT EXECUTE ON FUNCTION public.get_dashboard_cards(uuid, uuid[]) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,270 @@
+-- Migration: Set-Based Service Workflow Generation
+-- Purpose: generate_service_workflow inserted one job per workflow step in a
+--          PL/pgSQL loop, followed by one task INSERT per job. Workflows are now
+--          materialized for any number of opportunities with one jobs INSERT
+--          and one job_tasks INSERT, and generate_service_workflows is a
+--          batch entry point for seasonal campaigns across many properties.
+-- Date: 2025-02-03
+
+-- ============================================================================
+-- 1. MATERIALIZE WORKFLOWS (internal)
+-- ============================================================================
+-- Creates the jobs and tasks for every workflow step of the given
+-- opportunities' templates and moves those opportunities to In Progress.
+-- No validation: callers decide which opportunities are eligible.
+-- Job ids are generated up front so the task INSERT can join each job to its
+-- step's job template.
+
+CREATE OR REPLACE FUNCTION materialize_service_workflows(p_service_opportunity_ids UUID[])
+RETURNS TABLE (
+    job_id UUID,
+    service_opportunity_id UUID,
+    title TEXT,
+    sort_order INTEGER
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_job_ids UUID[];
+    v_opportunity_ids UUID[];
+    v_titles TEXT[];
+    v_sort_orders INTEGER[];
+    v_job_template_ids UUID[];
+BEGIN
+    -- All jobs in one statement
+    WITH planned AS MATERIALIZED (
+        SELECT
+            gen_random_uuid() AS job_id,
+            so.id AS service_opportunity_id,
+            so.tenant_id,
+            so.property_id,
+            sws.job_template_id,
+            sws.sort_order,
+            -- Job title from job template name, or fallback
+            COALESCE(
+                jt.name,
+                'Step ' || row_number() OVER (PARTITION BY so.id ORDER BY sws.sort_order, sws.id)
+            ) AS title
+        FROM service_opportunities so
+        JOIN service_workflow_steps sws ON sws.service_template_id = so.service_template_id
+        LEFT JOIN job_templates jt ON jt.id = sws.job_template_id
+        WHERE so.id = ANY(p_service_opportunity_ids)
+    ),
+    inserted AS (
+        INSERT INTO jobs (
+            id,
+            tenant_id,
+            service_opportunity_id,
+            property_id,
+            title,
+            description,
+            status,
+            priority,
+            sort_order,
+            created_at,
+            updated_at
+        )
+        SELECT
+            p.job_id,
+            p.tenant_id,
+            p.service_opportunity_id,
+            p.property_id,
+            p.title,
+            '',
+            'Pending',
+            'normal',
+            p.sort_order,
+            NOW(),
+            NOW()
+        FROM planned p
+        ORDER BY p.service_opportunity_id, p.sort_order
+        RETURNING id
+    )
+    SELECT
+        array_agg(p.job_id ORDER BY p.service_opportunity_id, p.sort_order),
+        array_agg(p.service_opportunity_id ORDER BY p.service_opportunity_id, p.sort_order),
+        array_agg(p.title ORDER BY p.service_opportunity_id, p.sort_order),
+        array_agg(p.sort_order ORDER BY p.service_opportunity_id, p.sort_order),
+        array_agg(p.job_template_id ORDER BY p.service_opportunity_id, p.sort_order)
+    INTO v_job_ids, v_opportunity_ids, v_titles, v_sort_orders, v_job_template_ids
+    FROM planned p
+    JOIN inserted i ON i.id = p.job_id;
+
+    IF v_job_ids IS NULL THEN
+        RETURN;
+    END IF;
+
+    -- All tasks in one statement, joined on the inserted job ids
+    INSERT INTO job_tasks (id, job_id, title, is_completed, created_at)
+    SELECT
+        gen_random_uuid(),
+        s.job_id,
+        tt.title,
+        FALSE,
+        NOW()
+    FROM unnest(v_job_ids, v_job_template_ids) WITH ORDINALITY AS s(job_id, job_template_id, ord)
+    JOIN task_templates tt ON tt.job_template_id = s.job_template_id
+    ORDER BY s.ord, tt.order_index;
+
+    UPDATE service_opportunities
+    SET status = 'In Progress', updated_at = NOW()
+    WHERE id IN (SELECT DISTINCT unnest(v_opportunity_ids));
+
+    RETURN QUERY
+    SELECT *
+    FROM unnest(v_job_ids, v_opportunity_ids, v_titles, v_sort_orders);
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION materialize_service_workflows(UUID[]) FROM PUBLIC, anon, authenticated;
+
+
+-- ============================================================================
+-- 2. GENERATE SERVICE WORKFLOW (single opportunity)
+-- ============================================================================
+-- Same errors and result shape as before.
+
+CREATE OR REPLACE FUNCTION generate_service_workflow(p_service_opportunity_id UUID)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_opp RECORD;
+    v_jobs_created INTEGER;
+    v_created_jobs JSONB;
+BEGIN
+    SELECT so.id, so.service_template_id
+    INTO v_opp
+    FROM service_opportunities so
+    WHERE so.id = p_service_opportunity_id;
+
+    IF v_opp.id IS NULL THEN
+        RAISE EXCEPTION 'Service Opportunity % not found', p_service_opportunity_id;
+    END IF;
+
+    IF v_opp.service_template_id IS NULL THEN
+        RAISE EXCEPTION 'Service Opportunity has no template assigned';
+    END IF;
+
+    SELECT
+        count(*)::int,
+        COALESCE(jsonb_agg(jsonb_build_object(
+            'job_id', m.job_id,
+            'title', m.title,
+            'sort_order', m.sort_order
+        ) ORDER BY m.sort_order), '[]'::jsonb)
+    INTO v_jobs_created, v_created_jobs
+    FROM materialize_service_workflows(ARRAY[p_service_opportunity_id]) m;
+
+    RETURN jsonb_build_object(
+        'success', TRUE,
+        'jobs_created', v_jobs_created,
+        'jobs', v_created_jobs
+    );
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION generate_service_workflow(UUID) TO authenticated;
+
+
+-- ============================================================================
+-- 3. GENERATE SERVICE WORKFLOWS (batch)
+-- ============================================================================
+-- Generates workflows for up to 1000 opportunities of one tenant.
+-- Opportunities that already have jobs are skipped, so a campaign can be
+-- re-run safely; the rows are locked first so concurrent runs cannot both
+-- generate the same workflow.
+--
+-- Returns {
+--   success, jobs_created,
+--   generated: [ { service_opportunity_id, jobs_created } ],
+--   skipped:   [ { service_opportunity_id, reason } ]
+-- }
+
+CREATE OR REPLACE FUNCTION generate_service_workflows(
+    p_tenant_id UUID,
+    p_service_opportunity_ids UUID[]
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_eligible UUID[];
+    v_skipped JSONB;
+    v_generated JSONB;
+    v_jobs_created INTEGER;
+BEGIN
+    IF cardinality(p_service_opportunity_ids) > 1000 THEN
+        RAISE EXCEPTION 'At most 1000 service opportunities per batch';
+    END IF;
+
+    PERFORM 1
+    FROM service_opportunities
+    WHERE id = ANY(p_service_opportunity_ids)
+      AND tenant_id = p_tenant_id
+    ORDER BY id
+    FOR UPDATE;
+
+    WITH requested AS (
+        SELECT DISTINCT r.id
+        FROM unnest(p_service_opportunity_ids) AS r(id)
+        WHERE r.id IS NOT NULL
+    ),
+    classified AS (
+        SELECT
+            r.id,
+            CASE
+                WHEN so.id IS NULL THEN 'Service Opportunity not found'
+                WHEN so.service_template_id IS NULL THEN 'Service Opportunity has no template assigned'
+                WHEN EXISTS (
+                    SELECT 1 FROM jobs j
+                    WHERE j.service_opportunity_id = so.id
+                      AND j.deleted_at IS NULL
+                ) THEN 'Workflow already generated'
+            END AS reason
+        FROM requested r
+        LEFT JOIN service_opportunities so
+          ON so.id = r.id
+         AND so.tenant_id = p_tenant_id
+         AND so.deleted_at IS NULL
+    )
+    SELECT
+        array_agg(c.id) FILTER (WHERE c.reason IS NULL),
+        COALESCE(
+            jsonb_agg(jsonb_build_object('service_opportunity_id', c.id, 'reason', c.reason))
+                FILTER (WHERE c.reason IS NOT NULL),
+            '[]'::jsonb)
+    INTO v_eligible, v_skipped
+    FROM classified c;
+
+    SELECT
+        COALESCE(sum(g.jobs_created), 0)::int,
+        COALESCE(jsonb_agg(jsonb_build_object(
+            'service_opportunity_id', g.service_opportunity_id,
+            'jobs_created', g.jobs_created
+        )), '[]'::jsonb)
+    INTO v_jobs_created, v_generated
+    FROM (
+        SELECT m.service_opportunity_id, count(*)::int AS jobs_created
+        FROM materialize_service_workflows(COALESCE(v_eligible, '{}')) m
+        GROUP BY m.service_opportunity_id
+    ) g;
+
+    RETURN jsonb_build_object(
+        'success', TRUE,
+        'jobs_created', v_jobs_created,
+        'generated', v_generated,
+        'skipped', v_skipped
+    );
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION generate_service_workflows(UUID, UUID[]) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
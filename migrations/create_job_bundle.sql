@@ -0,0 +1,252 @@
+-- Migration: Job Bundle RPC
+-- Purpose: get_job_bundle returns a job and any of its related sections
+--          (tasks, assignments, comments, photos, timers, visits, artifacts,
+--          dispositions) in one call, with a version token so a client that
+--          already holds the current bundle gets a tiny "not modified" reply.
+--          Replaces the 6-8 RPCs the job detail screens made per open.
+-- Date: 2025-02-03
+
+-- ============================================================================
+-- 1. SECTIONS
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION public.job_bundle_sections()
+RETURNS text[]
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT ARRAY['tasks', 'assignments', 'comments', 'photos', 'timers', 'visits', 'artifacts', 'dispositions'];
+$$;
+
+
+-- ============================================================================
+-- 2. VERSION TOKEN
+-- ============================================================================
+-- Fingerprint of the job row, its property and opportunity, and the rows of
+-- each requested section: row count plus the sum of the rows' xmin (every
+-- insert, update or delete changes one of them). Only the index on job_id of
+-- each section table is read, no payload columns.
+
+CREATE OR REPLACE FUNCTION public.job_bundle_version(p_job_id uuid, p_sections text[])
+RETURNS text
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT md5(concat_ws('|',
+        array_to_string(p_sections, ','),
+        j.xmin::text, p.xmin::text, so.xmin::text,
+        CASE WHEN 'tasks' = ANY(p_sections) THEN
+            (SELECT count(*) || '.' || COALESCE(sum(t.xmin::text::bigint), 0)
+             FROM job_tasks t WHERE t.job_id = j.id) END,
+        CASE WHEN 'assignments' = ANY(p_sections) THEN
+            (SELECT count(*) || '.' || COALESCE(sum(ja.xmin::text::bigint), 0)
+             FROM job_assignments ja WHERE ja.job_id = j.id) END,
+        CASE WHEN 'comments' = ANY(p_sections) THEN
+            (SELECT count(*) || '.' || COALESCE(sum(c.xmin::text::bigint), 0)
+             FROM job_comments c WHERE c.job_id = j.id) END,
+        CASE WHEN 'photos' = ANY(p_sections) THEN
+            (SELECT count(*) || '.' || COALESCE(sum(ph.xmin::text::bigint), 0)
+             FROM job_photos ph WHERE ph.job_id = j.id) END,
+        CASE WHEN 'timers' = ANY(p_sections) THEN
+            (SELECT count(*) || '.' || COALESCE(sum(tm.xmin::text::bigint), 0)
+             FROM job_timers tm WHERE tm.job_id = j.id) END,
+        CASE WHEN 'visits' = ANY(p_sections) OR 'artifacts' = ANY(p_sections) THEN
+            (SELECT count(*) || '.' || COALESCE(sum(v.xmin::text::bigint), 0)
+             FROM visits v WHERE v.job_id = j.id) END,
+        CASE WHEN 'artifacts' = ANY(p_sections) THEN
+            (SELECT count(*) || '.' || COALESCE(sum(a.xmin::text::bigint), 0)
+             FROM artifacts a
+             WHERE a.job_id = j.id
+                OR a.visit_id IN (SELECT v.id FROM visits v WHERE v.job_id = j.id)) END,
+        CASE WHEN 'dispositions' = ANY(p_sections) THEN
+            (SELECT count(*) || '.' || COALESCE(sum(jd.xmin::text::bigint), 0)
+             FROM job_dispositions jd WHERE jd.job_id = j.id) END
+    ))
+    FROM jobs j
+    LEFT JOIN properties p ON p.id = j.property_id
+    LEFT JOIN service_opportunities so ON so.id = j.service_opportunity_id
+    WHERE j.id = p_job_id;
+$$;
+
+
+-- ============================================================================
+-- 3. GET JOB BUNDLE RPC
+-- ============================================================================
+-- p_sections: any of job_bundle_sections(); NULL = all of them.
+-- p_if_version: version from a previous call with the same sections.
+--
+-- Returns the get_job_detail fields plus one key per requested section and
+-- { version, sections }, or { not_modified: true, version } when
+-- p_if_version is still current, or { error } like get_job_detail.
+
+CREATE OR REPLACE FUNCTION public.get_job_bundle(
+    p_job_id uuid,
+    p_sections text[] DEFAULT NULL,
+    p_if_version text DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_sections text[];
+    v_version text;
+    v_result jsonb;
+BEGIN
+    SELECT COALESCE(array_agg(DISTINCT s ORDER BY s), '{}')
+    INTO v_sections
+    FROM unnest(COALESCE(p_sections, job_bundle_sections())) AS s;
+
+    IF NOT v_sections <@ job_bundle_sections() THEN
+        RETURN jsonb_build_object('error', 'Unknown section');
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM jobs WHERE id = p_job_id AND deleted_at IS NULL) THEN
+        RETURN jsonb_build_object('error', 'Job not found');
+    END IF;
+
+    v_version := job_bundle_version(p_job_id, v_sections);
+
+    IF p_if_version IS NOT NULL AND p_if_version = v_version THEN
+        RETURN jsonb_build_object('not_modified', true, 'version', v_version);
+    END IF;
+
+    SELECT
+        jsonb_build_object(
+            'version', v_version,
+            'sections', to_jsonb(v_sections),
+            'id', j.id,
+            'title', j.title,
+            'description', j.description,
+            'status', j.status,
+            'priority', j.priority,
+            'readable_id', j.readable_id,
+            'created_at', j.created_at,
+            'property', jsonb_build_object(
+                'id', p.id,
+                'name', p.name,
+                'address', p.display_address,
+                'front_photo_url', p.front_photo_url
+            ),
+            'opportunity', CASE
+                WHEN so.id IS NOT NULL THEN
+                    jsonb_build_object('id', so.id, 'title', so.title)
+            END
+        )
+        || CASE WHEN 'tasks' = ANY(v_sections) THEN jsonb_build_object('tasks', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                'id', t.id,
+                'title', t.title,
+                'is_completed', t.is_completed
+            ) ORDER BY t.id), '[]'::jsonb)
+            FROM job_tasks t WHERE t.job_id = j.id
+        )) ELSE '{}'::jsonb END
+        || CASE WHEN 'assignments' = ANY(v_sections) THEN jsonb_build_object('assignments', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                'id', ja.id,
+                'person_id', pe.id,
+                'name', TRIM(COALESCE(pe.first_name, '') || ' ' || COALESCE(pe.last_name, '')),
+                'email', pe.email,
+                'created_at', ja.created_at
+            )), '[]'::jsonb)
+            FROM job_assignments ja
+            JOIN people pe ON pe.id = ja.person_id
+            WHERE ja.job_id = j.id
+        )) ELSE '{}'::jsonb END
+        || CASE WHEN 'comments' = ANY(v_sections) THEN jsonb_build_object('comments', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                'id', c.id,
+                'content', c.content,
+                'created_at', c.created_at,
+                'author', jsonb_build_object(
+                    'id', pe.id,
+                    'name', TRIM(COALESCE(pe.first_name, '') || ' ' || COALESCE(pe.last_name, ''))
+                )
+            ) ORDER BY c.created_at DESC), '[]'::jsonb)
+            FROM job_comments c
+            LEFT JOIN people pe ON pe.id = c.author_id
+            WHERE c.job_id = j.id
+        )) ELSE '{}'::jsonb END
+        || CASE WHEN 'photos' = ANY(v_sections) THEN jsonb_build_object('photos', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                'id', ph.id,
+                'photo_url', ph.photo_url,
+                'caption', ph.caption,
+                'created_at', ph.created_at
+            ) ORDER BY ph.created_at DESC), '[]'::jsonb)
+            FROM job_photos ph
+            WHERE ph.job_id = j.id
+        )) ELSE '{}'::jsonb END
+        || CASE WHEN 'timers' = ANY(v_sections) THEN jsonb_build_object('timers', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                'id', tm.id,
+                'user_id', tm.user_id,
+                'started_at', tm.started_at,
+                'stopped_at', tm.stopped_at
+            ) ORDER BY tm.started_at DESC), '[]'::jsonb)
+            FROM job_timers tm
+            WHERE tm.job_id = j.id
+        )) ELSE '{}'::jsonb END
+        || CASE WHEN 'visits' = ANY(v_sections) THEN jsonb_build_object('visits', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                'id', v.id,
+                'visit_number', v.visit_number,
+                'status', v.status,
+                'scheduled_start', v.scheduled_start,
+                'scheduled_end', v.scheduled_end,
+                'actual_start', v.actual_start,
+                'actual_end', v.actual_end
+            ) ORDER BY v.visit_number), '[]'::jsonb)
+            FROM visits v
+            WHERE v.job_id = j.id
+        )) ELSE '{}'::jsonb END
+        || CASE WHEN 'artifacts' = ANY(v_sections) THEN jsonb_build_object('artifacts', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                'id', a.id,
+                'visit_id', a.visit_id,
+                'artifact_type', a.artifact_type,
+                'submitted_by', a.submitted_by,
+                'submitted_by_name', pe.first_name || ' ' || pe.last_name,
+                'submitted_as_role', a.submitted_as_role,
+                'role_name', r.name,
+                'submitted_at', a.submitted_at,
+                'payload', a.payload,
+                'is_invalidated', a.invalidated_by_artifact_id IS NOT NULL,
+                'corrects_artifact_id', a.corrects_artifact_id
+            ) ORDER BY a.submitted_at), '[]'::jsonb)
+            FROM artifacts a
+            JOIN people pe ON pe.id = a.submitted_by
+            JOIN roles r ON r.id = a.submitted_as_role
+            WHERE a.job_id = j.id
+               OR a.visit_id IN (SELECT v.id FROM visits v WHERE v.job_id = j.id)
+        )) ELSE '{}'::jsonb END
+        || CASE WHEN 'dispositions' = ANY(v_sections) THEN jsonb_build_object('dispositions', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                'id', jd.id,
+                'disposition_type', jd.disposition_type,
+                'reason', jd.reason,
+                'disposed_by', jd.disposed_by,
+                'disposed_by_name', pe.first_name || ' ' || pe.last_name,
+                'disposed_at', jd.disposed_at
+            ) ORDER BY jd.disposed_at DESC), '[]'::jsonb)
+            FROM job_dispositions jd
+            JOIN people pe ON pe.id = jd.disposed_by
+            WHERE jd.job_id = j.id
+        )) ELSE '{}'::jsonb END
+    INTO v_result
+    FROM jobs j
+    LEFT JOIN properties p ON p.id = j.property_id
+    LEFT JOIN service_opportunities so ON so.id = j.service_opportunity_id
+    WHERE j.id = p_job_id;
+
+    RETURN v_result;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.get_job_bundle(uuid, text[], text) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,175 @@
+-- Migration: Paginated Jobs List
+-- Purpose: Keyset-paginated, server-filtered replacement for list_jobs in the Jobs view
+-- Date: 2025-01-22
+
+-- ===========================================
+-- 1. INDEX
+-- ===========================================
+-- Default ordering and keyset cursor: newest first within a tenant
+CREATE INDEX IF NOT EXISTS idx_jobs_tenant_created_id
+    ON jobs (tenant_id, created_at DESC, id DESC)
+    WHERE deleted_at IS NULL;
+
+
+-- ===========================================
+-- 2. LIST JOBS PAGE RPC
+-- ===========================================
+-- list_jobs returns the tenant's entire history in one blob and the Jobs view
+-- sorts / searches it client-side. This returns one page at a time.
+--
+-- p_sort_key: 'created_at' (default), 'title', 'status', 'properties.name',
+--             'service_opportunities.title' (same keys as the JobsView columns)
+-- p_cursor:   the next_cursor object returned by the previous page, or NULL
+-- p_date_from / p_date_to filter on created_at ([from, to))
+--
+-- Returns { jobs: [...], next_cursor: {...} | null, total_count: int | null }
+-- Each job has the same shape as list_jobs.
+
+CREATE OR REPLACE FUNCTION public.list_jobs_page(
+    p_tenant_id uuid,
+    p_status_filter text[] DEFAULT NULL,
+    p_search text DEFAULT NULL,
+    p_property_id uuid DEFAULT NULL,
+    p_date_from timestamptz DEFAULT NULL,
+    p_date_to timestamptz DEFAULT NULL,
+    p_sort_key text DEFAULT 'created_at',
+    p_sort_dir text DEFAULT 'desc',
+    p_cursor jsonb DEFAULT NULL,
+    p_limit int DEFAULT 50,
+    p_include_total boolean DEFAULT false
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_limit int := LEAST(GREATEST(COALESCE(p_limit, 50), 1), 200);
+    v_dir text := CASE WHEN lower(p_sort_dir) = 'asc' THEN 'ASC' ELSE 'DESC' END;
+    v_cmp text := CASE WHEN lower(p_sort_dir) = 'asc' THEN '>' ELSE '<' END;
+    v_sort_expr text;
+    v_search text;
+    v_filter text;
+    v_keyset text;
+    v_jobs jsonb;
+    v_next jsonb;
+    v_total bigint;
+BEGIN
+    -- Sort expressions are allow-listed; anything else falls back to created_at
+    v_sort_expr := CASE p_sort_key
+        WHEN 'title' THEN 'lower(COALESCE(j.title, ''''))'
+        WHEN 'status' THEN 'COALESCE(j.status, '''')'
+        WHEN 'properties.name' THEN 'lower(COALESCE(p.name, ''''))'
+        WHEN 'service_opportunities.title' THEN 'lower(COALESCE(so.title, ''''))'
+        ELSE 'NULL::text'
+    END;
+
+    -- ILIKE pattern with the user's wildcards escaped
+    IF NULLIF(trim(p_search), '') IS NOT NULL THEN
+        v_search := '%' || replace(replace(replace(trim(p_search), '\', '\\'), '%', '\%'), '_', '\_') || '%';
+    END IF;
+
+    v_filter := '
+        j.tenant_id = $1
+        AND j.deleted_at IS NULL
+        AND ($2::text[] IS NULL OR j.status = ANY($2))
+        AND ($3::uuid IS NULL OR j.property_id = $3)
+        AND ($4::timestamptz IS NULL OR j.created_at >= $4)
+        AND ($5::timestamptz IS NULL OR j.created_at < $5)
+        AND ($6::text IS NULL
+             OR j.title ILIKE $6
+             OR p.name ILIKE $6
+             OR so.title ILIKE $6
+             OR j.status ILIKE $6)';
+
+    IF p_cursor IS NULL THEN
+        v_keyset := 'true';
+    ELSIF v_sort_expr = 'NULL::text' THEN
+        v_keyset := format('(j.created_at, j.id) %s ($7, $8)', v_cmp);
+    ELSE
+        v_keyset := format('(%s, j.created_at, j.id) %s ($9, $7, $8)', v_sort_expr, v_cmp);
+    END IF;
+
+    -- One extra row tells us whether there is a next page. Visits are only
+    -- aggregated for the rows on the page.
+    EXECUTE format($q$
+        WITH page AS (
+            SELECT
+                j.id, j.title, j.status, j.priority, j.property_id, j.created_at, j.tenant_id,
+                p.name AS property_name,
+                so.id AS so_id, so.title AS so_title, so.due_date AS so_due_date,
+                %1$s AS sort_value
+            FROM jobs j
+            LEFT JOIN properties p ON j.property_id = p.id
+            LEFT JOIN service_opportunities so ON j.service_opportunity_id = so.id
+            WHERE %2$s AND %3$s
+            ORDER BY %1$s %4$s, j.created_at %4$s, j.id %4$s
+            LIMIT %5$s + 1
+        ),
+        numbered AS (
+            SELECT page.*, row_number() OVER (ORDER BY sort_value %4$s, created_at %4$s, id %4$s) AS rn
+            FROM page
+        )
+        SELECT
+            COALESCE(jsonb_agg(
+                jsonb_build_object(
+                    'id', n.id,
+                    'title', n.title,
+                    'status', n.status,
+                    'priority', n.priority,
+                    'property_id', n.property_id,
+                    'created_at', n.created_at,
+                    'tenant_id', n.tenant_id,
+                    'scheduled_visits', COALESCE(sv.visits, '[]'::jsonb),
+                    'properties', jsonb_build_object('name', n.property_name),
+                    'service_opportunities', CASE
+                        WHEN n.so_id IS NOT NULL THEN jsonb_build_object(
+                            'title', n.so_title,
+                            'due_date', n.so_due_date
+                        )
+                        ELSE NULL
+                    END
+                ) ORDER BY n.rn
+            ) FILTER (WHERE n.rn <= %5$s), '[]'::jsonb),
+            (
+                SELECT jsonb_build_object('created_at', l.created_at, 'id', l.id, 'sort_value', l.sort_value)
+                FROM numbered l
+                WHERE l.rn = %5$s
+                  AND EXISTS (SELECT 1 FROM numbered x WHERE x.rn > %5$s)
+            )
+        FROM numbered n
+        LEFT JOIN LATERAL (
+            SELECT jsonb_agg(v.scheduled_start ORDER BY v.scheduled_start ASC) AS visits
+            FROM visits v
+            WHERE v.job_id = n.id
+              AND v.status IN ('Scheduled', 'Pending')
+              AND v.scheduled_start IS NOT NULL
+        ) sv ON true
+    $q$, v_sort_expr, v_filter, v_keyset, v_dir, v_limit)
+    INTO v_jobs, v_next
+    USING p_tenant_id, p_status_filter, p_property_id, p_date_from, p_date_to, v_search,
+          (p_cursor->>'created_at')::timestamptz, (p_cursor->>'id')::uuid, p_cursor->>'sort_value';
+
+    IF p_include_total THEN
+        EXECUTE format($q$
+            SELECT count(*)
+            FROM jobs j
+            LEFT JOIN properties p ON j.property_id = p.id
+            LEFT JOIN service_opportunities so ON j.service_opportunity_id = so.id
+            WHERE %s
+        $q$, v_filter)
+        INTO v_total
+        USING p_tenant_id, p_status_filter, p_property_id, p_date_from, p_date_to, v_search;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'jobs', v_jobs,
+        'next_cursor', v_next,
+        'total_count', v_total
+    );
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.list_jobs_page(uuid, text[], text, uuid, timestamptz, timestamptz, text, text, jsonb, int, boolean) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
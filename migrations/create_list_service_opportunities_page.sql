@@ -0,0 +1,144 @@
+-- Migration: Paginated Service Opportunities List
+-- Purpose: One round trip for the Service Opportunities view: a keyset page of
+--          opportunities with their workflow jobs and the per-status counts.
+--          Expired snoozes are resolved at read time instead of by
+--          update_expired_snoozes() being called from every browser session.
+-- Date: 2025-01-26
+
+-- ===========================================
+-- 1. INDEX
+-- ===========================================
+-- Default ordering and keyset cursor: newest first within a tenant
+CREATE INDEX IF NOT EXISTS idx_service_opportunities_tenant_created_id
+    ON service_opportunities (tenant_id, created_at DESC, id DESC)
+    WHERE deleted_at IS NULL;
+
+
+-- ===========================================
+-- 2. LIST SERVICE OPPORTUNITIES PAGE RPC
+-- ===========================================
+-- A snoozed opportunity whose snooze_until has passed is reported (and filtered)
+-- as 'Open' with snooze_until NULL, exactly as if update_expired_snoozes() had
+-- run; the stored row is left for the server-side expiry to update.
+--
+-- p_status_filter: effective statuses to include, NULL for all
+-- p_cursor:        the next_cursor object returned by the previous page, or NULL
+--
+-- Returns {
+--   opportunities: [ { ...service_opportunities row, properties: {name},
+--                      service_templates: {name} | null,
+--                      jobs: [ {id, service_opportunity_id, title,
+--                              status, sort_order} ] } ],
+--   next_cursor: { created_at, id } | null,
+--   counts: { <status>: int, ... }   -- whole tenant, ignores the status filter
+-- }
+
+CREATE OR REPLACE FUNCTION public.list_service_opportunities_page(
+    p_tenant_id uuid,
+    p_status_filter text[] DEFAULT NULL,
+    p_cursor jsonb DEFAULT NULL,
+    p_limit int DEFAULT 100
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_limit int := LEAST(GREATEST(COALESCE(p_limit, 100), 1), 500);
+    v_cursor_created timestamptz := (p_cursor->>'created_at')::timestamptz;
+    v_cursor_id uuid := (p_cursor->>'id')::uuid;
+    v_now timestamptz := now();
+    v_opportunities jsonb;
+    v_next jsonb;
+    v_counts jsonb;
+BEGIN
+    -- One extra row tells us whether there is a next page. Jobs are only
+    -- aggregated for the rows on the page.
+    WITH resolved AS (
+        SELECT
+            so.*,
+            (so.status = 'Snoozed' AND so.snooze_until <= v_now) AS snooze_expired
+        FROM service_opportunities so
+        WHERE so.tenant_id = p_tenant_id
+          AND so.deleted_at IS NULL
+    ),
+    page AS (
+        SELECT
+            r.*,
+            CASE WHEN r.snooze_expired THEN 'Open' ELSE r.status END AS effective_status
+        FROM resolved r
+        WHERE (p_status_filter IS NULL
+               OR (CASE WHEN r.snooze_expired THEN 'Open' ELSE r.status END) = ANY(p_status_filter))
+          AND (v_cursor_id IS NULL OR (r.created_at, r.id) < (v_cursor_created, v_cursor_id))
+        ORDER BY r.created_at DESC, r.id DESC
+        LIMIT v_limit + 1
+    ),
+    numbered AS (
+        SELECT page.*, row_number() OVER (ORDER BY created_at DESC, id DESC) AS rn
+        FROM page
+    )
+    SELECT
+        COALESCE(jsonb_agg(
+            (to_jsonb(n) - 'snooze_expired' - 'effective_status' - 'rn')
+            || jsonb_build_object(
+                'status', n.effective_status,
+                'snooze_until', CASE WHEN n.snooze_expired THEN NULL ELSE n.snooze_until END,
+                'properties', jsonb_build_object('name', p.name),
+                'service_templates', CASE
+                    WHEN st.id IS NOT NULL THEN jsonb_build_object('name', st.name)
+                    ELSE NULL
+                END,
+                'jobs', COALESCE(wj.jobs, '[]'::jsonb)
+            ) ORDER BY n.rn
+        ) FILTER (WHERE n.rn <= v_limit), '[]'::jsonb),
+        (
+            SELECT jsonb_build_object('created_at', l.created_at, 'id', l.id)
+            FROM numbered l
+            WHERE l.rn = v_limit
+              AND EXISTS (SELECT 1 FROM numbered x WHERE x.rn > v_limit)
+        )
+    INTO v_opportunities, v_next
+    FROM numbered n
+    LEFT JOIN properties p ON p.id = n.property_id
+    LEFT JOIN service_templates st ON st.id = n.service_template_id
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(
+            jsonb_build_object(
+                'id', j.id,
+                'service_opportunity_id', j.service_opportunity_id,
+                'title', j.title,
+                'status', j.status,
+                'sort_order', j.sort_order
+            ) ORDER BY j.sort_order NULLS LAST, j.created_at
+        ) AS jobs
+        FROM jobs j
+        WHERE j.service_opportunity_id = n.id
+          AND j.deleted_at IS NULL
+    ) wj ON n.rn <= v_limit;
+
+    -- Per-status counts for the filter badges (idx_service_opportunities_tenant_status_due)
+    SELECT COALESCE(jsonb_object_agg(c.status, c.n), '{}'::jsonb)
+    INTO v_counts
+    FROM (
+        SELECT
+            CASE WHEN so.status = 'Snoozed' AND so.snooze_until <= v_now THEN 'Open' ELSE so.status END AS status,
+            count(*) AS n
+        FROM service_opportunities so
+        WHERE so.tenant_id = p_tenant_id
+          AND so.deleted_at IS NULL
+        GROUP BY 1
+    ) c;
+
+    RETURN jsonb_build_object(
+        'opportunities', v_opportunities,
+        'next_cursor', v_next,
+        'counts', v_counts
+    );
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.list_service_opportunities_page(uuid, text[], jsonb, int) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
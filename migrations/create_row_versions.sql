@@ -0,0 +1,580 @@
+-- Migration: Row Versions
+-- Purpose: jobs, properties and service_opportunities get a row_version that
+--          increases whenever the row or one of its child rows (tasks, visits,
+--          comments, photos, assignments, inventory, access codes, ...)
+--          changes. The list RPCs return it, so a cached list is the
+--          baseline. get_versions(ids[]) returns the current versions of
+--          many entities in one small call so client caches can revalidate
+--          them without refetching detail RPCs.
+-- Date: 2025-02-03
+
+-- ============================================================================
+-- 1. COLUMNS
+-- ============================================================================
+-- One sequence for all three tables, so versions only ever grow. Existing
+-- rows start at 0 (no table rewrite); new rows take the next value.
+
+CREATE SEQUENCE IF NOT EXISTS entity_row_version_seq;
+
+-- Direct table writes from the client take versions too
+GRANT USAGE ON SEQUENCE entity_row_version_seq TO authenticated;
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS row_version BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS row_version BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE service_opportunities ADD COLUMN IF NOT EXISTS row_version BIGINT NOT NULL DEFAULT 0;
+
+ALTER TABLE jobs ALTER COLUMN row_version SET DEFAULT nextval('entity_row_version_seq');
+ALTER TABLE properties ALTER COLUMN row_version SET DEFAULT nextval('entity_row_version_seq');
+ALTER TABLE service_opportunities ALTER COLUMN row_version SET DEFAULT nextval('entity_row_version_seq');
+
+
+-- ============================================================================
+-- 2. OWN CHANGES
+-- ============================================================================
+-- Any update takes a new version unless the statement already set one (the
+-- child bump below).
+
+CREATE OR REPLACE FUNCTION bump_row_version()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.row_version IS NOT DISTINCT FROM OLD.row_version THEN
+        NEW.row_version := nextval('entity_row_version_seq');
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_row_version ON jobs;
+CREATE TRIGGER trg_row_version
+    BEFORE UPDATE ON jobs
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+
+DROP TRIGGER IF EXISTS trg_row_version ON properties;
+CREATE TRIGGER trg_row_version
+    BEFORE UPDATE ON properties
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+
+DROP TRIGGER IF EXISTS trg_row_version ON service_opportunities;
+CREATE TRIGGER trg_row_version
+    BEFORE UPDATE ON service_opportunities
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+
+
+-- ============================================================================
+-- 3. CHILD CHANGES
+-- ============================================================================
+-- Statement-level, so a statement touching 80 tasks bumps their job once.
+-- Usage: bump_parent_row_version('<parent table>', '<fk column>'
+--                                [, '<via column>', '<via table>'])
+-- With a via table the parent is also found through it: artifacts bump the
+-- job of their job_id and the job of their visit_id's visit.
+-- Parents are locked in id order to avoid deadlocks between statements that
+-- touch several parents.
+--
+-- Write amplification: every bump is an UPDATE of the parent row, which
+-- locks it until the child's transaction ends, writes a new row version and
+-- is published to Realtime as a parent UPDATE. So only children the client
+-- caches are registered, and child UPDATEs only bump when they set a column
+-- the job bundle (get_job_bundle) or the opportunity list shows. Property
+-- children bump on any update; they change only through the property form.
+-- A job's own bump does not cascade to its opportunity: the opportunity list
+-- shows the job's title, status and order, not its tasks or visits.
+
+CREATE OR REPLACE FUNCTION bump_parent_row_version()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_transition text;
+    v_selects text[] := '{}';
+BEGIN
+    FOREACH v_transition IN ARRAY CASE TG_OP
+        WHEN 'INSERT' THEN ARRAY['new_rows']
+        WHEN 'DELETE' THEN ARRAY['old_rows']
+        ELSE ARRAY['new_rows', 'old_rows']
+    END
+    LOOP
+        v_selects := v_selects || format('SELECT %I FROM %I', TG_ARGV[1], v_transition);
+        IF TG_NARGS > 2 THEN
+            v_selects := v_selects || format(
+                'SELECT %I FROM %I WHERE id IN (SELECT %I FROM %I)',
+                TG_ARGV[1], TG_ARGV[3], TG_ARGV[2], v_transition
+            );
+        END IF;
+    END LOOP;
+
+    EXECUTE format(
+        'UPDATE %1$I SET row_version = nextval(''entity_row_version_seq'')
+         WHERE id IN (
+             SELECT id FROM %1$I
+             WHERE id IN (%2$s)
+             ORDER BY id
+             FOR UPDATE
+         )',
+        TG_ARGV[0], array_to_string(v_selects, ' UNION ')
+    );
+
+    RETURN NULL;
+END;
+$$;
+
+DO $$
+DECLARE
+    v_child RECORD;
+    v_table text;
+    v_args text;
+    v_update_of text;
+BEGIN
+    -- Registered by an earlier version of this migration; not shown by the
+    -- job bundle
+    FOREACH v_table IN ARRAY ARRAY['job_inputs', 'job_checklist_items']
+    LOOP
+        IF to_regclass('public.' || v_table) IS NOT NULL THEN
+            EXECUTE format('DROP TRIGGER IF EXISTS trg_parent_row_version_ins ON %I', v_table);
+            EXECUTE format('DROP TRIGGER IF EXISTS trg_parent_row_version_upd ON %I', v_table);
+            EXECUTE format('DROP TRIGGER IF EXISTS trg_parent_row_version_del ON %I', v_table);
+        END IF;
+    END LOOP;
+
+    FOR v_child IN
+        SELECT * FROM (VALUES
+            -- Job children: the columns get_job_bundle shows
+            ('job_tasks',                 'jobs',                  'job_id',     NULL::text, NULL::text,
+                ARRAY['job_id', 'title', 'is_completed']),
+            ('visits',                    'jobs',                  'job_id',     NULL, NULL,
+                ARRAY['job_id', 'visit_number', 'status', 'scheduled_start', 'scheduled_end', 'actual_start', 'actual_end']),
+            ('job_comments',              'jobs',                  'job_id',     NULL, NULL,
+                ARRAY['job_id', 'content', 'author_id']),
+            ('job_photos',                'jobs',                  'job_id',     NULL, NULL,
+                ARRAY['job_id', 'photo_url', 'caption']),
+            ('job_assignments',           'jobs',                  'job_id',     NULL, NULL,
+                ARRAY['job_id', 'person_id']),
+            ('job_timers',                'jobs',                  'job_id',     NULL, NULL,
+                ARRAY['job_id', 'user_id', 'started_at', 'stopped_at']),
+            ('job_dispositions',          'jobs',                  'job_id',     NULL, NULL,
+                ARRAY['job_id', 'disposition_type', 'reason']),
+            ('artifacts',                 'jobs',                  'job_id',     'visit_id', 'visits',
+                ARRAY['job_id', 'visit_id', 'payload', 'invalidated_by_artifact_id', 'corrects_artifact_id']),
+            -- Property children
+            ('property_inventory',        'properties',            'property_id', NULL, NULL, NULL::text[]),
+            ('property_access_codes',     'properties',            'property_id', NULL, NULL, NULL),
+            ('property_instructions',     'properties',            'property_id', NULL, NULL, NULL),
+            ('property_attachments',      'properties',            'property_id', NULL, NULL, NULL),
+            ('property_reference_photos', 'properties',            'property_id', NULL, NULL, NULL),
+            ('property_assignments',      'properties',            'property_id', NULL, NULL, NULL),
+            -- Opportunity children: the job fields list_service_opportunities_page shows
+            ('jobs',                      'service_opportunities', 'service_opportunity_id', NULL, NULL,
+                ARRAY['service_opportunity_id', 'title', 'status', 'sort_order', 'deleted_at'])
+        ) AS t(child_table, parent_table, fk_column, via_column, via_table, update_columns)
+    LOOP
+        IF to_regclass('public.' || v_child.child_table) IS NULL THEN
+            RAISE NOTICE 'Skipping %, table does not exist', v_child.child_table;
+            CONTINUE;
+        END IF;
+
+        v_args := format('%L, %L', v_child.parent_table, v_child.fk_column);
+        IF v_child.via_column IS NOT NULL THEN
+            v_args := v_args || format(', %L, %L', v_child.via_column, v_child.via_table);
+        END IF;
+
+        v_update_of := 'UPDATE';
+        IF v_child.update_columns IS NOT NULL THEN
+            SELECT 'UPDATE OF ' || string_agg(quote_ident(c), ', ')
+            INTO v_update_of
+            FROM unnest(v_child.update_columns) AS c;
+        END IF;
+
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_parent_row_version_ins ON %I', v_child.child_table);
+        EXECUTE format(
+            'CREATE TRIGGER trg_parent_row_version_ins AFTER INSERT ON %I
+             REFERENCING NEW TABLE AS new_rows
+             FOR EACH STATEMENT EXECUTE FUNCTION bump_parent_row_version(%s)',
+            v_child.child_table, v_args
+        );
+
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_parent_row_version_upd ON %I', v_child.child_table);
+        EXECUTE format(
+            'CREATE TRIGGER trg_parent_row_version_upd AFTER %s ON %I
+             REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+             FOR EACH STATEMENT EXECUTE FUNCTION bump_parent_row_version(%s)',
+            v_update_of, v_child.child_table, v_args
+        );
+
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_parent_row_version_del ON %I', v_child.child_table);
+        EXECUTE format(
+            'CREATE TRIGGER trg_parent_row_version_del AFTER DELETE ON %I
+             REFERENCING OLD TABLE AS old_rows
+             FOR EACH STATEMENT EXECUTE FUNCTION bump_parent_row_version(%s)',
+            v_child.child_table, v_args
+        );
+    END LOOP;
+END $$;
+
+
+-- ============================================================================
+-- 4. KEEP VERSION BUMPS OUT OF OTHER TRIGGERS
+-- ============================================================================
+-- A child bump is an UPDATE of the parent row. The audit trigger skips
+-- updates that only change row_version (or only fill in a missing
+-- tenant_id, as before), and the jobs calendar sync only fires for the
+-- columns it reads.
+
+CREATE OR REPLACE FUNCTION record_audit_log_with_tenant()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_old_data jsonb;
+    v_new_data jsonb;
+    v_row jsonb;
+    v_user_id uuid;
+    v_tenant_id uuid := null;
+BEGIN
+    -- Try to get user ID from Supabase Auth
+    v_user_id := auth.uid();
+
+    IF (TG_OP = 'DELETE') THEN
+        v_old_data := to_jsonb(OLD);
+        v_new_data := null;
+        v_row := v_old_data;
+    ELSIF (TG_OP = 'INSERT') THEN
+        v_old_data := null;
+        v_new_data := to_jsonb(NEW);
+        v_row := v_new_data;
+    ELSE
+        -- UPDATE: Check if data actually changed
+        IF OLD IS NOT DISTINCT FROM NEW THEN
+            RETURN NEW;
+        END IF;
+        v_old_data := to_jsonb(OLD);
+        v_new_data := to_jsonb(NEW);
+        IF (v_old_data - 'row_version') = (v_new_data - 'row_version')
+           OR ((v_old_data->>'tenant_id') IS NULL
+               AND (v_old_data - 'tenant_id' - 'row_version') = (v_new_data - 'tenant_id' - 'row_version')) THEN
+            RETURN NEW;
+        END IF;
+        v_row := v_new_data;
+    END IF;
+
+    v_tenant_id := (v_row->>'tenant_id')::uuid;
+
+    IF v_tenant_id IS NULL THEN
+        IF (v_row->>'property_id') IS NOT NULL THEN
+            SELECT tenant_id INTO v_tenant_id FROM properties WHERE id = (v_row->>'property_id')::uuid;
+        ELSIF (v_row->>'job_id') IS NOT NULL THEN
+            SELECT tenant_id INTO v_tenant_id FROM jobs WHERE id = (v_row->>'job_id')::uuid;
+        ELSIF (v_row->>'visit_id') IS NOT NULL THEN
+            SELECT tenant_id INTO v_tenant_id FROM visits WHERE id = (v_row->>'visit_id')::uuid;
+        ELSIF (v_row->>'service_opportunity_id') IS NOT NULL THEN
+            SELECT tenant_id INTO v_tenant_id FROM service_opportunities WHERE id = (v_row->>'service_opportunity_id')::uuid;
+        ELSIF (v_row->>'job_template_id') IS NOT NULL THEN
+            SELECT tenant_id INTO v_tenant_id FROM job_templates WHERE id = (v_row->>'job_template_id')::uuid;
+        ELSIF (v_row->>'bom_template_id') IS NOT NULL THEN
+            SELECT tenant_id INTO v_tenant_id FROM bom_templates WHERE id = (v_row->>'bom_template_id')::uuid;
+        ELSIF (v_row->>'person_id') IS NOT NULL THEN
+            SELECT tenant_id INTO v_tenant_id FROM people WHERE id = (v_row->>'person_id')::uuid;
+        END IF;
+    END IF;
+
+    INSERT INTO audit_logs (table_name, record_id, operation, changed_by, old_values, new_values, resolved_tenant_id)
+    VALUES (
+        TG_TABLE_NAME,
+        COALESCE((v_row->>'id')::uuid, null),
+        TG_OP,
+        v_user_id,
+        v_old_data,
+        v_new_data,
+        v_tenant_id
+    );
+
+    RETURN COALESCE(NEW, OLD);
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_calendar_sync ON jobs;
+CREATE TRIGGER trg_calendar_sync
+    AFTER UPDATE OF title, description, status, property_id, deleted_at, tenant_id ON jobs
+    FOR EACH ROW EXECUTE FUNCTION trg_calendar_sync_job();
+
+
+-- ============================================================================
+-- 5. GET VERSIONS RPC
+-- ============================================================================
+-- p_ids: any mix of job, property and service opportunity ids (at most 500).
+-- Returns { "<id>": row_version } for the caller's tenant's rows that exist
+-- and are not deleted; an id missing from the result was deleted.
+
+CREATE OR REPLACE FUNCTION public.get_versions(p_ids uuid[])
+RETURNS jsonb
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_tenant_id uuid := get_my_tenant_id();
+    v_result jsonb;
+BEGIN
+    IF cardinality(p_ids) > 500 THEN
+        RAISE EXCEPTION 'At most 500 ids per call';
+    END IF;
+
+    SELECT COALESCE(jsonb_object_agg(v.id, v.row_version), '{}'::jsonb)
+    INTO v_result
+    FROM (
+        SELECT id, row_version FROM jobs
+        WHERE id = ANY(p_ids) AND tenant_id = v_tenant_id AND deleted_at IS NULL
+        UNION ALL
+        SELECT id, row_version FROM properties
+        WHERE id = ANY(p_ids) AND tenant_id = v_tenant_id AND deleted_at IS NULL
+        UNION ALL
+        SELECT id, row_version FROM service_opportunities
+        WHERE id = ANY(p_ids) AND tenant_id = v_tenant_id AND deleted_at IS NULL
+    ) v;
+
+    RETURN v_result;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.get_versions(uuid[]) TO authenticated;
+
+
+-- ============================================================================
+-- 6. JOB BUNDLE VERSION
+-- ============================================================================
+-- The job's row_version already covers every bundle section (tasks,
+-- assignments, comments, photos, timers, visits, artifacts, dispositions), so
+-- the get_job_bundle token no longer reads the section tables.
+
+CREATE OR REPLACE FUNCTION public.job_bundle_version(p_job_id uuid, p_sections text[])
+RETURNS text
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT md5(concat_ws('|',
+        array_to_string(p_sections, ','),
+        j.row_version, p.row_version, so.row_version
+    ))
+    FROM jobs j
+    LEFT JOIN properties p ON p.id = j.property_id
+    LEFT JOIN service_opportunities so ON so.id = j.service_opportunity_id
+    WHERE j.id = p_job_id;
+$$;
+
+-- ============================================================================
+-- 7. LIST RPCS CARRY row_version
+-- ============================================================================
+-- Cached list rows are the baseline staleIds compares get_versions against.
+-- list_service_opportunities_page and list_properties return whole rows
+-- (to_jsonb), so they already include row_version; the job lists pick their
+-- fields and are redefined here with it.
+
+CREATE OR REPLACE FUNCTION public.list_jobs(
+    p_tenant_id uuid,
+    p_status_filter text[] DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    RETURN (
+        SELECT COALESCE(jsonb_agg(
+            jsonb_build_object(
+                'id', j.id,
+                'title', j.title,
+                'status', j.status,
+                'priority', j.priority,
+                'property_id', j.property_id,
+                'created_at', j.created_at,
+                'tenant_id', j.tenant_id,
+                'row_version', j.row_version,
+                
+                -- All scheduled visits (chronologically ordered)
+                'scheduled_visits', (
+                    SELECT COALESCE(jsonb_agg(v.scheduled_start ORDER BY v.scheduled_start ASC), '[]'::jsonb)
+                    FROM visits v 
+                    WHERE v.job_id = j.id 
+                    AND v.status IN ('Scheduled', 'Pending')
+                    AND v.scheduled_start IS NOT NULL
+                ),
+                
+                -- Joined Property Name
+                'properties', jsonb_build_object('name', p.name),
+                
+                -- Joined Service Opportunity Details
+                'service_opportunities', CASE 
+                    WHEN so.id IS NOT NULL THEN jsonb_build_object(
+                        'title', so.title,
+                        'due_date', so.due_date
+                    )
+                    ELSE NULL
+                END
+            ) ORDER BY j.created_at DESC
+        ), '[]'::jsonb)
+        FROM jobs j
+        LEFT JOIN properties p ON j.property_id = p.id
+        LEFT JOIN service_opportunities so ON j.service_opportunity_id = so.id
+        WHERE j.tenant_id = p_tenant_id
+        AND j.deleted_at IS NULL
+        AND (p_status_filter IS NULL OR j.status = ANY(p_status_filter))
+    );
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.list_jobs_page(
+    p_tenant_id uuid,
+    p_status_filter text[] DEFAULT NULL,
+    p_search text DEFAULT NULL,
+    p_property_id uuid DEFAULT NULL,
+    p_date_from timestamptz DEFAULT NULL,
+    p_date_to timestamptz DEFAULT NULL,
+    p_sort_key text DEFAULT 'created_at',
+    p_sort_dir text DEFAULT 'desc',
+    p_cursor jsonb DEFAULT NULL,
+    p_limit int DEFAULT 50,
+    p_include_total boolean DEFAULT false
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_limit int := LEAST(GREATEST(COALESCE(p_limit, 50), 1), 200);
+    v_dir text := CASE WHEN lower(p_sort_dir) = 'asc' THEN 'ASC' ELSE 'DESC' END;
+    v_cmp text := CASE WHEN lower(p_sort_dir) = 'asc' THEN '>' ELSE '<' END;
+    v_sort_expr text;
+    v_search text;
+    v_filter text;
+    v_keyset text;
+    v_jobs jsonb;
+    v_next jsonb;
+    v_total bigint;
+BEGIN
+    -- Sort expressions are allow-listed; anything else falls back to created_at
+    v_sort_expr := CASE p_sort_key
+        WHEN 'title' THEN 'lower(COALESCE(j.title, ''''))'
+        WHEN 'status' THEN 'COALESCE(j.status, '''')'
+        WHEN 'properties.name' THEN 'lower(COALESCE(p.name, ''''))'
+        WHEN 'service_opportunities.title' THEN 'lower(COALESCE(so.title, ''''))'
+        ELSE 'NULL::text'
+    END;
+
+    -- ILIKE pattern with the user's wildcards escaped
+    IF NULLIF(trim(p_search), '') IS NOT NULL THEN
+        v_search := '%' || replace(replace(replace(trim(p_search), '\', '\\'), '%', '\%'), '_', '\_') || '%';
+    END IF;
+
+    v_filter := '
+        j.tenant_id = $1
+        AND j.deleted_at IS NULL
+        AND ($2::text[] IS NULL OR j.status = ANY($2))
+        AND ($3::uuid IS NULL OR j.property_id = $3)
+        AND ($4::timestamptz IS NULL OR j.created_at >= $4)
+        AND ($5::timestamptz IS NULL OR j.created_at < $5)
+        AND ($6::text IS NULL
+             OR j.title ILIKE $6
+             OR p.name ILIKE $6
+             OR so.title ILIKE $6
+             OR j.status ILIKE $6)';
+
+    IF p_cursor IS NULL THEN
+        v_keyset := 'true';
+    ELSIF v_sort_expr = 'NULL::text' THEN
+        v_keyset := format('(j.created_at, j.id) %s ($7, $8)', v_cmp);
+    ELSE
+        v_keyset := format('(%s, j.created_at, j.id) %s ($9, $7, $8)', v_sort_expr, v_cmp);
+    END IF;
+
+    -- One extra row tells us whether there is a next page. Visits are only
+    -- aggregated for the rows on the page.
+    EXECUTE format($q$
+        WITH page AS (
+            SELECT
+                j.id, j.title, j.status, j.priority, j.property_id, j.created_at, j.tenant_id, j.row_version,
+                p.name AS property_name,
+                so.id AS so_id, so.title AS so_title, so.due_date AS so_due_date,
+                %1$s AS sort_value
+            FROM jobs j
+            LEFT JOIN properties p ON j.property_id = p.id
+            LEFT JOIN service_opportunities so ON j.service_opportunity_id = so.id
+            WHERE %2$s AND %3$s
+            ORDER BY %1$s %4$s, j.created_at %4$s, j.id %4$s
+            LIMIT %5$s + 1
+        ),
+        numbered AS (
+            SELECT page.*, row_number() OVER (ORDER BY sort_value %4$s, created_at %4$s, id %4$s) AS rn
+            FROM page
+        )
+        SELECT
+            COALESCE(jsonb_agg(
+                jsonb_build_object(
+                    'id', n.id,
+                    'title', n.title,
+                    'status', n.status,
+                    'priority', n.priority,
+                    'property_id', n.property_id,
+                    'created_at', n.created_at,
+                    'tenant_id', n.tenant_id,
+                    'row_version', n.row_version,
+                    'scheduled_visits', COALESCE(sv.visits, '[]'::jsonb),
+                    'properties', jsonb_build_object('name', n.property_name),
+                    'service_opportunities', CASE
+                        WHEN n.so_id IS NOT NULL THEN jsonb_build_object(
+                            'title', n.so_title,
+                            'due_date', n.so_due_date
+                        )
+                        ELSE NULL
+                    END
+                ) ORDER BY n.rn
+            ) FILTER (WHERE n.rn <= %5$s), '[]'::jsonb),
+            (
+                SELECT jsonb_build_object('created_at', l.created_at, 'id', l.id, 'sort_value', l.sort_value)
+                FROM numbered l
+                WHERE l.rn = %5$s
+                  AND EXISTS (SELECT 1 FROM numbered x WHERE x.rn > %5$s)
+            )
+        FROM numbered n
+        LEFT JOIN LATERAL (
+            SELECT jsonb_agg(v.scheduled_start ORDER BY v.scheduled_start ASC) AS visits
+            FROM visits v
+            WHERE v.job_id = n.id
+              AND v.status IN ('Scheduled', 'Pending')
+              AND v.scheduled_start IS NOT NULL
+        ) sv ON true
+    $q$, v_sort_expr, v_filter, v_keyset, v_dir, v_limit)
+    INTO v_jobs, v_next
+    USING p_tenant_id, p_status_filter, p_property_id, p_date_from, p_date_to, v_search,
+          (p_cursor->>'created_at')::timestamptz, (p_cursor->>'id')::uuid, p_cursor->>'sort_value';
+
+    IF p_include_total THEN
+        EXECUTE format($q$
+            SELECT count(*)
+            FROM jobs j
+            LEFT JOIN properties p ON j.property_id = p.id
+            LEFT JOIN service_opportunities so ON j.service_opportunity_id = so.id
+            WHERE %s
+        $q$, v_filter)
+        INTO v_total
+        USING p_tenant_id, p_status_filter, p_property_id, p_date_from, p_date_to, v_search;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'jobs', v_jobs,
+        'next_cursor', v_next,
+        'total_count', v_total
+    );
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.list_jobs_page(uuid, text[], text, uuid, timestamptz, timestamptz, text, text, jsonb, int, boolean) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,242 @@
+-- Migration: Indexed Global Search
+-- Purpose: Replace global_search_view (to_tsvector over a five-way UNION of
+--          every property, person, job, opportunity and template, computed on
+--          each keystroke) with a search_documents table holding a stored
+--          tsvector, kept current by triggers on the source tables.
+--          search_global ranks with ts_rank_cd over the GIN index and LIMITs.
+-- Date: 2025-01-30
+
+-- ============================================================================
+-- 1. EXTENSIONS
+-- ============================================================================
+-- pg_trgm: trigram index for prefix / fuzzy matching (search_suggest)
+-- btree_gin: tenant_id inside the GIN indexes, so one index scan is tenant scoped
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+
+-- ============================================================================
+-- 2. TABLE
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS search_documents (
+    entity_type TEXT NOT NULL
+        CHECK (entity_type IN ('property', 'person', 'job', 'service_opportunity', 'service_template')),
+    entity_id UUID NOT NULL,
+    tenant_id UUID NOT NULL REFERENCES tenants(id) ON DELETE CASCADE,
+    title TEXT,
+    subtitle TEXT,
+    link TEXT,
+    search_vector TSVECTOR NOT NULL,
+    search_text TEXT NOT NULL,          -- lower-cased title + subtitle, for trigrams
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (entity_type, entity_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_search_documents_vector
+    ON search_documents USING gin (tenant_id, search_vector);
+
+CREATE INDEX IF NOT EXISTS idx_search_documents_trgm
+    ON search_documents USING gin (tenant_id, search_text gin_trgm_ops);
+
+ALTER TABLE search_documents ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "search_documents_tenant_isolation" ON search_documents;
+CREATE POLICY "search_documents_tenant_isolation" ON search_documents
+    FOR SELECT USING (tenant_id = get_my_tenant_id());
+
+
+-- ============================================================================
+-- 3. SYNC
+-- ============================================================================
+-- Rebuilds the documents for the given source rows: deletes them, then
+-- re-inserts the ones that still exist and are not soft-deleted or archived
+-- (same exclusions as global_search_view). Same weights as the view (A:
+-- names/titles/ids, B: secondary text). Vectors use the 'simple' config (no
+-- stemming) so the prefix queries of search_global match what was typed:
+-- "cleani" is a prefix of the stored "cleaning", not of the stem "clean".
+
+CREATE OR REPLACE FUNCTION sync_search_documents(p_entity_type TEXT, p_ids UUID[])
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    DELETE FROM search_documents
+    WHERE entity_type = p_entity_type
+      AND entity_id = ANY(p_ids);
+
+    IF p_entity_type = 'property' THEN
+        INSERT INTO search_documents (entity_type, entity_id, tenant_id, title, subtitle, link, search_vector, search_text)
+        SELECT 'property', p.id, p.tenant_id, p.name, p.display_address, '/properties',
+               setweight(to_tsvector('simple', coalesce(p.name, '')), 'A') ||
+               setweight(to_tsvector('simple', coalesce(p.display_address, '')), 'B'),
+               lower(concat_ws(' ', p.name, p.display_address))
+        FROM properties p
+        WHERE p.id = ANY(p_ids) AND p.deleted_at IS NULL AND p.tenant_id IS NOT NULL
+          AND (p.status IS NULL OR p.status <> 'archived');
+
+    ELSIF p_entity_type = 'person' THEN
+        INSERT INTO search_documents (entity_type, entity_id, tenant_id, title, subtitle, link, search_vector, search_text)
+        SELECT 'person', p.id, p.tenant_id, concat_ws(' ', p.first_name, p.last_name), p.email, '/people',
+               setweight(to_tsvector('simple', coalesce(p.first_name, '') || ' ' || coalesce(p.last_name, '')), 'A') ||
+               setweight(to_tsvector('simple', coalesce(p.email, '')), 'B'),
+               lower(concat_ws(' ', p.first_name, p.last_name, p.email))
+        FROM people p
+        WHERE p.id = ANY(p_ids) AND p.deleted_at IS NULL AND p.tenant_id IS NOT NULL;
+
+    ELSIF p_entity_type = 'job' THEN
+        INSERT INTO search_documents (entity_type, entity_id, tenant_id, title, subtitle, link, search_vector, search_text)
+        SELECT 'job', j.id, j.tenant_id, j.title, concat_ws(' ', j.readable_id, j.status), '/jobs/' || j.id,
+               setweight(to_tsvector('simple', coalesce(j.title, '')), 'A') ||
+               setweight(to_tsvector('simple', coalesce(j.description, '')), 'B') ||
+               setweight(to_tsvector('simple', coalesce(j.readable_id, '')), 'A'),
+               lower(concat_ws(' ', j.title, j.readable_id))
+        FROM jobs j
+        WHERE j.id = ANY(p_ids) AND j.deleted_at IS NULL AND j.tenant_id IS NOT NULL
+          AND (j.status IS NULL OR j.status <> 'archived');
+
+    ELSIF p_entity_type = 'service_opportunity' THEN
+        INSERT INTO search_documents (entity_type, entity_id, tenant_id, title, subtitle, link, search_vector, search_text)
+        SELECT 'service_opportunity', so.id, so.tenant_id, so.title, so.status, '/service-opportunities?id=' || so.id,
+               setweight(to_tsvector('simple', coalesce(so.title, '')), 'A') ||
+               setweight(to_tsvector('simple', coalesce(so.description, '')), 'B'),
+               lower(coalesce(so.title, ''))
+        FROM service_opportunities so
+        WHERE so.id = ANY(p_ids) AND so.deleted_at IS NULL AND so.tenant_id IS NOT NULL
+          AND (so.status IS NULL OR so.status <> 'archived');
+
+    ELSIF p_entity_type = 'service_template' THEN
+        INSERT INTO search_documents (entity_type, entity_id, tenant_id, title, subtitle, link, search_vector, search_text)
+        SELECT 'service_template', st.id, st.tenant_id, st.name, st.description, '/service-templates',
+               setweight(to_tsvector('simple', coalesce(st.name, '')), 'A') ||
+               setweight(to_tsvector('simple', coalesce(st.description, '')), 'B'),
+               lower(coalesce(st.name, ''))
+        FROM service_templates st
+        WHERE st.id = ANY(p_ids) AND st.deleted_at IS NULL AND st.tenant_id IS NOT NULL;
+    END IF;
+END;
+$$;
+
+-- TG_ARGV[0]: entity_type. Only fires on columns that feed the document.
+CREATE OR REPLACE FUNCTION trg_search_documents_sync()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM sync_search_documents(TG_ARGV[0], ARRAY[OLD.id]);
+    ELSE
+        PERFORM sync_search_documents(TG_ARGV[0], ARRAY[NEW.id]);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_search_documents ON properties;
+CREATE TRIGGER trg_search_documents
+    AFTER INSERT OR DELETE OR UPDATE OF name, street_address, city, state, zip, status, tenant_id, deleted_at ON properties
+    FOR EACH ROW EXECUTE FUNCTION trg_search_documents_sync('property');
+
+DROP TRIGGER IF EXISTS trg_search_documents ON people;
+CREATE TRIGGER trg_search_documents
+    AFTER INSERT OR DELETE OR UPDATE OF first_name, last_name, email, tenant_id, deleted_at ON people
+    FOR EACH ROW EXECUTE FUNCTION trg_search_documents_sync('person');
+
+DROP TRIGGER IF EXISTS trg_search_documents ON jobs;
+CREATE TRIGGER trg_search_documents
+    AFTER INSERT OR DELETE OR UPDATE OF title, description, readable_id, status, tenant_id, deleted_at ON jobs
+    FOR EACH ROW EXECUTE FUNCTION trg_search_documents_sync('job');
+
+DROP TRIGGER IF EXISTS trg_search_documents ON service_opportunities;
+CREATE TRIGGER trg_search_documents
+    AFTER INSERT OR DELETE OR UPDATE OF title, description, status, tenant_id, deleted_at ON service_opportunities
+    FOR EACH ROW EXECUTE FUNCTION trg_search_documents_sync('service_opportunity');
+
+DROP TRIGGER IF EXISTS trg_search_documents ON service_templates;
+CREATE TRIGGER trg_search_documents
+    AFTER INSERT OR DELETE OR UPDATE OF name, description, tenant_id, deleted_at ON service_templates
+    FOR EACH ROW EXECUTE FUNCTION trg_search_documents_sync('service_template');
+
+-- Documents are only written by the triggers above
+REVOKE EXECUTE ON FUNCTION sync_search_documents(TEXT, UUID[]) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION trg_search_documents_sync() FROM PUBLIC, anon, authenticated;
+
+
+-- ============================================================================
+-- 4. BACKFILL
+-- ============================================================================
+
+SELECT sync_search_documents('property', ARRAY(SELECT id FROM properties));
+SELECT sync_search_documents('person', ARRAY(SELECT id FROM people));
+SELECT sync_search_documents('job', ARRAY(SELECT id FROM jobs));
+SELECT sync_search_documents('service_opportunity', ARRAY(SELECT id FROM service_opportunities));
+SELECT sync_search_documents('service_template', ARRAY(SELECT id FROM service_templates));
+
+ANALYZE search_documents;
+
+
+-- ============================================================================
+-- 5. SEARCH RPC
+-- ============================================================================
+-- Every term is matched as a prefix ("smi" finds "Smith"), all terms must
+-- match. Ranked with ts_rank_cd (cover density), newest first on ties.
+
+-- Converts free text into an AND-of-prefixes tsquery; NULL when no terms.
+-- 'simple', like the stored vectors, so prefixes are compared unstemmed.
+CREATE OR REPLACE FUNCTION search_prefix_tsquery(p_query_text TEXT)
+RETURNS tsquery
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT to_tsquery('simple', string_agg(quote_literal(term) || ':*', ' & '))
+    FROM regexp_split_to_table(lower(coalesce(p_query_text, '')), '[^[:alnum:]@.]+') AS term
+    WHERE term <> '';
+$$;
+
+DROP FUNCTION IF EXISTS search_global(text, uuid);
+
+CREATE OR REPLACE FUNCTION search_global(
+    p_query_text text,
+    p_tenant_id uuid, -- kept for the client signature; the caller's tenant is enforced
+    p_limit int DEFAULT 20
+)
+RETURNS TABLE (
+    id text,
+    type text,
+    title text,
+    subtitle text,
+    link text,
+    rank real
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    WITH q AS (
+        SELECT search_prefix_tsquery(p_query_text) AS query
+    )
+    SELECT
+        d.entity_id::text AS id,
+        d.entity_type AS type,
+        d.title,
+        d.subtitle,
+        d.link,
+        ts_rank_cd(d.search_vector, q.query) AS rank
+    FROM search_documents d, q
+    WHERE q.query IS NOT NULL
+      AND d.tenant_id = get_my_tenant_id()
+      AND d.search_vector @@ q.query
+    ORDER BY rank DESC, d.updated_at DESC
+    LIMIT LEAST(GREATEST(COALESCE(p_limit, 20), 1), 100);
+$$;
+
+GRANT EXECUTE ON FUNCTION search_global(text, uuid, int) TO authenticated;
+
+DROP VIEW IF EXISTS global_search_view;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,103 @@
+-- Migration: Typo-Tolerant Search Suggestions
+-- Purpose: search_suggest RPC over the search_documents trigram index, used by
+--          GlobalSearch when the full-text search_global finds nothing
+--          ("smtih" -> "Smith"). search_global also returns the terms each
+--          result was matched on, so the client can narrow cached results
+--          by the same rule as the server.
+-- Date: 2025-01-31
+
+-- ===========================================
+-- 1. SEARCH SUGGEST RPC
+-- ===========================================
+-- word_similarity (<% / <<->) compares the query with the best-matching run
+-- of words in search_text, so partial and misspelled prefixes still score.
+-- The <% filter is served by idx_search_documents_trgm; a GIN index cannot
+-- order by distance, so <<-> sorts the filtered rows, which the similarity
+-- threshold keeps few.
+
+CREATE OR REPLACE FUNCTION public.search_suggest(
+    p_query_text text,
+    p_limit int DEFAULT 8
+)
+RETURNS TABLE (
+    id text,
+    type text,
+    title text,
+    subtitle text,
+    link text,
+    score real
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+SET pg_trgm.word_similarity_threshold = 0.4
+AS $$
+    SELECT
+        d.entity_id::text AS id,
+        d.entity_type AS type,
+        d.title,
+        d.subtitle,
+        d.link,
+        word_similarity(lower(trim(p_query_text)), d.search_text) AS score
+    FROM search_documents d
+    WHERE length(trim(coalesce(p_query_text, ''))) >= 3
+      AND d.tenant_id = get_my_tenant_id()
+      AND lower(trim(p_query_text)) <% d.search_text
+    ORDER BY lower(trim(p_query_text)) <<-> d.search_text, d.updated_at DESC
+    LIMIT LEAST(GREATEST(COALESCE(p_limit, 8), 1), 50);
+$$;
+
+GRANT EXECUTE ON FUNCTION public.search_suggest(text, int) TO authenticated;
+
+
+-- ===========================================
+-- 2. SEARCH GLOBAL: MATCHED TERMS
+-- ===========================================
+-- terms: the lexemes of the result's search_vector (lower-cased words of
+-- every indexed field, descriptions included). A query extending an earlier
+-- one matches a result exactly when each of its terms prefixes one of these.
+
+DROP FUNCTION IF EXISTS search_global(text, uuid, int);
+
+CREATE OR REPLACE FUNCTION search_global(
+    p_query_text text,
+    p_tenant_id uuid, -- kept for the client signature; the caller's tenant is enforced
+    p_limit int DEFAULT 20
+)
+RETURNS TABLE (
+    id text,
+    type text,
+    title text,
+    subtitle text,
+    link text,
+    rank real,
+    terms text[]
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    WITH q AS (
+        SELECT search_prefix_tsquery(p_query_text) AS query
+    )
+    SELECT
+        d.entity_id::text AS id,
+        d.entity_type AS type,
+        d.title,
+        d.subtitle,
+        d.link,
+        ts_rank_cd(d.search_vector, q.query) AS rank,
+        tsvector_to_array(d.search_vector) AS terms
+    FROM search_documents d, q
+    WHERE q.query IS NOT NULL
+      AND d.tenant_id = get_my_tenant_id()
+      AND d.search_vector @@ q.query
+    ORDER BY rank DESC, d.updated_at DESC
+    LIMIT LEAST(GREATEST(COALESCE(p_limit, 20), 1), 100);
+$$;
+
+GRANT EXECUTE ON FUNCTION search_global(text, uuid, int) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
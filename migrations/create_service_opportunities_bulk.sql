@@ -0,0 +1,228 @@
+-- Migration: Bulk Service Opportunity Creation
+-- Purpose: create_service_opportunities_bulk creates one opportunity per
+--          matching property (seasonal campaigns across a portfolio) in a
+--          single INSERT, then generates their workflows set-based, either
+--          in the same call or through job_queue for large batches.
+-- Date: 2025-02-03
+
+-- ============================================================================
+-- 1. DUE DATE RULE
+-- ============================================================================
+-- p_rule:
+--   { "type": "fixed",         "date": "2025-04-01" }
+--   { "type": "days_from_now", "days": 30 }
+--   { "type": "spread",        "start": "2025-04-01", "end": "2025-04-30" }
+--       properties are spread evenly over the days of the window
+--       (p_position is 1-based, p_total the number of properties);
+--       create_service_opportunities_bulk rejects an end before the start
+-- NULL rule: no due date.
+
+CREATE OR REPLACE FUNCTION public.campaign_due_date(
+    p_rule jsonb,
+    p_position bigint,
+    p_total bigint
+)
+RETURNS timestamptz
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+    SELECT CASE p_rule->>'type'
+        WHEN 'fixed' THEN (p_rule->>'date')::timestamptz
+        WHEN 'days_from_now' THEN date_trunc('day', now()) + make_interval(days => (p_rule->>'days')::int)
+        WHEN 'spread' THEN
+            (p_rule->>'start')::timestamptz + make_interval(days => (
+                ((p_position - 1)
+                 * ((p_rule->>'end')::date - (p_rule->>'start')::date + 1)
+                 / GREATEST(p_total, 1))
+            )::int)
+    END;
+$$;
+
+
+-- ============================================================================
+-- 2. ONE ACTIVE OPPORTUNITY PER CAMPAIGN AND PROPERTY
+-- ============================================================================
+-- A campaign is a template run from one trigger source. The bulk insert skips
+-- properties that already have an active opportunity, but two concurrent runs
+-- cannot see each other's rows; this index makes the second one wait and skip
+-- them (ON CONFLICT DO NOTHING below).
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_service_opportunities_active_campaign_property
+    ON service_opportunities (service_template_id, trigger_source, property_id)
+    WHERE status IN ('Open', 'Snoozed', 'In Progress') AND deleted_at IS NULL;
+
+
+-- ============================================================================
+-- 3. BULK CREATE RPC
+-- ============================================================================
+-- Targets: p_property_ids when given, otherwise every property matching
+-- p_property_filter ({ status: 'active', cities: [], states: [], zips: [] };
+-- status defaults to 'active', empty lists match everything).
+-- Properties that already have an Open, Snoozed or In Progress opportunity
+-- for the template are skipped, so a campaign can be re-run safely, also
+-- concurrently.
+--
+-- Workflows: generated in this call for up to 200 opportunities, otherwise
+-- queued as GENERATE_SERVICE_WORKFLOWS jobs of 200 opportunities each
+-- (queue_worker.py). p_async forces either path.
+--
+-- Returns {
+--   success, opportunities_created, properties_skipped,
+--   workflow_mode: 'sync' | 'queued' | 'none',
+--   jobs_created,      -- sync only
+--   queued_batches,    -- queued only
+--   opportunity_ids
+-- }
+
+CREATE OR REPLACE FUNCTION public.create_service_opportunities_bulk(
+    p_tenant_id uuid,
+    p_service_template_id uuid,
+    p_property_ids uuid[] DEFAULT NULL,
+    p_property_filter jsonb DEFAULT NULL,
+    p_due_date_rule jsonb DEFAULT NULL,
+    p_title text DEFAULT NULL,
+    p_trigger_source text DEFAULT 'Campaign',
+    p_async boolean DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_sync_limit CONSTANT int := 200;
+    v_max_properties CONSTANT int := 5000;
+    v_template_name text;
+    v_has_steps boolean;
+    v_targets int;
+    v_created uuid[];
+    v_jobs_created int := 0;
+    v_queued_batches int := 0;
+    v_mode text := 'none';
+BEGIN
+    SELECT st.name,
+           EXISTS (SELECT 1 FROM service_workflow_steps sws WHERE sws.service_template_id = st.id)
+    INTO v_template_name, v_has_steps
+    FROM service_templates st
+    WHERE st.id = p_service_template_id
+      AND st.tenant_id = p_tenant_id;
+
+    IF v_template_name IS NULL THEN
+        RETURN jsonb_build_object('success', false, 'error', 'Service template not found');
+    END IF;
+
+    IF p_due_date_rule IS NOT NULL
+       AND p_due_date_rule->>'type' NOT IN ('fixed', 'days_from_now', 'spread') THEN
+        RETURN jsonb_build_object('success', false, 'error', 'Unknown due date rule');
+    END IF;
+
+    IF p_due_date_rule->>'type' = 'spread'
+       AND (p_due_date_rule->>'end')::date < (p_due_date_rule->>'start')::date THEN
+        RAISE EXCEPTION 'Spread end % is before start %',
+            p_due_date_rule->>'end', p_due_date_rule->>'start';
+    END IF;
+
+    WITH targets AS (
+        SELECT p.id, p.display_address
+        FROM properties p
+        WHERE p.tenant_id = p_tenant_id
+          AND p.deleted_at IS NULL
+          AND (
+            CASE
+                WHEN p_property_ids IS NOT NULL THEN p.id = ANY(p_property_ids)
+                ELSE p.status = COALESCE(p_property_filter->>'status', 'active')
+                 AND (COALESCE(jsonb_array_length(p_property_filter->'cities'), 0) = 0
+                      OR p.city IN (SELECT jsonb_array_elements_text(p_property_filter->'cities')))
+                 AND (COALESCE(jsonb_array_length(p_property_filter->'states'), 0) = 0
+                      OR p.state IN (SELECT jsonb_array_elements_text(p_property_filter->'states')))
+                 AND (COALESCE(jsonb_array_length(p_property_filter->'zips'), 0) = 0
+                      OR p.zip IN (SELECT jsonb_array_elements_text(p_property_filter->'zips')))
+            END
+          )
+    ),
+    eligible AS (
+        SELECT
+            t.id,
+            row_number() OVER (ORDER BY t.display_address, t.id) AS position,
+            count(*) OVER () AS total
+        FROM targets t
+        WHERE NOT EXISTS (
+            SELECT 1 FROM service_opportunities so
+            WHERE so.property_id = t.id
+              AND so.service_template_id = p_service_template_id
+              AND so.status IN ('Open', 'Snoozed', 'In Progress')
+              AND so.deleted_at IS NULL
+        )
+    ),
+    inserted AS (
+        INSERT INTO service_opportunities (
+            tenant_id, property_id, title, service_template_id,
+            trigger_source, due_date, status
+        )
+        SELECT
+            p_tenant_id,
+            e.id,
+            COALESCE(NULLIF(trim(p_title), ''), v_template_name),
+            p_service_template_id,
+            p_trigger_source,
+            campaign_due_date(p_due_date_rule, e.position, e.total),
+            'Open'
+        FROM eligible e
+        WHERE (SELECT count(*) FROM targets) <= v_max_properties
+        ORDER BY e.position
+        ON CONFLICT (service_template_id, trigger_source, property_id)
+            WHERE status IN ('Open', 'Snoozed', 'In Progress') AND deleted_at IS NULL
+            DO NOTHING
+        RETURNING id
+    )
+    SELECT (SELECT count(*) FROM targets)::int, array_agg(i.id)
+    INTO v_targets, v_created
+    FROM inserted i;
+
+    IF v_targets > v_max_properties THEN
+        RETURN jsonb_build_object(
+            'success', false,
+            'error', format('At most %s properties per campaign (%s matched)', v_max_properties, v_targets)
+        );
+    END IF;
+
+    v_created := COALESCE(v_created, '{}');
+
+    IF cardinality(v_created) > 0 AND v_has_steps THEN
+        IF COALESCE(p_async, cardinality(v_created) > v_sync_limit) THEN
+            INSERT INTO job_queue (action_type, payload, status, run_after)
+            SELECT
+                'GENERATE_SERVICE_WORKFLOWS',
+                jsonb_build_object(
+                    'tenant_id', p_tenant_id,
+                    'service_opportunity_ids', to_jsonb(v_created[b.lo:b.lo + v_sync_limit - 1])
+                ),
+                'PENDING',
+                now()
+            FROM generate_series(1, cardinality(v_created), v_sync_limit) AS b(lo);
+
+            GET DIAGNOSTICS v_queued_batches = ROW_COUNT;
+            v_mode := 'queued';
+        ELSE
+            SELECT count(*)::int INTO v_jobs_created
+            FROM materialize_service_workflows(v_created);
+            v_mode := 'sync';
+        END IF;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'success', true,
+        'opportunities_created', cardinality(v_created),
+        'properties_skipped', v_targets - cardinality(v_created),
+        'workflow_mode', v_mode,
+        'jobs_created', v_jobs_created,
+        'queued_batches', v_queued_batches,
+        'opportunity_ids', to_jsonb(v_created)
+    );
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.create_service_opportunities_bulk(uuid, uuid, uuid[], jsonb, jsonb, text, text, boolean) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
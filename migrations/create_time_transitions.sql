@@ -0,0 +1,135 @@
+-- Migration: Scheduled Time-Based Transitions
+-- Purpose: Move snooze expiry (and future time-driven state changes) off the
+--          client. update_expired_snoozes() ran an unscoped UPDATE across all
+--          tenants from every browser that opened the opportunities view; the
+--          resident queue_worker.py now applies due transitions in small
+--          batches from a self-rescheduling APPLY_TIME_TRANSITIONS job.
+-- Date: 2025-01-27
+
+-- ===========================================
+-- 1. INDEX
+-- ===========================================
+-- Due snoozes: status = 'Snoozed' AND snooze_until <= now()
+CREATE INDEX IF NOT EXISTS idx_service_opportunities_status_snooze_until
+    ON service_opportunities (status, snooze_until)
+    WHERE deleted_at IS NULL;
+
+
+-- ===========================================
+-- 2. APPLY TIME TRANSITIONS
+-- ===========================================
+-- Applies at most p_batch_size changes per transition kind and returns how
+-- many rows each kind touched. Callers loop until every count is below the
+-- batch size; each call is its own short transaction, so row locks are held
+-- briefly. Rows already locked (e.g. being edited) are skipped and picked up
+-- by the next run.
+--
+-- Add new time-driven transitions as further sections returning their own key.
+
+CREATE OR REPLACE FUNCTION public.apply_time_transitions(p_batch_size int DEFAULT 200)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_batch int := LEAST(GREATEST(COALESCE(p_batch_size, 200), 1), 5000);
+    v_snoozes int;
+BEGIN
+    -- Snooze expiry: Snoozed -> Open once snooze_until has passed
+    WITH due AS (
+        SELECT so.id
+        FROM service_opportunities so
+        WHERE so.status = 'Snoozed'
+          AND so.snooze_until <= now()
+          AND so.deleted_at IS NULL
+        ORDER BY so.snooze_until
+        LIMIT v_batch
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE service_opportunities so
+    SET status = 'Open',
+        snooze_until = NULL,
+        updated_at = now()
+    FROM due
+    WHERE so.id = due.id;
+    GET DIAGNOSTICS v_snoozes = ROW_COUNT;
+
+    RETURN jsonb_build_object(
+        'snooze_expiry', v_snoozes
+    );
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.apply_time_transitions(int) FROM PUBLIC, anon, authenticated;
+
+
+-- ===========================================
+-- 3. RETIRE THE CLIENT-TRIGGERED RPC
+-- ===========================================
+-- Kept for manual/service-role use; it now drains due snoozes in batches.
+-- list_service_opportunities_page already reports expired snoozes as Open,
+-- so clients never need to call it.
+CREATE OR REPLACE FUNCTION public.update_expired_snoozes()
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_result jsonb;
+BEGIN
+    LOOP
+        v_result := apply_time_transitions(200);
+        EXIT WHEN (v_result->>'snooze_expiry')::int < 200;
+    END LOOP;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.update_expired_snoozes() FROM PUBLIC, anon, authenticated;
+
+
+-- ===========================================
+-- 4. SCHEDULE
+-- ===========================================
+-- queue_worker.py re-enqueues APPLY_TIME_TRANSITIONS after each run; this
+-- seeds the first one (and restores the chain if it was ever lost). At most
+-- one run may be pending: a NOT EXISTS check alone lets two concurrent
+-- workers both insert, so a partial unique index backs it up.
+
+-- Collapse duplicates an earlier race may have left, keeping the next due run
+DELETE FROM job_queue q
+WHERE q.action_type = 'APPLY_TIME_TRANSITIONS'
+  AND q.status = 'PENDING'
+  AND EXISTS (
+      SELECT 1 FROM job_queue o
+      WHERE o.action_type = 'APPLY_TIME_TRANSITIONS'
+        AND o.status = 'PENDING'
+        AND (o.run_after, o.id) < (q.run_after, q.id)
+  );
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_job_queue_pending_time_transitions
+    ON job_queue (action_type)
+    WHERE status = 'PENDING' AND action_type = 'APPLY_TIME_TRANSITIONS';
+
+CREATE OR REPLACE FUNCTION public.ensure_time_transitions_scheduled()
+RETURNS void
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    INSERT INTO job_queue (action_type, payload, status, run_after, priority, max_attempts)
+    SELECT 'APPLY_TIME_TRANSITIONS', '{}'::jsonb, 'PENDING', now(), 0, 3
+    WHERE NOT EXISTS (
+        SELECT 1 FROM job_queue
+        WHERE action_type = 'APPLY_TIME_TRANSITIONS'
+          AND status = 'PENDING'
+    )
+    ON CONFLICT DO NOTHING;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.ensure_time_transitions_scheduled() FROM PUBLIC, anon, authenticated;
+
+SELECT ensure_time_transitions_scheduled();
+
+NOTIFY pgrst, 'reload schema';
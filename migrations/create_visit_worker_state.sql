@@ -0,0 +1,320 @@
+-- Migration: Visit Worker State
+-- Purpose: Keep the latest status per (visit, worker) in visit_worker_state and
+--          per-visit aggregate counters in visit_worker_counts, updated in O(1)
+--          by the worker_visit_logs insert trigger. derive_visit_state becomes
+--          a read of one counters row instead of a DISTINCT ON scan of the log.
+-- Date: 2025-02-01
+
+-- ============================================================================
+-- 1. LATEST STATUS PER WORKER
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS visit_worker_state (
+    visit_id UUID NOT NULL REFERENCES visits(id) ON DELETE CASCADE,
+    person_id UUID NOT NULL REFERENCES people(id),
+    status TEXT NOT NULL,
+    recorded_at TIMESTAMPTZ NOT NULL,
+    log_id UUID NOT NULL REFERENCES worker_visit_logs(id) ON DELETE CASCADE,
+    PRIMARY KEY (visit_id, person_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_visit_worker_state_person
+    ON visit_worker_state (person_id, recorded_at DESC);
+
+ALTER TABLE visit_worker_state ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "visit_worker_state_tenant_isolation" ON visit_worker_state;
+CREATE POLICY "visit_worker_state_tenant_isolation" ON visit_worker_state
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM visits v
+            WHERE v.id = visit_worker_state.visit_id
+              AND v.tenant_id = get_my_tenant_id()
+        )
+    );
+
+GRANT SELECT ON visit_worker_state TO authenticated;
+
+
+-- ============================================================================
+-- 2. COUNTERS PER VISIT
+-- ============================================================================
+-- Counts of workers by their latest status:
+--   worker_count          every worker with a log
+--   active_worker_count   latest status is not No-show
+--   finished_worker_count Finished
+--   paused_worker_count   Paused
+--   started_worker_count  Started, Paused or Finished
+--   en_route_worker_count On My Way
+-- Kept in their own table rather than on visits: visits is audited, guarded
+-- by visits_terminal_check and watched by the calendar sync, none of which
+-- should run for a counter change. Visits without logs have no row.
+
+CREATE TABLE IF NOT EXISTS visit_worker_counts (
+    visit_id UUID PRIMARY KEY REFERENCES visits(id) ON DELETE CASCADE,
+    worker_count INT NOT NULL DEFAULT 0,
+    active_worker_count INT NOT NULL DEFAULT 0,
+    finished_worker_count INT NOT NULL DEFAULT 0,
+    paused_worker_count INT NOT NULL DEFAULT 0,
+    started_worker_count INT NOT NULL DEFAULT 0,
+    en_route_worker_count INT NOT NULL DEFAULT 0
+);
+
+ALTER TABLE visit_worker_counts ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "visit_worker_counts_tenant_isolation" ON visit_worker_counts;
+CREATE POLICY "visit_worker_counts_tenant_isolation" ON visit_worker_counts
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM visits v
+            WHERE v.id = visit_worker_counts.visit_id
+              AND v.tenant_id = get_my_tenant_id()
+        )
+    );
+
+GRANT SELECT ON visit_worker_counts TO authenticated;
+
+
+-- ============================================================================
+-- 3. DERIVE VISIT STATE (constant time)
+-- ============================================================================
+
+-- Same rules as the original log scan, applied to the counters
+CREATE OR REPLACE FUNCTION visit_state_from_counts(
+    p_worker_count INT,
+    p_active INT,
+    p_finished INT,
+    p_paused INT,
+    p_started INT,
+    p_en_route INT
+)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT CASE
+        WHEN p_worker_count = 0 THEN 'Unassigned'
+        WHEN p_active = 0 THEN 'Abandoned'
+        WHEN p_finished = p_active THEN 'Finished'
+        WHEN p_started > 0 AND p_paused = p_active THEN 'Paused'
+        WHEN p_started > 0 THEN 'Started'
+        WHEN p_en_route > 0 THEN 'En Route'
+        ELSE 'Assigned'
+    END;
+$$;
+
+CREATE OR REPLACE FUNCTION derive_visit_state(p_visit_id UUID)
+RETURNS TEXT AS $$
+    SELECT COALESCE(
+        (
+            SELECT visit_state_from_counts(
+                c.worker_count, c.active_worker_count, c.finished_worker_count,
+                c.paused_worker_count, c.started_worker_count, c.en_route_worker_count
+            )
+            FROM visit_worker_counts c
+            WHERE c.visit_id = p_visit_id
+        ),
+        'Unassigned'
+    );
+$$ LANGUAGE sql STABLE;
+
+
+-- ============================================================================
+-- 4. LOG INSERT TRIGGER
+-- ============================================================================
+-- Updates visit_worker_state and the counters, then maps the derived state to
+-- the visit status as before. Logs that arrive out of order (older than the
+-- worker's current latest) leave the state unchanged.
+
+CREATE OR REPLACE FUNCTION update_visit_derived_state()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_old_status TEXT;
+    v_old_recorded_at TIMESTAMPTZ;
+    v_is_new_worker BOOLEAN := false;
+    v_counts RECORD;
+BEGIN
+    INSERT INTO visit_worker_state (visit_id, person_id, status, recorded_at, log_id)
+    VALUES (NEW.visit_id, NEW.person_id, NEW.status, NEW.recorded_at, NEW.id)
+    ON CONFLICT (visit_id, person_id) DO NOTHING;
+
+    IF FOUND THEN
+        v_is_new_worker := true;
+    ELSE
+        SELECT status, recorded_at INTO v_old_status, v_old_recorded_at
+        FROM visit_worker_state
+        WHERE visit_id = NEW.visit_id AND person_id = NEW.person_id
+        FOR UPDATE;
+
+        IF NEW.recorded_at < v_old_recorded_at THEN
+            RETURN NEW;
+        END IF;
+
+        UPDATE visit_worker_state
+        SET status = NEW.status,
+            recorded_at = NEW.recorded_at,
+            log_id = NEW.id
+        WHERE visit_id = NEW.visit_id AND person_id = NEW.person_id;
+    END IF;
+
+    -- Counter deltas: +1 for the new status' buckets, -1 for the old one's
+    IF v_is_new_worker OR v_old_status IS DISTINCT FROM NEW.status THEN
+        INSERT INTO visit_worker_counts AS c (
+            visit_id, worker_count, active_worker_count, finished_worker_count,
+            paused_worker_count, started_worker_count, en_route_worker_count
+        )
+        VALUES (
+            NEW.visit_id,
+            v_is_new_worker::int,
+            (NEW.status <> 'No-show')::int - COALESCE((v_old_status <> 'No-show')::int, 0),
+            (NEW.status = 'Finished')::int - COALESCE((v_old_status = 'Finished')::int, 0),
+            (NEW.status = 'Paused')::int - COALESCE((v_old_status = 'Paused')::int, 0),
+            (NEW.status IN ('Started', 'Paused', 'Finished'))::int
+                - COALESCE((v_old_status IN ('Started', 'Paused', 'Finished'))::int, 0),
+            (NEW.status = 'On My Way')::int - COALESCE((v_old_status = 'On My Way')::int, 0)
+        )
+        ON CONFLICT (visit_id) DO UPDATE SET
+            worker_count = c.worker_count + EXCLUDED.worker_count,
+            active_worker_count = c.active_worker_count + EXCLUDED.active_worker_count,
+            finished_worker_count = c.finished_worker_count + EXCLUDED.finished_worker_count,
+            paused_worker_count = c.paused_worker_count + EXCLUDED.paused_worker_count,
+            started_worker_count = c.started_worker_count + EXCLUDED.started_worker_count,
+            en_route_worker_count = c.en_route_worker_count + EXCLUDED.en_route_worker_count
+        RETURNING c.worker_count, c.active_worker_count, c.finished_worker_count,
+                  c.paused_worker_count, c.started_worker_count, c.en_route_worker_count
+        INTO v_counts;
+    ELSE
+        SELECT worker_count, active_worker_count, finished_worker_count,
+               paused_worker_count, started_worker_count, en_route_worker_count
+        INTO v_counts
+        FROM visit_worker_counts WHERE visit_id = NEW.visit_id;
+    END IF;
+
+    -- Started, Paused, En Route all map to 'In Progress'; terminal visits are
+    -- never touched (only Scheduled ones move)
+    IF visit_state_from_counts(
+        v_counts.worker_count, v_counts.active_worker_count, v_counts.finished_worker_count,
+        v_counts.paused_worker_count, v_counts.started_worker_count, v_counts.en_route_worker_count
+    ) IN ('Started', 'Paused', 'En Route') THEN
+        UPDATE visits
+        SET status = 'In Progress',
+            actual_start = COALESCE(actual_start, NEW.recorded_at)
+        WHERE id = NEW.visit_id
+          AND status = 'Scheduled';
+    END IF;
+
+    -- Note: 'Finished' does NOT auto-set visit to 'Completed'
+    -- Completion requires explicit CompletionArtifact submission
+
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_update_visit_state ON worker_visit_logs;
+CREATE TRIGGER trg_update_visit_state
+    AFTER INSERT ON worker_visit_logs
+    FOR EACH ROW
+    EXECUTE FUNCTION update_visit_derived_state();
+
+
+-- ============================================================================
+-- 5. BACKFILL
+-- ============================================================================
+
+INSERT INTO visit_worker_state (visit_id, person_id, status, recorded_at, log_id)
+SELECT DISTINCT ON (wvl.visit_id, wvl.person_id)
+    wvl.visit_id, wvl.person_id, wvl.status, wvl.recorded_at, wvl.id
+FROM worker_visit_logs wvl
+ORDER BY wvl.visit_id, wvl.person_id, wvl.recorded_at DESC
+ON CONFLICT (visit_id, person_id) DO UPDATE SET
+    status = EXCLUDED.status,
+    recorded_at = EXCLUDED.recorded_at,
+    log_id = EXCLUDED.log_id;
+
+INSERT INTO visit_worker_counts (
+    visit_id, worker_count, active_worker_count, finished_worker_count,
+    paused_worker_count, started_worker_count, en_route_worker_count
+)
+SELECT
+    visit_id,
+    count(*),
+    count(*) FILTER (WHERE status <> 'No-show'),
+    count(*) FILTER (WHERE status = 'Finished'),
+    count(*) FILTER (WHERE status = 'Paused'),
+    count(*) FILTER (WHERE status IN ('Started', 'Paused', 'Finished')),
+    count(*) FILTER (WHERE status = 'On My Way')
+FROM visit_worker_state
+GROUP BY visit_id
+ON CONFLICT (visit_id) DO UPDATE SET
+    worker_count = EXCLUDED.worker_count,
+    active_worker_count = EXCLUDED.active_worker_count,
+    finished_worker_count = EXCLUDED.finished_worker_count,
+    paused_worker_count = EXCLUDED.paused_worker_count,
+    started_worker_count = EXCLUDED.started_worker_count,
+    en_route_worker_count = EXCLUDED.en_route_worker_count;
+
+
+-- ============================================================================
+-- 6. GET_VISIT_DETAILS: WORKERS FROM VISIT_WORKER_STATE
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION get_visit_details(p_visit_id UUID)
+RETURNS JSONB AS $$
+DECLARE
+    v_result JSONB;
+BEGIN
+    SELECT jsonb_build_object(
+        'visit', jsonb_build_object(
+            'id', v.id,
+            'job_id', v.job_id,
+            'visit_number', v.visit_number,
+            'status', v.status,
+            'scheduled_start', v.scheduled_start,
+            'scheduled_end', v.scheduled_end,
+            'duration_minutes', calculate_visit_duration_minutes(v.scheduled_start, v.scheduled_end),
+            'duration_formatted', format_duration(calculate_visit_duration_minutes(v.scheduled_start, v.scheduled_end)),
+            'actual_start', v.actual_start,
+            'actual_end', v.actual_end,
+            'derived_state', derive_visit_state(v.id)
+        ),
+        'workers', (
+            SELECT jsonb_agg(jsonb_build_object(
+                'person_id', vws.person_id,
+                'person_name', p.first_name || ' ' || p.last_name,
+                'status', vws.status,
+                'recorded_at', vws.recorded_at,
+                'latitude', wvl.latitude,
+                'longitude', wvl.longitude
+            ) ORDER BY vws.recorded_at DESC)
+            FROM visit_worker_state vws
+            JOIN worker_visit_logs wvl ON wvl.id = vws.log_id
+            JOIN people p ON p.id = vws.person_id
+            WHERE vws.visit_id = p_visit_id
+        ),
+        'status_history', (
+            SELECT jsonb_agg(jsonb_build_object(
+                'person_id', wvl.person_id,
+                'person_name', p.first_name || ' ' || p.last_name,
+                'status', wvl.status,
+                'recorded_at', wvl.recorded_at
+            ) ORDER BY wvl.recorded_at)
+            FROM worker_visit_logs wvl
+            JOIN people p ON p.id = wvl.person_id
+            WHERE wvl.visit_id = p_visit_id
+        )
+    ) INTO v_result
+    FROM visits v
+    WHERE v.id = p_visit_id;
+
+    RETURN v_result;
+END;
+$$ LANGUAGE plpgsql STABLE SECURITY DEFINER;
+
+GRANT EXECUTE ON FUNCTION derive_visit_state(UUID) TO authenticated;
+GRANT EXECUTE ON FUNCTION get_visit_details(UUID) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,334 @@
+-- Migration: Worker Daily Stats Rollups
+-- Purpose: Per-worker, per-day rollups of visits, no-shows, completions,
+--          incompletions and corrections received, maintained by triggers on
+--          worker_visit_logs and artifacts (both insert-only). The integrity
+--          score and leaderboard read these instead of re-scanning 90 days of
+--          logs and self-joining artifacts once per worker.
+-- Date: 2025-01-29
+--
+-- Days are UTC calendar days. A visit counts once per worker, on the day of
+-- the worker's first log for it.
+
+-- ============================================================================
+-- 1. TABLES
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS worker_daily_stats (
+    person_id UUID NOT NULL REFERENCES people(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    tenant_id UUID NOT NULL REFERENCES tenants(id),
+    visits INT NOT NULL DEFAULT 0,
+    no_shows INT NOT NULL DEFAULT 0,
+    completions INT NOT NULL DEFAULT 0,
+    incompletions INT NOT NULL DEFAULT 0,
+    corrections_received INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (person_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS idx_worker_daily_stats_tenant_day
+    ON worker_daily_stats (tenant_id, day);
+
+-- First log per (worker, visit), so visits can be summed across days
+CREATE TABLE IF NOT EXISTS worker_visit_first_log (
+    person_id UUID NOT NULL REFERENCES people(id) ON DELETE CASCADE,
+    visit_id UUID NOT NULL REFERENCES visits(id) ON DELETE CASCADE,
+    first_recorded_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (person_id, visit_id)
+);
+
+ALTER TABLE worker_daily_stats ENABLE ROW LEVEL SECURITY;
+ALTER TABLE worker_visit_first_log ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "worker_daily_stats_tenant_isolation" ON worker_daily_stats;
+CREATE POLICY "worker_daily_stats_tenant_isolation" ON worker_daily_stats
+    FOR SELECT USING (tenant_id = get_my_tenant_id());
+
+GRANT SELECT ON worker_daily_stats TO authenticated;
+
+
+-- ============================================================================
+-- 2. INCREMENTAL MAINTENANCE
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION bump_worker_daily_stats(
+    p_person_id UUID,
+    p_at TIMESTAMPTZ,
+    p_visits INT DEFAULT 0,
+    p_no_shows INT DEFAULT 0,
+    p_completions INT DEFAULT 0,
+    p_incompletions INT DEFAULT 0,
+    p_corrections_received INT DEFAULT 0
+)
+RETURNS void
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    INSERT INTO worker_daily_stats (
+        person_id, day, tenant_id,
+        visits, no_shows, completions, incompletions, corrections_received
+    )
+    SELECT p_person_id, (p_at AT TIME ZONE 'UTC')::date, p.tenant_id,
+           p_visits, p_no_shows, p_completions, p_incompletions, p_corrections_received
+    FROM people p
+    WHERE p.id = p_person_id
+    ON CONFLICT (person_id, day) DO UPDATE SET
+        visits = worker_daily_stats.visits + EXCLUDED.visits,
+        no_shows = worker_daily_stats.no_shows + EXCLUDED.no_shows,
+        completions = worker_daily_stats.completions + EXCLUDED.completions,
+        incompletions = worker_daily_stats.incompletions + EXCLUDED.incompletions,
+        corrections_received = worker_daily_stats.corrections_received + EXCLUDED.corrections_received;
+$$;
+
+CREATE OR REPLACE FUNCTION trg_worker_daily_stats_log()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_first_visit INT := 0;
+BEGIN
+    INSERT INTO worker_visit_first_log (person_id, visit_id, first_recorded_at)
+    VALUES (NEW.person_id, NEW.visit_id, NEW.recorded_at)
+    ON CONFLICT (person_id, visit_id) DO NOTHING;
+    IF FOUND THEN
+        v_first_visit := 1;
+    END IF;
+
+    IF v_first_visit = 1 OR NEW.status = 'No-show' THEN
+        PERFORM bump_worker_daily_stats(
+            NEW.person_id, NEW.recorded_at,
+            p_visits => v_first_visit,
+            p_no_shows => CASE WHEN NEW.status = 'No-show' THEN 1 ELSE 0 END
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_worker_daily_stats ON worker_visit_logs;
+CREATE TRIGGER trg_worker_daily_stats
+    AFTER INSERT ON worker_visit_logs
+    FOR EACH ROW EXECUTE FUNCTION trg_worker_daily_stats_log();
+
+CREATE OR REPLACE FUNCTION trg_worker_daily_stats_artifact()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_original RECORD;
+BEGIN
+    IF NEW.artifact_type IN ('CompletionArtifact', 'IncompletionArtifact') THEN
+        PERFORM bump_worker_daily_stats(
+            NEW.submitted_by, NEW.submitted_at,
+            p_completions => CASE WHEN NEW.artifact_type = 'CompletionArtifact' THEN 1 ELSE 0 END,
+            p_incompletions => CASE WHEN NEW.artifact_type = 'IncompletionArtifact' THEN 1 ELSE 0 END
+        );
+    END IF;
+
+    -- A correction by someone else counts against the original's author, on
+    -- the day the original was submitted
+    IF NEW.corrects_artifact_id IS NOT NULL THEN
+        SELECT submitted_by, submitted_at INTO v_original
+        FROM artifacts
+        WHERE id = NEW.corrects_artifact_id;
+
+        IF FOUND AND v_original.submitted_by <> NEW.submitted_by THEN
+            PERFORM bump_worker_daily_stats(
+                v_original.submitted_by, v_original.submitted_at,
+                p_corrections_received => 1
+            );
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_worker_daily_stats ON artifacts;
+CREATE TRIGGER trg_worker_daily_stats
+    AFTER INSERT ON artifacts
+    FOR EACH ROW EXECUTE FUNCTION trg_worker_daily_stats_artifact();
+
+-- Only the triggers above may write the rollups
+REVOKE EXECUTE ON FUNCTION bump_worker_daily_stats(UUID, TIMESTAMPTZ, INT, INT, INT, INT, INT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION trg_worker_daily_stats_log() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION trg_worker_daily_stats_artifact() FROM PUBLIC, anon, authenticated;
+
+
+-- ============================================================================
+-- 3. REBUILD (backfill / nightly reconciliation)
+-- ============================================================================
+-- Recomputes the rollups from the source tables for one tenant (or all).
+
+CREATE OR REPLACE FUNCTION rebuild_worker_daily_stats(p_tenant_id UUID DEFAULT NULL)
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    DELETE FROM worker_visit_first_log f
+    USING people p
+    WHERE p.id = f.person_id
+      AND (p_tenant_id IS NULL OR p.tenant_id = p_tenant_id);
+
+    INSERT INTO worker_visit_first_log (person_id, visit_id, first_recorded_at)
+    SELECT wvl.person_id, wvl.visit_id, min(wvl.recorded_at)
+    FROM worker_visit_logs wvl
+    JOIN people p ON p.id = wvl.person_id
+    WHERE p_tenant_id IS NULL OR p.tenant_id = p_tenant_id
+    GROUP BY wvl.person_id, wvl.visit_id;
+
+    DELETE FROM worker_daily_stats
+    WHERE p_tenant_id IS NULL OR tenant_id = p_tenant_id;
+
+    INSERT INTO worker_daily_stats (
+        person_id, day, tenant_id,
+        visits, no_shows, completions, incompletions, corrections_received
+    )
+    SELECT s.person_id, s.day, p.tenant_id,
+           sum(s.visits), sum(s.no_shows), sum(s.completions),
+           sum(s.incompletions), sum(s.corrections_received)
+    FROM (
+        SELECT f.person_id, (f.first_recorded_at AT TIME ZONE 'UTC')::date AS day,
+               1 AS visits, 0 AS no_shows, 0 AS completions, 0 AS incompletions, 0 AS corrections_received
+        FROM worker_visit_first_log f
+        UNION ALL
+        SELECT wvl.person_id, (wvl.recorded_at AT TIME ZONE 'UTC')::date, 0, 1, 0, 0, 0
+        FROM worker_visit_logs wvl
+        WHERE wvl.status = 'No-show'
+        UNION ALL
+        SELECT a.submitted_by, (a.submitted_at AT TIME ZONE 'UTC')::date, 0, 0,
+               (a.artifact_type = 'CompletionArtifact')::int,
+               (a.artifact_type = 'IncompletionArtifact')::int, 0
+        FROM artifacts a
+        WHERE a.artifact_type IN ('CompletionArtifact', 'IncompletionArtifact')
+        UNION ALL
+        SELECT a.submitted_by, (a.submitted_at AT TIME ZONE 'UTC')::date, 0, 0, 0, 0, 1
+        FROM artifacts a
+        JOIN artifacts a2 ON a2.corrects_artifact_id = a.id AND a2.submitted_by <> a.submitted_by
+    ) s
+    JOIN people p ON p.id = s.person_id
+    WHERE p_tenant_id IS NULL OR p.tenant_id = p_tenant_id
+    GROUP BY s.person_id, s.day, p.tenant_id;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION rebuild_worker_daily_stats(UUID) FROM PUBLIC, anon, authenticated;
+
+SELECT rebuild_worker_daily_stats();
+
+ANALYZE worker_daily_stats;
+
+
+-- ============================================================================
+-- 4. ANALYTICS RPCS ON THE ROLLUPS
+-- ============================================================================
+
+-- Score formula shared by the integrity score and the leaderboard
+CREATE OR REPLACE FUNCTION worker_integrity_score(
+    p_total_visits BIGINT,
+    p_no_shows BIGINT,
+    p_completions BIGINT,
+    p_incompletions BIGINT,
+    p_corrections_received BIGINT
+)
+RETURNS NUMERIC
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT ROUND(GREATEST(0, LEAST(100,
+        100
+        - CASE WHEN p_total_visits > 0
+               THEN LEAST(30, p_no_shows::numeric / p_total_visits * 100) ELSE 0 END
+        + CASE WHEN (p_completions + p_incompletions) > 0
+               THEN LEAST(20, p_incompletions::numeric / (p_completions + p_incompletions) * 40) ELSE 0 END
+        - CASE WHEN p_completions > 0
+               THEN LEAST(15, p_corrections_received::numeric / p_completions * 50) ELSE 0 END
+    )), 1);
+$$;
+
+CREATE OR REPLACE FUNCTION calculate_worker_integrity_score(p_person_id UUID)
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'person_id', p_person_id,
+        'period_days', 90,
+        'total_visits', t.visits,
+        'no_shows', t.no_shows,
+        'no_show_rate', ROUND(COALESCE(t.no_shows::numeric / NULLIF(t.visits, 0) * 100, 0), 1),
+        'completions', t.completions,
+        'honest_incompletions', t.incompletions,
+        'corrections_received', t.corrections_received,
+        'correction_rate', ROUND(COALESCE(t.corrections_received::numeric / NULLIF(t.completions, 0) * 100, 0), 1),
+        'integrity_score', worker_integrity_score(t.visits, t.no_shows, t.completions, t.incompletions, t.corrections_received)
+    )
+    FROM (
+        SELECT
+            COALESCE(sum(s.visits), 0) AS visits,
+            COALESCE(sum(s.no_shows), 0) AS no_shows,
+            COALESCE(sum(s.completions), 0) AS completions,
+            COALESCE(sum(s.incompletions), 0) AS incompletions,
+            COALESCE(sum(s.corrections_received), 0) AS corrections_received
+        FROM worker_daily_stats s
+        WHERE s.person_id = p_person_id
+          AND s.day > (now() AT TIME ZONE 'UTC')::date - 90
+    ) t;
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+GRANT EXECUTE ON FUNCTION calculate_worker_integrity_score(UUID) TO authenticated;
+
+-- Counts cover p_days; integrity_score always covers 90 days, as before.
+-- One range scan of the tenant's rollups, no per-worker function calls.
+CREATE OR REPLACE FUNCTION get_worker_leaderboard(p_tenant_id UUID, p_days INT DEFAULT 90)
+RETURNS TABLE (
+    person_id UUID,
+    person_name TEXT,
+    total_visits BIGINT,
+    completions BIGINT,
+    incompletions BIGINT,
+    no_shows BIGINT,
+    integrity_score NUMERIC
+) AS $$
+    WITH bounds AS (
+        SELECT
+            (now() AT TIME ZONE 'UTC')::date - p_days AS period_start,
+            (now() AT TIME ZONE 'UTC')::date - 90 AS score_start
+    ),
+    totals AS (
+        SELECT
+            s.person_id,
+            sum(s.visits) FILTER (WHERE s.day > b.period_start) AS visits,
+            sum(s.completions) FILTER (WHERE s.day > b.period_start) AS completions,
+            sum(s.incompletions) FILTER (WHERE s.day > b.period_start) AS incompletions,
+            sum(s.no_shows) FILTER (WHERE s.day > b.period_start) AS no_shows,
+            COALESCE(sum(s.visits) FILTER (WHERE s.day > b.score_start), 0) AS score_visits,
+            COALESCE(sum(s.no_shows) FILTER (WHERE s.day > b.score_start), 0) AS score_no_shows,
+            COALESCE(sum(s.completions) FILTER (WHERE s.day > b.score_start), 0) AS score_completions,
+            COALESCE(sum(s.incompletions) FILTER (WHERE s.day > b.score_start), 0) AS score_incompletions,
+            COALESCE(sum(s.corrections_received) FILTER (WHERE s.day > b.score_start), 0) AS score_corrections
+        FROM worker_daily_stats s, bounds b
+        WHERE s.tenant_id = p_tenant_id
+          AND s.day > LEAST(b.period_start, b.score_start)
+        GROUP BY s.person_id
+    )
+    SELECT
+        p.id AS person_id,
+        p.first_name || ' ' || p.last_name AS person_name,
+        t.visits::bigint AS total_visits,
+        COALESCE(t.completions, 0)::bigint AS completions,
+        COALESCE(t.incompletions, 0)::bigint AS incompletions,
+        COALESCE(t.no_shows, 0)::bigint AS no_shows,
+        worker_integrity_score(t.score_visits, t.score_no_shows, t.score_completions,
+                               t.score_incompletions, t.score_corrections) AS integrity_score
+    FROM totals t
+    JOIN people p ON p.id = t.person_id
+    WHERE t.visits > 0
+    ORDER BY integrity_score DESC NULLS LAST;
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+GRANT EXECUTE ON FUNCTION get_worker_leaderboard(UUID, INT) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
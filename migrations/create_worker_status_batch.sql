@@ -0,0 +1,238 @@
+-- Migration: Batched Worker Status Logging
+-- Purpose: log_worker_statuses_batch accepts an ordered array of client-
+--          timestamped status events with idempotency keys (the worker app's
+--          offline outbox), inserts them in one statement, and derives visit
+--          state once per affected visit instead of once per log row.
+-- Date: 2025-02-02
+
+-- ============================================================================
+-- 1. IDEMPOTENCY KEY
+-- ============================================================================
+-- recorded_at is the client's event time for batched events; received_at is
+-- when the server got it.
+ALTER TABLE worker_visit_logs
+    ADD COLUMN IF NOT EXISTS idempotency_key UUID,
+    ADD COLUMN IF NOT EXISTS received_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_worker_visit_logs_idempotency
+    ON worker_visit_logs (person_id, idempotency_key)
+    WHERE idempotency_key IS NOT NULL;
+
+
+-- ============================================================================
+-- 2. STATEMENT-LEVEL VISIT STATE DERIVATION
+-- ============================================================================
+-- Replaces the per-row update_visit_derived_state. For every statement:
+--   0. lock the affected visits (id order), so concurrent batches for the same
+--      visit run one after the other and each recount sees the other's
+--      committed worker states instead of overwriting them with stale totals
+--   1. upsert the latest new log per (visit, worker) into visit_worker_state
+--      (older, out-of-order logs never overwrite a newer state)
+--   2. recount visit_worker_counts of each affected visit from visit_worker_state
+--   3. move affected Scheduled visits to In Progress when the derived state
+--      is Started / Paused / En Route
+-- A single log_worker_status insert takes the same path with one row.
+
+CREATE OR REPLACE FUNCTION update_visit_derived_state()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    PERFORM 1
+    FROM visits
+    WHERE id IN (SELECT DISTINCT visit_id FROM new_logs)
+    ORDER BY id
+    FOR UPDATE;
+
+    INSERT INTO visit_worker_state (visit_id, person_id, status, recorded_at, log_id)
+    SELECT DISTINCT ON (n.visit_id, n.person_id)
+        n.visit_id, n.person_id, n.status, n.recorded_at, n.id
+    FROM new_logs n
+    ORDER BY n.visit_id, n.person_id, n.recorded_at DESC, n.received_at DESC
+    ON CONFLICT (visit_id, person_id) DO UPDATE SET
+        status = EXCLUDED.status,
+        recorded_at = EXCLUDED.recorded_at,
+        log_id = EXCLUDED.log_id
+    WHERE visit_worker_state.recorded_at <= EXCLUDED.recorded_at;
+
+    INSERT INTO visit_worker_counts AS c (
+        visit_id, worker_count, active_worker_count, finished_worker_count,
+        paused_worker_count, started_worker_count, en_route_worker_count
+    )
+    SELECT
+        s.visit_id,
+        count(*)::int,
+        (count(*) FILTER (WHERE s.status <> 'No-show'))::int,
+        (count(*) FILTER (WHERE s.status = 'Finished'))::int,
+        (count(*) FILTER (WHERE s.status = 'Paused'))::int,
+        (count(*) FILTER (WHERE s.status IN ('Started', 'Paused', 'Finished')))::int,
+        (count(*) FILTER (WHERE s.status = 'On My Way'))::int
+    FROM visit_worker_state s
+    WHERE s.visit_id IN (SELECT DISTINCT visit_id FROM new_logs)
+    GROUP BY s.visit_id
+    ON CONFLICT (visit_id) DO UPDATE SET
+        worker_count = EXCLUDED.worker_count,
+        active_worker_count = EXCLUDED.active_worker_count,
+        finished_worker_count = EXCLUDED.finished_worker_count,
+        paused_worker_count = EXCLUDED.paused_worker_count,
+        started_worker_count = EXCLUDED.started_worker_count,
+        en_route_worker_count = EXCLUDED.en_route_worker_count
+    WHERE (c.worker_count, c.active_worker_count, c.finished_worker_count,
+           c.paused_worker_count, c.started_worker_count, c.en_route_worker_count)
+          IS DISTINCT FROM
+          (EXCLUDED.worker_count, EXCLUDED.active_worker_count, EXCLUDED.finished_worker_count,
+           EXCLUDED.paused_worker_count, EXCLUDED.started_worker_count, EXCLUDED.en_route_worker_count);
+
+    -- Terminal visits are never touched (only Scheduled ones move).
+    -- Note: 'Finished' does NOT auto-set visit to 'Completed'
+    -- Completion requires explicit CompletionArtifact submission
+    UPDATE visits v
+    SET status = 'In Progress',
+        actual_start = COALESCE(v.actual_start, f.first_recorded_at)
+    FROM (
+        SELECT visit_id, min(recorded_at) AS first_recorded_at
+        FROM new_logs
+        WHERE status <> 'No-show'
+        GROUP BY visit_id
+    ) f
+    JOIN visit_worker_counts c ON c.visit_id = f.visit_id
+    WHERE v.id = f.visit_id
+      AND v.status = 'Scheduled'
+      AND visit_state_from_counts(
+            c.worker_count, c.active_worker_count, c.finished_worker_count,
+            c.paused_worker_count, c.started_worker_count, c.en_route_worker_count
+          ) IN ('Started', 'Paused', 'En Route');
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_update_visit_state ON worker_visit_logs;
+CREATE TRIGGER trg_update_visit_state
+    AFTER INSERT ON worker_visit_logs
+    REFERENCING NEW TABLE AS new_logs
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION update_visit_derived_state();
+
+
+-- ============================================================================
+-- 3. LOG WORKER STATUSES BATCH RPC
+-- ============================================================================
+-- p_events: ordered array of
+--   { idempotency_key: uuid, visit_id: uuid, status: text,
+--     recorded_at: timestamptz, latitude?, longitude?, device_info? }
+-- recorded_at is the client's event time (capped at now()).
+--
+-- Returns {
+--   accepted:   [ { idempotency_key, id } ],     -- inserted now
+--   duplicates: [ idempotency_key ],             -- already stored earlier
+--   rejected:   [ { idempotency_key, reason } ]  -- will never be accepted
+-- }
+-- Every submitted key appears in exactly one list, so the client can drop it
+-- from its outbox.
+
+CREATE OR REPLACE FUNCTION log_worker_statuses_batch(p_events JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_person_id UUID;
+    v_tenant_id UUID;
+    v_result JSONB;
+BEGIN
+    -- Get person from auth context
+    SELECT p.id, p.tenant_id INTO v_person_id, v_tenant_id
+    FROM people p
+    WHERE p.user_id = auth.uid();
+
+    IF v_person_id IS NULL THEN
+        RAISE EXCEPTION 'User not linked to person record';
+    END IF;
+
+    IF jsonb_typeof(p_events) IS DISTINCT FROM 'array' THEN
+        RAISE EXCEPTION 'p_events must be a JSON array';
+    END IF;
+
+    IF jsonb_array_length(p_events) > 500 THEN
+        RAISE EXCEPTION 'At most 500 events per batch';
+    END IF;
+
+    WITH events AS (
+        SELECT e.*
+        FROM ROWS FROM (jsonb_to_recordset(p_events) AS (
+            idempotency_key UUID,
+            visit_id UUID,
+            status TEXT,
+            recorded_at TIMESTAMPTZ,
+            latitude NUMERIC,
+            longitude NUMERIC,
+            device_info JSONB
+        )) WITH ORDINALITY AS e(
+            idempotency_key, visit_id, status, recorded_at,
+            latitude, longitude, device_info, ord
+        )
+    ),
+    -- Validation (same rules as log_worker_status, plus tenant ownership).
+    -- A key repeated within the batch is only inserted once.
+    checked AS (
+        SELECT
+            e.*,
+            LEAST(COALESCE(e.recorded_at, now()), now()) AS event_at,
+            row_number() OVER (PARTITION BY e.idempotency_key ORDER BY e.ord) AS key_rank,
+            CASE
+                WHEN e.idempotency_key IS NULL THEN 'Missing idempotency_key'
+                WHEN e.status IS NULL
+                  OR e.status NOT IN ('On My Way', 'Started', 'Paused', 'Finished', 'No-show') THEN 'Invalid worker status'
+                WHEN v.id IS NULL OR v.tenant_id IS DISTINCT FROM v_tenant_id THEN 'Visit not found'
+                WHEN v.status IN ('Completed', 'Incomplete', 'Aborted') THEN 'Cannot log status to terminal visit'
+            END AS reason
+        FROM events e
+        LEFT JOIN visits v ON v.id = e.visit_id
+    ),
+    -- One insert for every valid event; replays of stored keys are skipped.
+    -- trg_update_visit_state then runs once for the whole statement.
+    inserted AS (
+        INSERT INTO worker_visit_logs (
+            visit_id, person_id, status, recorded_at,
+            latitude, longitude, device_info, idempotency_key
+        )
+        SELECT c.visit_id, v_person_id, c.status, c.event_at,
+               c.latitude, c.longitude, c.device_info, c.idempotency_key
+        FROM checked c
+        WHERE c.reason IS NULL
+          AND c.key_rank = 1
+        ORDER BY c.ord
+        ON CONFLICT (person_id, idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
+        RETURNING id, idempotency_key
+    )
+    SELECT jsonb_build_object(
+        'accepted', COALESCE(
+            jsonb_agg(jsonb_build_object('idempotency_key', c.idempotency_key, 'id', i.id) ORDER BY c.ord)
+                FILTER (WHERE c.reason IS NULL AND i.id IS NOT NULL),
+            '[]'::jsonb),
+        'duplicates', COALESCE(
+            jsonb_agg(to_jsonb(c.idempotency_key) ORDER BY c.ord)
+                FILTER (WHERE c.reason IS NULL AND i.id IS NULL),
+            '[]'::jsonb),
+        'rejected', COALESCE(
+            jsonb_agg(jsonb_build_object('idempotency_key', c.idempotency_key, 'reason', c.reason) ORDER BY c.ord)
+                FILTER (WHERE c.reason IS NOT NULL),
+            '[]'::jsonb)
+    )
+    INTO v_result
+    FROM checked c
+    LEFT JOIN inserted i
+      ON i.idempotency_key = c.idempotency_key
+     AND c.key_rank = 1;
+
+    RETURN v_result;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION log_worker_statuses_batch(JSONB) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,314 @@
+-- Denormalized tenant_id on child tables
+-- Child tables (job_tasks, visits, property_inventory, ...) had no tenant_id,
+-- so the audit trigger and RLS policies had to walk up to the parent with an
+-- extra SELECT / EXISTS for every row. This adds tenant_id to each child,
+-- keeps it in sync from the parent with a BEFORE trigger, backfills it in
+-- batches and indexes it. The audit trigger and RLS then read it directly.
+--
+-- Run with psql outside an explicit transaction: the backfill procedure
+-- commits after every batch.
+
+-- 1. Copy tenant_id from the parent row on insert / when the FK or tenant_id
+--    changes. Usage: set_child_tenant_id('<parent table>', '<fk column>')
+--    The value is always taken from the parent, never trusted from the client:
+--    a direct UPDATE ... SET tenant_id is recomputed, and the backfill below
+--    goes through the same path.
+CREATE OR REPLACE FUNCTION set_child_tenant_id()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_parent_id text := to_jsonb(NEW)->>TG_ARGV[1];
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND (to_jsonb(OLD)->>TG_ARGV[1]) IS NOT DISTINCT FROM v_parent_id
+       AND NEW.tenant_id IS NOT DISTINCT FROM OLD.tenant_id THEN
+        RETURN NEW;
+    END IF;
+
+    IF v_parent_id IS NULL THEN
+        NEW.tenant_id := NULL;
+    ELSE
+        EXECUTE format('SELECT tenant_id FROM %I WHERE id = $1::uuid', TG_ARGV[0])
+        INTO NEW.tenant_id
+        USING v_parent_id;
+    END IF;
+
+    RETURN NEW;
+END;
+$$;
+
+
+-- 2. Filling in a missing tenant_id is not a modification of immutable or
+--    terminal rows: job_dispositions (prevent_mutation) and Completed /
+--    Incomplete / Aborted visits (visits_terminal_protection) accept updates
+--    that only set a NULL tenant_id, so the backfill can reach them. Moving
+--    such a row to another tenant, like every other update, is rejected.
+CREATE OR REPLACE FUNCTION prevent_mutation()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND (to_jsonb(OLD)->>'tenant_id') IS NULL
+       AND (to_jsonb(NEW) - 'tenant_id') = (to_jsonb(OLD) - 'tenant_id') THEN
+        RETURN NEW;
+    END IF;
+    RAISE EXCEPTION 'Table % is immutable. UPDATE and DELETE operations are not permitted.', TG_TABLE_NAME;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION visits_terminal_protection()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF OLD.status IN ('Completed', 'Incomplete', 'Aborted')
+       AND NOT (OLD.tenant_id IS NULL
+                AND (to_jsonb(NEW) - 'tenant_id') = (to_jsonb(OLD) - 'tenant_id')) THEN
+        RAISE EXCEPTION 'Visit in terminal state (%) cannot be modified', OLD.status;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- 3. Batched backfill. Only touches rows whose parent has a tenant, so it
+--    always terminates; orphans keep NULL.
+CREATE OR REPLACE PROCEDURE backfill_child_tenant_id(
+    p_table text,
+    p_parent text,
+    p_fk text,
+    p_batch_size int DEFAULT 5000
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_rows int;
+    v_total bigint := 0;
+BEGIN
+    LOOP
+        EXECUTE format(
+            'WITH batch AS (
+                SELECT c.id, p.tenant_id
+                FROM %1$I c
+                JOIN %2$I p ON p.id = c.%3$I
+                WHERE c.tenant_id IS NULL
+                  AND p.tenant_id IS NOT NULL
+                LIMIT %4$s
+            )
+            UPDATE %1$I c SET tenant_id = batch.tenant_id
+            FROM batch
+            WHERE c.id = batch.id',
+            p_table, p_parent, p_fk, p_batch_size
+        );
+        GET DIAGNOSTICS v_rows = ROW_COUNT;
+        v_total := v_total + v_rows;
+        COMMIT;
+        EXIT WHEN v_rows = 0;
+    END LOOP;
+
+    RAISE NOTICE 'Backfilled %.tenant_id: % rows', p_table, v_total;
+END;
+$$;
+
+
+-- 4. Column, index and sync trigger on every child table
+DO $$
+DECLARE
+    v_child record;
+BEGIN
+    FOR v_child IN
+        SELECT * FROM (VALUES
+            -- Property children
+            ('property_access_codes',     'properties',    'property_id'),
+            ('property_attachments',      'properties',    'property_id'),
+            ('property_instructions',     'properties',    'property_id'),
+            ('property_inventory',        'properties',    'property_id'),
+            ('property_reference_photos', 'properties',    'property_id'),
+            ('calendar_feeds',            'properties',    'property_id'),
+            ('property_assignments',      'properties',    'property_id'),
+            -- Job children
+            ('visits',                    'jobs',          'job_id'),
+            ('job_tasks',                 'jobs',          'job_id'),
+            ('job_assignments',           'jobs',          'job_id'),
+            ('job_comments',              'jobs',          'job_id'),
+            ('job_photos',                'jobs',          'job_id'),
+            ('job_timers',                'jobs',          'job_id'),
+            ('job_inputs',                'jobs',          'job_id'),
+            ('job_dispositions',          'jobs',          'job_id'),
+            -- Task children (after job_tasks, whose tenant_id they copy)
+            ('job_checklist_items',       'job_tasks',     'job_task_id'),
+            -- Template children
+            ('job_template_tasks',        'job_templates', 'job_template_id'),
+            ('job_template_inputs',       'job_templates', 'job_template_id'),
+            ('job_template_roles',        'job_templates', 'job_template_id'),
+            ('bom_template_items',        'bom_templates', 'bom_template_id'),
+            ('job_template_checklist_items', 'job_template_tasks', 'job_template_task_id'),
+            -- Person children
+            ('person_roles',              'people',        'person_id')
+        ) AS t(child_table, parent_table, fk_column)
+    LOOP
+        IF to_regclass('public.' || v_child.child_table) IS NULL THEN
+            RAISE NOTICE 'Skipping %, table does not exist', v_child.child_table;
+            CONTINUE;
+        END IF;
+
+        EXECUTE format('ALTER TABLE %I ADD COLUMN IF NOT EXISTS tenant_id uuid', v_child.child_table);
+        EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON %I (tenant_id)',
+            'idx_' || v_child.child_table || '_tenant_id', v_child.child_table);
+
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_set_tenant_id ON %I', v_child.child_table);
+        EXECUTE format(
+            'CREATE TRIGGER trg_set_tenant_id BEFORE INSERT OR UPDATE OF %I, tenant_id ON %I
+             FOR EACH ROW EXECUTE FUNCTION set_child_tenant_id(%L, %L)',
+            v_child.fk_column, v_child.child_table, v_child.parent_table, v_child.fk_column
+        );
+    END LOOP;
+END $$;
+
+
+-- 5. Audit trigger: read tenant_id straight off the row. The parent walk is
+--    kept only as a fallback for tables without the column (job_queue) and
+--    for orphaned rows. Updates that only fill in tenant_id (the backfill
+--    below) are not audited.
+CREATE OR REPLACE FUNCTION record_audit_log_with_tenant()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_old_data jsonb;
+    v_new_data jsonb;
+    v_row jsonb;
+    v_user_id uuid;
+    v_tenant_id uuid := null;
+BEGIN
+    -- Try to get user ID from Supabase Auth
+    v_user_id := auth.uid();
+
+    IF (TG_OP = 'DELETE') THEN
+        v_old_data := to_jsonb(OLD);
+        v_new_data := null;
+        v_row := v_old_data;
+    ELSIF (TG_OP = 'INSERT') THEN
+        v_old_data := null;
+        v_new_data := to_jsonb(NEW);
+        v_row := v_new_data;
+    ELSE
+        -- UPDATE: Check if data actually changed
+        IF OLD IS NOT DISTINCT FROM NEW THEN
+            RETURN NEW;
+        END IF;
+        v_old_data := to_jsonb(OLD);
+        v_new_data := to_jsonb(NEW);
+        -- The backfill filling in a missing tenant_id is not a change; moving
+        -- a row to another tenant is, and is audited
+        IF (v_old_data->>'tenant_id') IS NULL
+           AND (v_old_data - 'tenant_id') = (v_new_data - 'tenant_id') THEN
+            RETURN NEW;
+        END IF;
+        v_row := v_new_data;
+    END IF;
+
+    v_tenant_id := (v_row->>'tenant_id')::uuid;
+
+    IF v_tenant_id IS NULL THEN
+        IF (v_row->>'property_id') IS NOT NULL THEN
+            SELECT tenant_id INTO v_tenant_id FROM properties WHERE id = (v_row->>'property_id')::uuid;
+        ELSIF (v_row->>'job_id') IS NOT NULL THEN
+            SELECT tenant_id INTO v_tenant_id FROM jobs WHERE id = (v_row->>'job_id')::uuid;
+        ELSIF (v_row->>'visit_id') IS NOT NULL THEN
+            SELECT tenant_id INTO v_tenant_id FROM visits WHERE id = (v_row->>'visit_id')::uuid;
+        ELSIF (v_row->>'service_opportunity_id') IS NOT NULL THEN
+            SELECT tenant_id INTO v_tenant_id FROM service_opportunities WHERE id = (v_row->>'service_opportunity_id')::uuid;
+        ELSIF (v_row->>'job_template_id') IS NOT NULL THEN
+            SELECT tenant_id INTO v_tenant_id FROM job_templates WHERE id = (v_row->>'job_template_id')::uuid;
+        ELSIF (v_row->>'bom_template_id') IS NOT NULL THEN
+            SELECT tenant_id INTO v_tenant_id FROM bom_templates WHERE id = (v_row->>'bom_template_id')::uuid;
+        ELSIF (v_row->>'person_id') IS NOT NULL THEN
+            SELECT tenant_id INTO v_tenant_id FROM people WHERE id = (v_row->>'person_id')::uuid;
+        END IF;
+    END IF;
+
+    INSERT INTO audit_logs (table_name, record_id, operation, changed_by, old_values, new_values, resolved_tenant_id)
+    VALUES (
+        TG_TABLE_NAME,
+        COALESCE((v_row->>'id')::uuid, null),
+        TG_OP,
+        v_user_id,
+        v_old_data,
+        v_new_data,
+        v_tenant_id
+    );
+
+    RETURN COALESCE(NEW, OLD);
+END;
+$$;
+
+
+-- 6. Backfill (parents first: visits before anything keyed on visit_id,
+--    job_tasks / job_template_tasks before their checklist items)
+CALL backfill_child_tenant_id('property_access_codes', 'properties', 'property_id');
+CALL backfill_child_tenant_id('property_attachments', 'properties', 'property_id');
+CALL backfill_child_tenant_id('property_instructions', 'properties', 'property_id');
+CALL backfill_child_tenant_id('property_inventory', 'properties', 'property_id');
+CALL backfill_child_tenant_id('property_reference_photos', 'properties', 'property_id');
+CALL backfill_child_tenant_id('calendar_feeds', 'properties', 'property_id');
+CALL backfill_child_tenant_id('property_assignments', 'properties', 'property_id');
+CALL backfill_child_tenant_id('visits', 'jobs', 'job_id');
+CALL backfill_child_tenant_id('job_tasks', 'jobs', 'job_id');
+CALL backfill_child_tenant_id('job_assignments', 'jobs', 'job_id');
+CALL backfill_child_tenant_id('job_comments', 'jobs', 'job_id');
+CALL backfill_child_tenant_id('job_photos', 'jobs', 'job_id');
+CALL backfill_child_tenant_id('job_timers', 'jobs', 'job_id');
+CALL backfill_child_tenant_id('job_inputs', 'jobs', 'job_id');
+CALL backfill_child_tenant_id('job_dispositions', 'jobs', 'job_id');
+CALL backfill_child_tenant_id('job_checklist_items', 'job_tasks', 'job_task_id');
+CALL backfill_child_tenant_id('job_template_tasks', 'job_templates', 'job_template_id');
+CALL backfill_child_tenant_id('job_template_inputs', 'job_templates', 'job_template_id');
+CALL backfill_child_tenant_id('job_template_roles', 'job_templates', 'job_template_id');
+CALL backfill_child_tenant_id('bom_template_items', 'bom_templates', 'bom_template_id');
+CALL backfill_child_tenant_id('job_template_checklist_items', 'job_template_tasks', 'job_template_task_id');
+CALL backfill_child_tenant_id('person_roles', 'people', 'person_id');
+
+
+-- 7. RLS: compare the row's own tenant_id instead of joining the parent
+DROP POLICY IF EXISTS tenant_isolation ON property_assignments;
+CREATE POLICY tenant_isolation ON property_assignments
+FOR ALL TO public
+USING (tenant_id = get_my_tenant_id())
+WITH CHECK (tenant_id = get_my_tenant_id());
+
+DROP POLICY IF EXISTS tenant_isolation ON property_inventory;
+CREATE POLICY tenant_isolation ON property_inventory
+FOR ALL TO public
+USING (tenant_id = get_my_tenant_id())
+WITH CHECK (tenant_id = get_my_tenant_id());
+
+DROP POLICY IF EXISTS "tenant_isolation" ON job_template_roles;
+CREATE POLICY "tenant_isolation" ON job_template_roles
+FOR ALL
+USING (tenant_id = get_my_tenant_id());
+
+DROP POLICY IF EXISTS "job_assignments_tenant_isolation" ON job_assignments;
+CREATE POLICY "job_assignments_tenant_isolation" ON job_assignments
+FOR ALL
+USING (tenant_id = get_my_tenant_id());
+
+DROP POLICY IF EXISTS "visits_tenant_isolation" ON visits;
+CREATE POLICY "visits_tenant_isolation" ON visits
+FOR ALL
+USING (tenant_id = get_my_tenant_id());
+
+-- worker_visit_logs is immutable (prevent_mutation), so it keeps its join
+-- but now stops at visits instead of going through jobs.
+DROP POLICY IF EXISTS "worker_visit_logs_tenant_isolation" ON worker_visit_logs;
+CREATE POLICY "worker_visit_logs_tenant_isolation" ON worker_visit_logs
+FOR ALL USING (
+    EXISTS (
+        SELECT 1 FROM visits v
+        WHERE v.id = worker_visit_logs.visit_id
+        AND v.tenant_id = get_my_tenant_id()
+    )
+);
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,319 @@
+-- Diff-based Property Collections Save
+-- save_property_collections used to delete every feed, inventory row and
+-- owner/manager assignment for the property and re-insert them one by one.
+-- That churned IDs (breaking bookings.feed_id), and wrote an audit row per
+-- delete and insert even when nothing changed. It now matches incoming jsonb
+-- against existing rows once and applies only the inserts, updates and
+-- deletes that differ, as set-based statements. update_property_safe (used
+-- by the property form) delegates to it and diffs access codes the same way,
+-- so saving an unchanged form performs no writes.
+
+-- ============================================
+-- 1. SAVE PROPERTY COLLECTIONS
+-- ============================================
+-- Matching rules:
+--   feeds       by id, else by url
+--   inventory   by (item_name, category), paired in order when a name repeats
+--   assignments by (person_id, role); a person listed as both owner and
+--               manager is stored once, as owner (same as update_property_safe)
+-- Returns per-collection counts of inserted / updated / deleted rows.
+CREATE OR REPLACE FUNCTION public.save_property_collections(
+  p_property_id uuid,
+  p_feeds jsonb DEFAULT '[]'::jsonb,
+  p_inventory jsonb DEFAULT '[]'::jsonb,
+  p_owner_ids uuid[] DEFAULT '{}',
+  p_manager_ids uuid[] DEFAULT '{}'
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  owner_role_id uuid;
+  manager_role_id uuid;
+  v_pairs jsonb;
+  v_ins int; v_upd int; v_del int;
+  v_changes jsonb := '{}'::jsonb;
+BEGIN
+  -- Get role IDs
+  SELECT role_id_for(tenant_id, 'owner'), role_id_for(tenant_id, 'property_manager')
+  INTO owner_role_id, manager_role_id
+  FROM properties WHERE id = p_property_id;
+
+  -- ---------- Feeds ----------
+  SELECT COALESCE(jsonb_agg(jsonb_build_object(
+           'existing_id', COALESCE(by_id.id, by_url.id),
+           'name', i.name,
+           'url', i.url
+         )), '[]'::jsonb)
+  INTO v_pairs
+  FROM (
+    SELECT NULLIF(f->>'id', '')::uuid AS id, f->>'name' AS name, f->>'url' AS url
+    FROM jsonb_array_elements(COALESCE(p_feeds, '[]'::jsonb)) f
+  ) i
+  LEFT JOIN calendar_feeds by_id
+    ON by_id.id = i.id AND by_id.property_id = p_property_id
+  LEFT JOIN LATERAL (
+    SELECT cf.id FROM calendar_feeds cf
+    WHERE i.id IS NULL AND cf.property_id = p_property_id AND cf.url = i.url
+    ORDER BY cf.id
+    LIMIT 1
+  ) by_url ON true;
+
+  DELETE FROM calendar_feeds cf
+  WHERE cf.property_id = p_property_id
+    AND NOT EXISTS (
+      SELECT 1 FROM jsonb_to_recordset(v_pairs) AS p(existing_id uuid)
+      WHERE p.existing_id = cf.id
+    );
+  GET DIAGNOSTICS v_del = ROW_COUNT;
+
+  UPDATE calendar_feeds cf
+  SET name = p.name, url = p.url
+  FROM jsonb_to_recordset(v_pairs) AS p(existing_id uuid, name text, url text)
+  WHERE cf.id = p.existing_id
+    AND (cf.name, cf.url) IS DISTINCT FROM (p.name, p.url);
+  GET DIAGNOSTICS v_upd = ROW_COUNT;
+
+  INSERT INTO calendar_feeds (property_id, name, url)
+  SELECT p_property_id, p.name, p.url
+  FROM jsonb_to_recordset(v_pairs) AS p(existing_id uuid, name text, url text)
+  WHERE p.existing_id IS NULL;
+  GET DIAGNOSTICS v_ins = ROW_COUNT;
+
+  v_changes := v_changes || jsonb_build_object('feeds',
+    jsonb_build_object('inserted', v_ins, 'updated', v_upd, 'deleted', v_del));
+
+  -- ---------- Inventory ----------
+  WITH incoming AS (
+    SELECT
+      inv->>'name' AS item_name,
+      COALESCE((inv->>'qty')::integer, 1) AS quantity,
+      COALESCE(inv->>'category', 'General') AS category,
+      row_number() OVER (
+        PARTITION BY inv->>'name', COALESCE(inv->>'category', 'General')
+        ORDER BY ord
+      ) AS rn
+    FROM jsonb_array_elements(COALESCE(p_inventory, '[]'::jsonb)) WITH ORDINALITY AS t(inv, ord)
+  ),
+  existing AS (
+    SELECT
+      id,
+      item_name,
+      COALESCE(category, 'General') AS category,
+      row_number() OVER (
+        PARTITION BY item_name, COALESCE(category, 'General')
+        ORDER BY id
+      ) AS rn
+    FROM property_inventory
+    WHERE property_id = p_property_id
+  )
+  SELECT COALESCE(jsonb_agg(jsonb_build_object(
+           'existing_id', e.id,
+           'item_name', i.item_name,
+           'quantity', i.quantity,
+           'category', i.category
+         )), '[]'::jsonb)
+  INTO v_pairs
+  FROM incoming i
+  LEFT JOIN existing e
+    ON e.item_name IS NOT DISTINCT FROM i.item_name
+   AND e.category = i.category
+   AND e.rn = i.rn;
+
+  DELETE FROM property_inventory pi
+  WHERE pi.property_id = p_property_id
+    AND NOT EXISTS (
+      SELECT 1 FROM jsonb_to_recordset(v_pairs) AS p(existing_id uuid)
+      WHERE p.existing_id = pi.id
+    );
+  GET DIAGNOSTICS v_del = ROW_COUNT;
+
+  UPDATE property_inventory pi
+  SET quantity = p.quantity
+  FROM jsonb_to_recordset(v_pairs) AS p(existing_id uuid, quantity integer)
+  WHERE pi.id = p.existing_id
+    AND pi.quantity IS DISTINCT FROM p.quantity;
+  GET DIAGNOSTICS v_upd = ROW_COUNT;
+
+  INSERT INTO property_inventory (property_id, item_name, quantity, category)
+  SELECT p_property_id, p.item_name, p.quantity, p.category
+  FROM jsonb_to_recordset(v_pairs) AS p(existing_id uuid, item_name text, quantity integer, category text)
+  WHERE p.existing_id IS NULL;
+  GET DIAGNOSTICS v_ins = ROW_COUNT;
+
+  v_changes := v_changes || jsonb_build_object('inventory',
+    jsonb_build_object('inserted', v_ins, 'updated', v_upd, 'deleted', v_del));
+
+  -- ---------- Owner / manager assignments ----------
+  -- Other roles assigned to the property are left alone.
+  SELECT COALESCE(jsonb_agg(jsonb_build_object('person_id', d.person_id, 'role_id', d.role_id)), '[]'::jsonb)
+  INTO v_pairs
+  FROM (
+    SELECT DISTINCT ON (person_id) person_id, role_id
+    FROM (
+      SELECT unnest(COALESCE(p_owner_ids, '{}')) AS person_id, owner_role_id AS role_id, 1 AS pri
+      UNION ALL
+      SELECT unnest(COALESCE(p_manager_ids, '{}')), manager_role_id, 2
+    ) wanted
+    WHERE person_id IS NOT NULL
+    ORDER BY person_id, pri
+  ) d;
+
+  DELETE FROM property_assignments pa
+  WHERE pa.property_id = p_property_id
+    AND pa.role_id IN (owner_role_id, manager_role_id)
+    AND NOT EXISTS (
+      SELECT 1 FROM jsonb_to_recordset(v_pairs) AS d(person_id uuid, role_id uuid)
+      WHERE d.person_id = pa.person_id AND d.role_id = pa.role_id
+    );
+  GET DIAGNOSTICS v_del = ROW_COUNT;
+
+  INSERT INTO property_assignments (property_id, person_id, role_id)
+  SELECT p_property_id, d.person_id, d.role_id
+  FROM jsonb_to_recordset(v_pairs) AS d(person_id uuid, role_id uuid)
+  WHERE NOT EXISTS (
+    SELECT 1 FROM property_assignments pa
+    WHERE pa.property_id = p_property_id
+      AND pa.person_id = d.person_id
+      AND pa.role_id = d.role_id
+  );
+  GET DIAGNOSTICS v_ins = ROW_COUNT;
+
+  v_changes := v_changes || jsonb_build_object('assignments',
+    jsonb_build_object('inserted', v_ins, 'deleted', v_del));
+
+  RETURN jsonb_build_object('success', true, 'changes', v_changes);
+END;
+$$;
+
+
+-- ============================================
+-- 2. UPDATE PROPERTY SAFE
+-- ============================================
+-- Only writes the property row when a field changed, diffs the five managed
+-- access code types and hands feeds / inventory / assignments to
+-- save_property_collections.
+CREATE OR REPLACE FUNCTION public.update_property_safe(
+    p_id uuid,
+    p_tenant_id uuid,
+    p_name text,
+    p_street_address text,
+    p_city text,
+    p_state text,
+    p_zip text,
+    p_hcp_customer_id text,
+    p_hcp_address_id text,
+    p_check_in_time time without time zone,
+    p_check_out_time time without time zone,
+    p_owner_ids uuid[],
+    p_manager_ids uuid[],
+    p_front_photo_url text,
+    p_door_code text,
+    p_garage_code text,
+    p_gate_code text,
+    p_closet_code text,
+    p_wifi_network text,
+    p_wifi_password text,
+    p_bedrooms integer,
+    p_bathrooms numeric,
+    p_max_guests integer,
+    p_has_pool boolean,
+    p_has_bbq boolean,
+    p_allows_pets boolean,
+    p_parking_instructions text,
+    p_has_casita boolean,
+    p_casita_code text,
+    p_square_footage integer,
+    p_bathroom_sinks integer,
+    p_bath_mats integer,
+    p_time_zone text,
+    p_is_dst boolean,
+    p_feeds jsonb DEFAULT '[]'::jsonb,
+    p_inventory jsonb DEFAULT '[]'::jsonb,
+    p_attachments jsonb DEFAULT '[]'::jsonb
+)
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    -- Update base property (skipped when nothing changed)
+    UPDATE properties
+    SET name = p_name,
+        street_address = p_street_address,
+        city = p_city,
+        state = p_state,
+        zip = p_zip,
+        hcp_customer_id = p_hcp_customer_id,
+        hcp_address_id = p_hcp_address_id,
+        check_in_time = p_check_in_time,
+        check_out_time = p_check_out_time,
+        front_photo_url = p_front_photo_url,
+        wifi_network = p_wifi_network,
+        wifi_password = p_wifi_password,
+        bedrooms = p_bedrooms,
+        bathrooms = p_bathrooms,
+        max_guests = p_max_guests,
+        has_pool = p_has_pool,
+        has_bbq = p_has_bbq,
+        allows_pets = p_allows_pets,
+        parking_instructions = p_parking_instructions,
+        has_casita = p_has_casita,
+        square_footage = p_square_footage,
+        bathroom_sinks = p_bathroom_sinks,
+        bath_mats = p_bath_mats,
+        time_zone = p_time_zone,
+        is_dst = p_is_dst
+    WHERE id = p_id
+      AND (
+        name, street_address, city, state, zip, hcp_customer_id, hcp_address_id,
+        check_in_time, check_out_time, front_photo_url, wifi_network, wifi_password,
+        bedrooms, bathrooms, max_guests, has_pool, has_bbq, allows_pets,
+        parking_instructions, has_casita, square_footage, bathroom_sinks, bath_mats,
+        time_zone, is_dst
+      ) IS DISTINCT FROM (
+        p_name, p_street_address, p_city, p_state, p_zip, p_hcp_customer_id, p_hcp_address_id,
+        p_check_in_time, p_check_out_time, p_front_photo_url, p_wifi_network, p_wifi_password,
+        p_bedrooms, p_bathrooms, p_max_guests, p_has_pool, p_has_bbq, p_allows_pets,
+        p_parking_instructions, p_has_casita, p_square_footage, p_bathroom_sinks, p_bath_mats,
+        p_time_zone, p_is_dst
+      );
+
+    -- Access codes: drop codes that were cleared or changed, add new values
+    DELETE FROM property_access_codes c
+    WHERE c.property_id = p_id
+      AND c.code_type IN ('Door', 'Garage', 'Community Gate', 'Owner Closet', 'Casita')
+      AND NOT EXISTS (
+        SELECT 1
+        FROM (VALUES
+            ('Door', p_door_code),
+            ('Garage', p_garage_code),
+            ('Community Gate', p_gate_code),
+            ('Owner Closet', p_closet_code),
+            ('Casita', p_casita_code)
+        ) AS d(code_type, code_value)
+        WHERE d.code_type = c.code_type AND d.code_value = c.code_value
+      );
+
+    INSERT INTO property_access_codes (property_id, code_type, code_value)
+    SELECT p_id, d.code_type, d.code_value
+    FROM (VALUES
+        ('Door', p_door_code),
+        ('Garage', p_garage_code),
+        ('Community Gate', p_gate_code),
+        ('Owner Closet', p_closet_code),
+        ('Casita', p_casita_code)
+    ) AS d(code_type, code_value)
+    WHERE COALESCE(d.code_value, '') != ''
+      AND NOT EXISTS (
+        SELECT 1 FROM property_access_codes c
+        WHERE c.property_id = p_id AND c.code_type = d.code_type AND c.code_value = d.code_value
+      );
+
+    -- Feeds, inventory and owner/manager assignments
+    PERFORM save_property_collections(p_id, p_feeds, p_inventory, p_owner_ids, p_manager_ids);
+END;
+$$;
+
+NOTIFY pgrst, 'reload schema';
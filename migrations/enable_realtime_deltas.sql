@@ -0,0 +1,33 @@
+-- Migration: Realtime Row Deltas
+-- Purpose: Publish the tables behind the Dashboard, Jobs and Calendar views to
+--          Supabase Realtime so open views apply row changes instead of
+--          refetching get_dashboard_horizon / list_jobs / get_calendar_events.
+-- Date: 2025-01-25
+--
+-- Realtime enforces RLS on postgres_changes, so subscribers only receive rows
+-- their tenant_isolation policies allow, and the client filters INSERT/UPDATE
+-- by tenant_id, which every published table now carries. RLS cannot be
+-- checked for a deleted row: on these tables the old record of an UPDATE or
+-- DELETE only carries the primary key, so clients act on DELETEs by id
+-- against rows they already hold.
+
+DO $$
+DECLARE
+    v_table text;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_publication WHERE pubname = 'supabase_realtime') THEN
+        CREATE PUBLICATION supabase_realtime;
+    END IF;
+
+    FOREACH v_table IN ARRAY ARRAY['jobs', 'visits', 'calendar_events', 'service_opportunities']
+    LOOP
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_publication_tables
+            WHERE pubname = 'supabase_realtime'
+              AND schemaname = 'public'
+              AND tablename = v_table
+        ) THEN
+            EXECUTE format('ALTER PUBLICATION supabase_realtime ADD TABLE public.%I', v_table);
+        END IF;
+    END LOOP;
+END $$;
@@ -0,0 +1,199 @@
+-- Migration: Idempotent Artifact Submission
+-- Purpose: submit_artifact accepts a client-generated idempotency key so a
+--          retried submission from a flaky connection returns the original
+--          artifact instead of inserting a duplicate immutable row. Identity
+--          and role are resolved in one query, the job row is locked while
+--          its completion is decided, and the completion check is a single
+--          aggregate over the job's visits.
+-- Date: 2025-02-03
+
+-- ============================================================================
+-- 1. IDEMPOTENCY KEY
+-- ============================================================================
+-- Scoped per submitter, same as worker_visit_logs.idempotency_key.
+
+ALTER TABLE artifacts
+    ADD COLUMN IF NOT EXISTS idempotency_key UUID;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_artifacts_idempotency
+    ON artifacts (submitted_by, idempotency_key)
+    WHERE idempotency_key IS NOT NULL;
+
+
+-- ============================================================================
+-- 2. ACTOR
+-- ============================================================================
+-- Resolves the caller's person, tenant and role in one query.
+-- Role: p_role_id when given (it must be one of the person's roles, otherwise
+-- role_id is NULL); without it, the person's first role in the tenant's role
+-- order (roles.sort_order, as arranged on the Roles screen), ties by id. The
+-- legacy users.active_role_id column no longer exists.
+
+DROP FUNCTION IF EXISTS current_actor();
+
+CREATE OR REPLACE FUNCTION current_actor(
+    p_role_id UUID DEFAULT NULL,
+    OUT person_id UUID,
+    OUT tenant_id UUID,
+    OUT role_id UUID
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT p.id, p.tenant_id, r.role_id
+    FROM people p
+    JOIN profiles pr ON pr.id = auth.uid() AND pr.tenant_id = p.tenant_id
+    LEFT JOIN LATERAL (
+        SELECT prl.role_id
+        FROM person_roles prl
+        JOIN roles ro ON ro.id = prl.role_id
+        WHERE prl.person_id = p.id
+          AND (p_role_id IS NULL OR prl.role_id = p_role_id)
+        ORDER BY ro.sort_order NULLS LAST, ro.id
+        LIMIT 1
+    ) r ON true
+    WHERE p.user_id = auth.uid();
+$$;
+
+REVOKE EXECUTE ON FUNCTION current_actor(UUID) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION current_actor(UUID) TO authenticated;
+
+
+-- ============================================================================
+-- 3. SUBMIT ARTIFACT
+-- ============================================================================
+-- The old 5-argument signature is dropped so PostgREST never has to choose
+-- between overloads; existing callers still match (the key and role default
+-- to NULL). p_role_id is the role the caller submits as (see current_actor).
+--
+-- Replay: a key already stored for this submitter returns that artifact's id
+-- and skips the status side effects, which ran with the original submission.
+-- Concurrency: the job row is locked before the visit update, so two workers
+-- completing the last visits of a job serialize and the second one sees the
+-- first one's visit status in the completion aggregate.
+
+DROP FUNCTION IF EXISTS submit_artifact(UUID, UUID, TEXT, JSONB, UUID);
+DROP FUNCTION IF EXISTS submit_artifact(UUID, UUID, TEXT, JSONB, UUID, UUID);
+
+CREATE OR REPLACE FUNCTION submit_artifact(
+    p_visit_id UUID,
+    p_job_id UUID,
+    p_artifact_type TEXT,
+    p_payload JSONB,
+    p_corrects_artifact_id UUID DEFAULT NULL,
+    p_idempotency_key UUID DEFAULT NULL,
+    p_role_id UUID DEFAULT NULL
+)
+RETURNS UUID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_actor RECORD;
+    v_artifact_id UUID;
+    v_open_visits INT;
+    v_failed_visits INT;
+BEGIN
+    SELECT * INTO v_actor FROM current_actor(p_role_id);
+
+    IF v_actor.person_id IS NULL THEN
+        RAISE EXCEPTION 'User not found or not linked to a person record';
+    END IF;
+
+    IF v_actor.role_id IS NULL AND p_role_id IS NOT NULL THEN
+        RAISE EXCEPTION 'Role % is not assigned to this user', p_role_id;
+    END IF;
+
+    IF v_actor.role_id IS NULL THEN
+        RAISE EXCEPTION 'User has no assigned roles';
+    END IF;
+
+    -- Serialize completions of the same job
+    IF p_job_id IS NOT NULL THEN
+        PERFORM 1 FROM jobs WHERE id = p_job_id FOR UPDATE;
+    END IF;
+
+    -- Insert immutable artifact (a replayed key inserts nothing)
+    INSERT INTO artifacts (
+        tenant_id,
+        visit_id,
+        job_id,
+        artifact_type,
+        submitted_by,
+        submitted_as_role,
+        submitted_at,
+        payload,
+        corrects_artifact_id,
+        idempotency_key
+    ) VALUES (
+        v_actor.tenant_id,
+        p_visit_id,
+        p_job_id,
+        p_artifact_type,
+        v_actor.person_id,
+        v_actor.role_id,
+        now(),
+        p_payload,
+        p_corrects_artifact_id,
+        p_idempotency_key
+    )
+    ON CONFLICT (submitted_by, idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
+    RETURNING id INTO v_artifact_id;
+
+    IF v_artifact_id IS NULL THEN
+        SELECT a.id INTO v_artifact_id
+        FROM artifacts a
+        WHERE a.submitted_by = v_actor.person_id
+          AND a.idempotency_key = p_idempotency_key;
+
+        RETURN v_artifact_id;
+    END IF;
+
+    -- If CorrectionArtifact that invalidates, update correction chain
+    IF p_corrects_artifact_id IS NOT NULL AND
+       (p_payload->>'invalidates')::boolean = true THEN
+        UPDATE artifacts
+        SET invalidated_by_artifact_id = v_artifact_id
+        WHERE id = p_corrects_artifact_id;
+    END IF;
+
+    -- Update visit status based on artifact type
+    IF p_visit_id IS NOT NULL AND
+       p_artifact_type IN ('CompletionArtifact', 'IncompletionArtifact') THEN
+        UPDATE visits
+        SET status = CASE p_artifact_type
+                WHEN 'CompletionArtifact' THEN 'Completed'
+                ELSE 'Incomplete'
+            END,
+            actual_end = now()
+        WHERE id = p_visit_id
+          AND status NOT IN ('Completed', 'Incomplete', 'Aborted');
+    END IF;
+
+    -- Complete the job once every visit is terminal and none failed
+    IF p_job_id IS NOT NULL AND p_artifact_type = 'CompletionArtifact' THEN
+        SELECT
+            count(*) FILTER (WHERE status NOT IN ('Completed', 'Incomplete', 'Aborted')),
+            count(*) FILTER (WHERE status IN ('Incomplete', 'Aborted'))
+        INTO v_open_visits, v_failed_visits
+        FROM visits
+        WHERE job_id = p_job_id;
+
+        IF v_open_visits = 0 AND v_failed_visits = 0 THEN
+            UPDATE jobs
+            SET status = 'Complete', completed_at = now()
+            WHERE id = p_job_id
+              AND status IS DISTINCT FROM 'Complete';
+        END IF;
+    END IF;
+
+    RETURN v_artifact_id;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION submit_artifact(UUID, UUID, TEXT, JSONB, UUID, UUID, UUID) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
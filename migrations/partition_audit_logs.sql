@@ -0,0 +1,309 @@
+-- Partition audit_logs by month on changed_at
+-- audit_logs was a single ever-growing heap indexed only on resolved_tenant_id,
+-- so every activity-feed / audit-history query scanned a growing range.
+-- This migration rebuilds it as a RANGE-partitioned table (one partition per
+-- calendar month) so time-bounded queries only touch recent partitions, and
+-- adds the bookkeeping needed to detach and archive old months to R2
+-- (see audit_retention.py).
+--
+-- Run once. The old heap is kept as audit_logs_legacy until you have verified
+-- the copy; drop it manually afterwards.
+
+BEGIN;
+
+-- 1. Partitioned parent with the same columns/defaults as the existing table
+--    (includes resolved_tenant_id and record_summary if present).
+--    The partition key must be part of the primary key. LIKE copies neither
+--    RLS nor grants; those are carried over in step 6.
+CREATE TABLE audit_logs_partitioned (LIKE audit_logs INCLUDING DEFAULTS)
+    PARTITION BY RANGE (changed_at);
+
+ALTER TABLE audit_logs_partitioned ALTER COLUMN changed_at SET NOT NULL;
+ALTER TABLE audit_logs_partitioned ADD PRIMARY KEY (id, changed_at);
+
+-- Indexes declared on the parent are created on every partition, including
+-- partitions added later by ensure_audit_log_partition().
+CREATE INDEX idx_audit_logs_tenant_changed_at
+    ON audit_logs_partitioned (resolved_tenant_id, changed_at DESC);
+CREATE INDEX idx_audit_logs_record_changed_at
+    ON audit_logs_partitioned (record_id, changed_at DESC);
+
+-- Partitions are tables of their own: they inherit neither the parent's RLS
+-- policies nor its grants, and Supabase's default privileges expose every new
+-- public table to anon/authenticated. Reads go through the parent (step 6);
+-- partitions, detached months and the archive bookkeeping are locked down.
+CREATE OR REPLACE FUNCTION lock_down_audit_table(p_table regclass)
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    EXECUTE format('ALTER TABLE %s ENABLE ROW LEVEL SECURITY', p_table);
+    EXECUTE format('REVOKE ALL ON %s FROM PUBLIC, anon, authenticated', p_table);
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION lock_down_audit_table(regclass) FROM PUBLIC, anon, authenticated;
+
+-- Catch-all so an insert can never fail because a month was not created yet
+CREATE TABLE audit_logs_default PARTITION OF audit_logs_partitioned DEFAULT;
+SELECT lock_down_audit_table('public.audit_logs_default');
+
+
+-- 2. Archive bookkeeping: one row per detached month
+CREATE TABLE IF NOT EXISTS audit_log_archives (
+    partition_name text PRIMARY KEY,
+    range_start date NOT NULL,
+    range_end date NOT NULL,
+    detached_at timestamptz NOT NULL DEFAULT now(),
+    archived_at timestamptz,
+    object_key text,
+    row_count bigint
+);
+
+SELECT lock_down_audit_table('public.audit_log_archives');
+
+
+-- 3. Create the partition for the month containing p_month (idempotent)
+CREATE OR REPLACE FUNCTION ensure_audit_log_partition(p_month date)
+RETURNS text
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_start date := date_trunc('month', p_month)::date;
+    v_end date := (date_trunc('month', p_month) + INTERVAL '1 month')::date;
+    v_name text := 'audit_logs_' || to_char(v_start, '"y"YYYY"m"MM');
+BEGIN
+    IF p_month IS NULL THEN
+        RAISE EXCEPTION 'p_month is required';
+    END IF;
+
+    IF to_regclass('public.' || v_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+            v_name, v_start, v_end
+        );
+        PERFORM lock_down_audit_table(format('public.%I', v_name)::regclass);
+    END IF;
+    RETURN v_name;
+END;
+$$;
+
+
+-- 4. Create upcoming months and detach months older than the retention window.
+--    Detached partitions stay in place as plain tables and are recorded in
+--    audit_log_archives; audit_retention.py exports and drops them.
+CREATE OR REPLACE FUNCTION maintain_audit_log_partitions(
+    p_months_ahead int DEFAULT 3,
+    p_retain_months int DEFAULT 12
+)
+RETURNS SETOF text
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_cutoff date := (date_trunc('month', now()) - make_interval(months => p_retain_months))::date;
+    v_part record;
+    v_start date;
+BEGIN
+    -- A zero or negative window would detach the current month (or all of them)
+    IF p_retain_months IS NULL OR p_retain_months < 1 THEN
+        RAISE EXCEPTION 'p_retain_months must be at least 1 (got %)', p_retain_months;
+    END IF;
+
+    IF p_months_ahead IS NULL OR p_months_ahead < 0 THEN
+        RAISE EXCEPTION 'p_months_ahead must not be negative (got %)', p_months_ahead;
+    END IF;
+
+    FOR v_offset IN 0..p_months_ahead LOOP
+        PERFORM ensure_audit_log_partition((date_trunc('month', now()) + make_interval(months => v_offset))::date);
+    END LOOP;
+
+    FOR v_part IN
+        SELECT c.relname
+        FROM pg_inherits inh
+        JOIN pg_class c ON c.oid = inh.inhrelid
+        WHERE inh.inhparent = 'public.audit_logs'::regclass
+          AND c.relname ~ '^audit_logs_y[0-9]{4}m[0-9]{2}$'
+        ORDER BY c.relname
+    LOOP
+        v_start := to_date(substring(v_part.relname FROM 'y([0-9]{4}m[0-9]{2})$'), 'YYYY"m"MM');
+        IF v_start < v_cutoff THEN
+            EXECUTE format('ALTER TABLE audit_logs DETACH PARTITION %I', v_part.relname);
+            -- Now a standalone table until audit_retention.py drops it
+            PERFORM lock_down_audit_table(format('public.%I', v_part.relname)::regclass);
+
+            INSERT INTO audit_log_archives (partition_name, range_start, range_end)
+            VALUES (v_part.relname, v_start, (v_start + INTERVAL '1 month')::date)
+            ON CONFLICT (partition_name) DO NOTHING;
+
+            RETURN NEXT v_part.relname;
+        END IF;
+    END LOOP;
+END;
+$$;
+
+-- Partition maintenance is for audit_retention.py (service connection) only
+REVOKE EXECUTE ON FUNCTION ensure_audit_log_partition(date) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION maintain_audit_log_partitions(int, int) FROM PUBLIC, anon, authenticated;
+
+
+-- 5. Copy existing rows. Create one partition per month that has data (plus
+--    the current and next few months) before copying so nothing lands in the
+--    default partition.
+UPDATE audit_logs SET changed_at = now() WHERE changed_at IS NULL;
+
+DO $$
+DECLARE
+    v_month date;
+    v_first date;
+BEGIN
+    SELECT date_trunc('month', COALESCE(min(changed_at), now()))::date INTO v_first FROM audit_logs;
+
+    FOR v_month IN
+        SELECT generate_series(v_first, (date_trunc('month', now()) + INTERVAL '3 months')::date, INTERVAL '1 month')::date
+    LOOP
+        v_month := date_trunc('month', v_month)::date;
+        IF to_regclass('public.audit_logs_' || to_char(v_month, '"y"YYYY"m"MM')) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF audit_logs_partitioned FOR VALUES FROM (%L) TO (%L)',
+                'audit_logs_' || to_char(v_month, '"y"YYYY"m"MM'),
+                v_month,
+                (v_month + INTERVAL '1 month')::date
+            );
+            PERFORM lock_down_audit_table(format('public.%I', 'audit_logs_' || to_char(v_month, '"y"YYYY"m"MM'))::regclass);
+        END IF;
+    END LOOP;
+END $$;
+
+INSERT INTO audit_logs_partitioned SELECT * FROM audit_logs;
+
+
+-- 6. Carry over row level security, policies and grants from the old table
+DO $$
+DECLARE
+    v_policy record;
+    v_grant record;
+BEGIN
+    IF (SELECT relrowsecurity FROM pg_class WHERE oid = 'public.audit_logs'::regclass) THEN
+        ALTER TABLE audit_logs_partitioned ENABLE ROW LEVEL SECURITY;
+    END IF;
+    IF (SELECT relforcerowsecurity FROM pg_class WHERE oid = 'public.audit_logs'::regclass) THEN
+        ALTER TABLE audit_logs_partitioned FORCE ROW LEVEL SECURITY;
+    END IF;
+
+    FOR v_policy IN
+        SELECT *
+        FROM pg_policies
+        WHERE schemaname = 'public' AND tablename = 'audit_logs'
+    LOOP
+        EXECUTE format(
+            'CREATE POLICY %I ON audit_logs_partitioned AS %s FOR %s TO %s%s%s',
+            v_policy.policyname,
+            v_policy.permissive,
+            v_policy.cmd,
+            (SELECT string_agg(CASE WHEN r = 'public' THEN 'PUBLIC' ELSE quote_ident(r) END, ', ')
+             FROM unnest(v_policy.roles) AS r),
+            COALESCE(' USING (' || v_policy.qual || ')', ''),
+            COALESCE(' WITH CHECK (' || v_policy.with_check || ')', '')
+        );
+    END LOOP;
+
+    FOR v_grant IN
+        SELECT grantee, privilege_type
+        FROM information_schema.role_table_grants
+        WHERE table_schema = 'public' AND table_name = 'audit_logs'
+    LOOP
+        EXECUTE format(
+            'GRANT %s ON audit_logs_partitioned TO %s',
+            v_grant.privilege_type,
+            CASE WHEN v_grant.grantee = 'PUBLIC' THEN 'PUBLIC' ELSE quote_ident(v_grant.grantee) END
+        );
+    END LOOP;
+END $$;
+
+
+-- 7. Swap. Trigger functions insert into audit_logs by name, so they pick up
+--    the new table without changes.
+ALTER TABLE audit_logs RENAME TO audit_logs_legacy;
+ALTER TABLE audit_logs_partitioned RENAME TO audit_logs;
+
+
+-- 8. Views are bound to the table they were created against, so re-point
+--    them at the partitioned table.
+CREATE OR REPLACE VIEW public.audit_history_view AS
+ SELECT al.id,
+    al.table_name,
+    al.record_id,
+    al.operation,
+    al.changed_at,
+    al.changed_by,
+    au.email AS changed_by_email,
+    p.first_name AS changed_by_first_name,
+    p.last_name AS changed_by_last_name,
+    al.old_values,
+    al.new_values,
+        CASE
+            WHEN al.operation = 'INSERT'::text THEN 'Created record'::text
+            WHEN al.operation = 'DELETE'::text THEN 'Deleted record'::text
+            WHEN al.operation = 'UPDATE'::text THEN 'Updated fields: '::text || (( SELECT string_agg(jsonb_each.key, ', '::text) AS string_agg
+               FROM jsonb_each(al.new_values) jsonb_each(key, value)
+              WHERE (al.new_values -> jsonb_each.key) IS DISTINCT FROM (al.old_values -> jsonb_each.key)))
+            ELSE al.operation
+        END AS description
+   FROM audit_logs al
+     LEFT JOIN auth.users au ON al.changed_by = au.id
+     LEFT JOIN profiles p ON al.changed_by = p.id;
+
+CREATE OR REPLACE VIEW tenant_activity_feed AS
+SELECT
+    a.id::text AS event_id,
+    a.changed_at AS timestamp,
+    COALESCE(
+        a.resolved_tenant_id,
+        (a.new_values->>'tenant_id')::uuid,
+        (a.old_values->>'tenant_id')::uuid
+    ) AS tenant_id,
+    'DATA_CHANGE'::text AS category,
+    CASE
+        WHEN a.operation = 'DELETE' THEN 'WARNING'
+        ELSE 'INFO'
+    END AS severity,
+    a.table_name || ' ' || a.operation || ': ' || COALESCE(a.record_id::text, '') AS summary,
+    a.changed_by AS actor_id,
+    u.email AS actor_email,
+    jsonb_build_object(
+        'table', a.table_name,
+        'operation', a.operation,
+        'record_id', a.record_id,
+        'old', a.old_values,
+        'new', a.new_values
+    ) AS details
+FROM audit_logs a
+LEFT JOIN auth.users u ON a.changed_by = u.id
+UNION ALL
+SELECT
+    c.id::text AS event_id,
+    c.created_at AS timestamp,
+    c.tenant_id,
+    'COMMUNICATION'::text AS category,
+    'INFO'::text AS severity,
+    c.type || ' to ' || c.recipient AS summary,
+    c.created_by AS actor_id,
+    u.email AS actor_email,
+    jsonb_build_object(
+        'type', c.type,
+        'recipient', c.recipient,
+        'direction', c.direction,
+        'content', c.content
+    ) AS details
+FROM communications c
+LEFT JOIN auth.users u ON c.created_by = u.id;
+
+COMMIT;
+
+NOTIFY pgrst, 'reload schema';
@@ -22,6 +22,12 @@ R2_ACCESS_KEY_ID = os.getenv("R2_ACCESS_KEY_ID")
 R2_SECRET_ACCESS_KEY = os.getenv("R2_SECRET_ACCESS_KEY")
 R2_BUCKET_NAME = os.getenv("R2_BUCKET_NAME")
 
+# --- TIME TRANSITIONS ---
+# APPLY_TIME_TRANSITIONS re-enqueues itself this often; each run drains due
+# transitions (snooze expiry, ...) in batches of TIME_TRANSITION_BATCH rows.
+TIME_TRANSITION_INTERVAL_SECONDS = int(os.getenv("TIME_TRANSITION_INTERVAL_SECONDS", "300"))
+TIME_TRANSITION_BATCH = int(os.getenv("TIME_TRANSITION_BATCH", "200"))
+
 def get_r2_client():
     return boto3.client(
         's3',
@@ -80,6 +86,27 @@ def compress_and_upload(photo_id, storage_path):
 
     return True
 
+def apply_time_transitions():
+    # Separate autocommit connection: every batch commits on its own so row
+    # locks stay short, while the queue row stays locked by the caller.
+    conn = psycopg2.connect(DB_CONNECTION_STRING)
+    conn.autocommit = True
+    totals = {}
+    try:
+        cur = conn.cursor()
+        while True:
+            cur.execute("SELECT apply_time_transitions(%s)", (TIME_TRANSITION_BATCH,))
+            counts = cur.fetchone()[0] or {}
+            for kind, n in counts.items():
+                totals[kind] = totals.get(kind, 0) + n
+            if all(n < TIME_TRANSITION_BATCH for n in counts.values()):
+                break
+    finally:
+        conn.close()
+
+    print(f"     ⏱️  Time transitions applied: {totals}")
+    return totals
+
 def process_queue():
     conn = None
     try:
@@ -87,6 +114,10 @@ def process_queue():
         cur = conn.cursor()
         print("✅ Worker Connected")
 
+        # Restore the APPLY_TIME_TRANSITIONS chain if a run was marked FAILED
+        cur.execute("SELECT ensure_time_transitions_scheduled()")
+        conn.commit()
+
         # Fetch ONE pending job with locking
         # Using FOR UPDATE SKIP LOCKED to allow multiple workers
         cur.execute("""
@@ -119,6 +150,34 @@ def process_queue():
                 cur.execute("UPDATE property_reference_photos SET compression_status = 'completed' WHERE id = %s", (photo_id,))
                 result_note = "Compressed successfully"
 
+            elif action == 'APPLY_TIME_TRANSITIONS':
+                totals = apply_time_transitions()
+
+                # Schedule the next run. Only one run may be PENDING
+                # (uq_job_queue_pending_time_transitions), so this one leaves
+                # PENDING first; if another worker already scheduled one, keep it.
+                cur.execute("UPDATE job_queue SET status = 'COMPLETED' WHERE id = %s", (queue_id,))
+                cur.execute("""
+                    INSERT INTO job_queue (action_type, payload, status, run_after)
+                    VALUES ('APPLY_TIME_TRANSITIONS', '{}'::jsonb, 'PENDING', NOW() + (INTERVAL '1 second' * %s))
+                    ON CONFLICT DO NOTHING
+                """, (TIME_TRANSITION_INTERVAL_SECONDS,))
+                result_note = json.dumps(totals)
+
+            elif action == 'GENERATE_SERVICE_WORKFLOWS':
+                # Queued by create_service_opportunities_bulk; opportunities that
+                # already have jobs are skipped, so a retry never duplicates them
+                cur.execute(
+                    "SELECT generate_service_workflows(%s, %s::uuid[])",
+                    (payload.get('tenant_id'), payload.get('service_opportunity_ids', []))
+                )
+                summary = cur.fetchone()[0]
+                print(f"     🧩 Workflows generated: {summary['jobs_created']} jobs")
+                result_note = json.dumps({
+                    'jobs_created': summary['jobs_created'],
+                    'skipped': len(summary['skipped'])
+                })
+
             elif action == 'CREATE_JOB':
                 # ... (Your existing HCP logic) ...
                 result_note = "Job Created (Mock)"